@@ -0,0 +1,37 @@
+"""Add the quarantine for records that failed to parse or load
+
+Revision ID: 0a7d3c9e51f2
+Revises: f0c6a8d2e4b1
+Create Date: 2026-10-19 13:02:47.118305
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0a7d3c9e51f2"
+down_revision = "f0c6a8d2e4b1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "quarantined_record",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("pmid", sa.Integer(), nullable=True),
+        sa.Column("xml_file_name", sa.String(length=50), nullable=False),
+        sa.Column("raw_xml", sa.Text(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=False),
+        sa.Column("time_quarantined", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_quarantined_record_pmid"), "quarantined_record", ["pmid"], unique=False)
+    op.create_index(op.f("ix_quarantined_record_xml_file_name"), "quarantined_record", ["xml_file_name"], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f("ix_quarantined_record_xml_file_name"), table_name="quarantined_record")
+    op.drop_index(op.f("ix_quarantined_record_pmid"), table_name="quarantined_record")
+    op.drop_table("quarantined_record")
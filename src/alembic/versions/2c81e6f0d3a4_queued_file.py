@@ -0,0 +1,38 @@
+"""Add the work queue shared by distributed loaders
+
+Revision ID: 2c81e6f0d3a4
+Revises: 0a7d3c9e51f2
+Create Date: 2026-10-19 14:11:05.402871
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "2c81e6f0d3a4"
+down_revision = "0a7d3c9e51f2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "queued_file",
+        sa.Column("xml_file_name", sa.String(length=50), nullable=False),
+        sa.Column("status", sa.String(length=10), server_default="pending", nullable=False),
+        sa.Column("worker", sa.String(length=100), nullable=True),
+        sa.Column("attempts", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("lease_expires", sa.DateTime(), nullable=True),
+        sa.Column("heartbeat", sa.DateTime(), nullable=True),
+        sa.Column("time_enqueued", sa.DateTime(), nullable=True),
+        sa.Column("time_finished", sa.DateTime(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint("xml_file_name"),
+    )
+    op.create_index(op.f("ix_queued_file_status"), "queued_file", ["status"], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f("ix_queued_file_status"), table_name="queued_file")
+    op.drop_table("queued_file")
@@ -0,0 +1,37 @@
+"""Add article identifiers from ArticleIdList and ELocationID
+
+Revision ID: 3e9b1f7c2a65
+Revises: 2c81e6f0d3a4
+Create Date: 2026-10-19 16:02:47.118532
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3e9b1f7c2a65"
+down_revision = "2c81e6f0d3a4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "article_identifier",
+        sa.Column("pmid", sa.Integer(), nullable=False),
+        sa.Column("id_type", sa.String(length=20), nullable=False),
+        sa.Column("id_value", sa.String(length=200), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["pmid"], ["citation.pmid"], onupdate="CASCADE", ondelete="CASCADE", initially="DEFERRED", deferrable=True
+        ),
+        sa.PrimaryKeyConstraint("pmid", "id_type", "id_value"),
+    )
+    op.create_index(
+        "ix_article_identifier_id_type_id_value", "article_identifier", ["id_type", "id_value"], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index("ix_article_identifier_id_type_id_value", table_name="article_identifier")
+    op.drop_table("article_identifier")
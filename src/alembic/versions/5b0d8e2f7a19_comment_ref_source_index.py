@@ -0,0 +1,22 @@
+"""Index comment.ref_source for bulk identifier resolution
+
+Revision ID: 5b0d8e2f7a19
+Revises: 3e9b1f7c2a65
+Create Date: 2026-10-19 16:48:12.530914
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5b0d8e2f7a19"
+down_revision = "3e9b1f7c2a65"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(op.f("ix_comment_ref_source"), "comment", ["ref_source"], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f("ix_comment_ref_source"), table_name="comment")
@@ -0,0 +1,33 @@
+"""Add citation_document, one JSONB document per citation
+
+Revision ID: 7c3a9d41e2b6
+Revises: 5b0d8e2f7a19
+Create Date: 2026-10-19 17:21:05.604219
+
+"""
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "7c3a9d41e2b6"
+down_revision = "5b0d8e2f7a19"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "citation_document",
+        sa.Column("pmid", sa.Integer(), nullable=False),
+        sa.Column("document", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["pmid"], ["citation.pmid"], onupdate="CASCADE", ondelete="CASCADE", initially="DEFERRED", deferrable=True
+        ),
+        sa.PrimaryKeyConstraint("pmid"),
+    )
+
+
+def downgrade():
+    op.drop_table("citation_document")
@@ -0,0 +1,30 @@
+"""Add run manifest columns to xml_file
+
+Revision ID: 7c3e1f2a9b10
+Revises: 44b265204928
+Create Date: 2026-10-19 09:12:31.118204
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "7c3e1f2a9b10"
+down_revision = "44b265204928"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("xml_file", sa.Column("file_size", sa.BigInteger(), nullable=True))
+    op.add_column("xml_file", sa.Column("file_mtime", sa.DateTime(), nullable=True))
+    op.add_column("xml_file", sa.Column("md5", sa.String(length=32), nullable=True))
+    op.add_column("xml_file", sa.Column("status", sa.String(length=10), server_default="done", nullable=False))
+
+
+def downgrade():
+    op.drop_column("xml_file", "status")
+    op.drop_column("xml_file", "md5")
+    op.drop_column("xml_file", "file_mtime")
+    op.drop_column("xml_file", "file_size")
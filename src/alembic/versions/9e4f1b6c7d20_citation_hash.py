@@ -0,0 +1,32 @@
+"""Add citation_hash, the hash of the rows each citation was loaded as
+
+Revision ID: 9e4f1b6c7d20
+Revises: 7c3a9d41e2b6
+Create Date: 2026-10-19 18:03:40.271958
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9e4f1b6c7d20"
+down_revision = "7c3a9d41e2b6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "citation_hash",
+        sa.Column("pmid", sa.Integer(), nullable=False),
+        sa.Column("content_hash", sa.String(length=32), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["pmid"], ["citation.pmid"], onupdate="CASCADE", ondelete="CASCADE", initially="DEFERRED", deferrable=True
+        ),
+        sa.PrimaryKeyConstraint("pmid"),
+    )
+
+
+def downgrade():
+    op.drop_table("citation_hash")
@@ -0,0 +1,33 @@
+"""Add raw_article, the compressed xml each citation was parsed from
+
+Revision ID: b2d7e05a9c31
+Revises: 9e4f1b6c7d20
+Create Date: 2026-10-19 18:40:12.883105
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b2d7e05a9c31"
+down_revision = "9e4f1b6c7d20"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "raw_article",
+        sa.Column("pmid", sa.Integer(), nullable=False),
+        sa.Column("codec", sa.String(length=10), nullable=False),
+        sa.Column("raw_xml", sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["pmid"], ["citation.pmid"], onupdate="CASCADE", ondelete="CASCADE", initially="DEFERRED", deferrable=True
+        ),
+        sa.PrimaryKeyConstraint("pmid"),
+    )
+
+
+def downgrade():
+    op.drop_table("raw_article")
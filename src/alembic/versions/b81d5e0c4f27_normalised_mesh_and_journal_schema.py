@@ -0,0 +1,82 @@
+"""Add optional normalised MeSH and journal dimension tables
+
+Revision ID: b81d5e0c4f27
+Revises: 7c3e1f2a9b10
+Create Date: 2026-10-19 10:02:47.530117
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b81d5e0c4f27"
+down_revision = "7c3e1f2a9b10"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "mesh_descriptor",
+        sa.Column("descriptor_ui", sa.String(length=10), nullable=False),
+        sa.Column("descriptor_name", sa.String(length=500), nullable=False),
+        sa.PrimaryKeyConstraint("descriptor_ui"),
+    )
+    op.create_table(
+        "mesh_qualifier",
+        sa.Column("qualifier_ui", sa.String(length=10), nullable=False),
+        sa.Column("qualifier_name", sa.String(length=500), nullable=False),
+        sa.PrimaryKeyConstraint("qualifier_ui"),
+    )
+    op.create_table(
+        "journal_title",
+        sa.Column("nlm_unique_id", sa.String(length=20), nullable=False),
+        sa.Column("title", sa.String(length=2000), nullable=True),
+        sa.Column("iso_abbreviation", sa.String(length=200), nullable=True),
+        sa.PrimaryKeyConstraint("nlm_unique_id"),
+    )
+    op.create_table(
+        "mesh_heading_ref",
+        sa.Column("pmid", sa.Integer(), nullable=False),
+        sa.Column("descriptor_ui", sa.String(length=10), nullable=False),
+        sa.Column("descriptor_name_major_yn", sa.Enum("Y", "N", "y", "n", name="yesno"), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["pmid"], ["citation.pmid"], onupdate="CASCADE", ondelete="CASCADE", initially="DEFERRED", deferrable=True
+        ),
+        sa.ForeignKeyConstraint(
+            ["descriptor_ui"], ["mesh_descriptor.descriptor_ui"], initially="DEFERRED", deferrable=True
+        ),
+        sa.PrimaryKeyConstraint("pmid", "descriptor_ui"),
+    )
+    op.create_index(op.f("ix_mesh_heading_ref_descriptor_ui"), "mesh_heading_ref", ["descriptor_ui"], unique=False)
+    op.create_table(
+        "qualifier_ref",
+        sa.Column("pmid", sa.Integer(), nullable=False),
+        sa.Column("descriptor_ui", sa.String(length=10), nullable=False),
+        sa.Column("qualifier_ui", sa.String(length=10), nullable=False),
+        sa.Column("qualifier_name_major_yn", sa.Enum("Y", "N", "y", "n", name="yesno"), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["pmid"], ["citation.pmid"], onupdate="CASCADE", ondelete="CASCADE", initially="DEFERRED", deferrable=True
+        ),
+        sa.ForeignKeyConstraint(
+            ["descriptor_ui"], ["mesh_descriptor.descriptor_ui"], initially="DEFERRED", deferrable=True
+        ),
+        sa.ForeignKeyConstraint(
+            ["qualifier_ui"], ["mesh_qualifier.qualifier_ui"], initially="DEFERRED", deferrable=True
+        ),
+        sa.PrimaryKeyConstraint("pmid", "descriptor_ui", "qualifier_ui"),
+    )
+    op.create_index(op.f("ix_qualifier_ref_descriptor_ui"), "qualifier_ref", ["descriptor_ui"], unique=False)
+    op.create_index(op.f("ix_qualifier_ref_qualifier_ui"), "qualifier_ref", ["qualifier_ui"], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f("ix_qualifier_ref_qualifier_ui"), table_name="qualifier_ref")
+    op.drop_index(op.f("ix_qualifier_ref_descriptor_ui"), table_name="qualifier_ref")
+    op.drop_table("qualifier_ref")
+    op.drop_index(op.f("ix_mesh_heading_ref_descriptor_ui"), table_name="mesh_heading_ref")
+    op.drop_table("mesh_heading_ref")
+    op.drop_table("journal_title")
+    op.drop_table("mesh_qualifier")
+    op.drop_table("mesh_descriptor")
@@ -0,0 +1,29 @@
+"""Add a normalised author name key
+
+Revision ID: d4a09c3e6b58
+Revises: b81d5e0c4f27
+Create Date: 2026-10-19 10:41:05.211873
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "d4a09c3e6b58"
+down_revision = "b81d5e0c4f27"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # existing rows are filled in with pubmedpg.crud.backfill_author_keys
+    op.add_column("author", sa.Column("name_key", sa.String(length=310), nullable=True))
+    op.create_index(
+        "ix_author_name_key", "author", ["name_key"], unique=False, postgresql_ops={"name_key": "varchar_pattern_ops"}
+    )
+
+
+def downgrade():
+    op.drop_index("ix_author_name_key", table_name="author")
+    op.drop_column("author", "name_key")
@@ -0,0 +1,24 @@
+"""Add the record filter each file was loaded with to xml_file
+
+Revision ID: d8c1f4a7b2e3
+Revises: b2d7e05a9c31
+Create Date: 2026-10-19 21:26:14.530817
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "d8c1f4a7b2e3"
+down_revision = "b2d7e05a9c31"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("xml_file", sa.Column("record_filter", sa.Text(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("xml_file", "record_filter")
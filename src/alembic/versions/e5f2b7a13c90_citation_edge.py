@@ -0,0 +1,40 @@
+"""Add the materialised citation graph
+
+Revision ID: e5f2b7a13c90
+Revises: d4a09c3e6b58
+Create Date: 2026-10-19 11:20:13.604420
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e5f2b7a13c90"
+down_revision = "d4a09c3e6b58"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "citation_edge",
+        sa.Column("pmid", sa.Integer(), nullable=False),
+        sa.Column("ref_type", sa.String(length=21), nullable=False),
+        sa.Column("ref_pmid", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["pmid"], ["citation.pmid"], onupdate="CASCADE", ondelete="CASCADE", initially="DEFERRED", deferrable=True
+        ),
+        sa.PrimaryKeyConstraint("pmid", "ref_type", "ref_pmid"),
+    )
+    op.create_index("ix_citation_edge_ref_pmid_ref_type", "citation_edge", ["ref_pmid", "ref_type"], unique=False)
+    # edges for anything already loaded
+    op.execute(
+        "INSERT INTO citation_edge (pmid, ref_type, ref_pmid)"
+        " SELECT DISTINCT pmid, ref_type, pmid_version FROM comment WHERE pmid_version IS NOT NULL"
+    )
+
+
+def downgrade():
+    op.drop_index("ix_citation_edge_ref_pmid_ref_type", table_name="citation_edge")
+    op.drop_table("citation_edge")
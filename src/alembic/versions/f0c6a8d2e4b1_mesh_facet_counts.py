@@ -0,0 +1,52 @@
+"""Add MeSH facet summary tables
+
+Revision ID: f0c6a8d2e4b1
+Revises: e5f2b7a13c90
+Create Date: 2026-10-19 11:58:36.902345
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "f0c6a8d2e4b1"
+down_revision = "e5f2b7a13c90"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "mesh_year_count",
+        sa.Column("descriptor_ui", sa.String(length=10), nullable=False),
+        sa.Column("pub_date_year", sa.Integer(), nullable=False),
+        sa.Column("citation_count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("descriptor_ui", "pub_date_year"),
+    )
+    op.create_index(op.f("ix_mesh_year_count_pub_date_year"), "mesh_year_count", ["pub_date_year"], unique=False)
+    op.create_table(
+        "mesh_qualifier_count",
+        sa.Column("descriptor_ui", sa.String(length=10), nullable=False),
+        sa.Column("qualifier_ui", sa.String(length=10), nullable=False),
+        sa.Column("citation_count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("descriptor_ui", "qualifier_ui"),
+    )
+    op.create_table(
+        "mesh_cooccurrence",
+        sa.Column("descriptor_ui_a", sa.String(length=10), nullable=False),
+        sa.Column("descriptor_ui_b", sa.String(length=10), nullable=False),
+        sa.Column("citation_count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("descriptor_ui_a", "descriptor_ui_b"),
+    )
+    op.create_index(
+        op.f("ix_mesh_cooccurrence_descriptor_ui_b"), "mesh_cooccurrence", ["descriptor_ui_b"], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index(op.f("ix_mesh_cooccurrence_descriptor_ui_b"), table_name="mesh_cooccurrence")
+    op.drop_table("mesh_cooccurrence")
+    op.drop_table("mesh_qualifier_count")
+    op.drop_index(op.f("ix_mesh_year_count_pub_date_year"), table_name="mesh_year_count")
+    op.drop_table("mesh_year_count")
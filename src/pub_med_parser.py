@@ -1,22 +1,27 @@
 import datetime
 import gzip
 import os
+import sys
 import time
 import traceback
 import warnings
 import xml.etree.cElementTree as etree
-from multiprocessing import Pool
+from functools import partial
 
-from sqlalchemy import create_engine
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import Session
 
-from pubmedpg import ensure_id_files
-from pubmedpg.core.config import settings
+from pubmedpg import ensure_id_files, find_xml_paths, iter_articles, split_article
+from pubmedpg.crud.facets import rebuild_facets
 from pubmedpg.db.base import Base
+from pubmedpg.dimensions import DimensionCache
+from pubmedpg.interning import intern_text
+from pubmedpg.manifest import load_manifest
+from pubmedpg.memory import governed_map, recommend_workers, worker_limit
 from pubmedpg.models.pubmed import (
     Abstract,
     Accession,
+    ArticleIdentifier,
     Author,
     Chemical,
     Citation,
@@ -37,36 +42,36 @@ from pubmedpg.models.pubmed import (
     PersonalName,
     PublicationType,
     Qualifier,
+    QuarantinedRecord,
     SpaceFlight,
     SupplMeshName,
-    XmlFile,
 )
+from pubmedpg.normalise import FieldNormaliser, author_key, identifier_value, page_range
+from pubmedpg.pmid_index import INDEX_FILE_NAME, PmidIndex
+from pubmedpg.pool import release, rss_mb, share, shared, worker_pool
+from pubmedpg.sinks import make_sink, process_engine
+from pubmedpg.workqueue import LEASE_SECONDS, Heartbeat, claim, complete, enqueue, worker_id
 
-sync_engine = create_engine(settings.SQLALCHEMY_DATABASE_URI)
-# a sessionmaker(), also in the same scope as the engine
-sync_session = Session(sync_engine)
+_sync_engine = None
+
+
+def get_sync_engine():
+    """
+    The engine of the launching process, created on first use so that importing this module, and work that needs no
+    database, does not need database settings
+    """
+    global _sync_engine
+    if _sync_engine is None:
+        from pubmedpg.core.config import settings
+
+        _sync_engine = create_engine(settings.SQLALCHEMY_DATABASE_URI)
+    return _sync_engine
 
 
 WARNING_LEVEL = "always"  # error, ignore, always, default, module, once
 # multiple processes, #processors-1 is optimal!
 warnings.simplefilter(WARNING_LEVEL)
 
-# convert 3 letter code of months to digits for unique publication format
-MONTH_CODE = {
-    "Jan": "01",
-    "Feb": "02",
-    "Mar": "03",
-    "Apr": "04",
-    "May": "05",
-    "Jun": "06",
-    "Jul": "07",
-    "Aug": "08",
-    "Sep": "09",
-    "Oct": "10",
-    "Nov": "11",
-    "Dec": "12",
-}
-
 
 def es(xml_node, length, default=None):
     if xml_node is None or xml_node.text is None:
@@ -84,17 +89,8 @@ def init_person(person_node, person):
     return person
 
 
-def get_date(elem):
-    # Kersten: some dates are given in 3-letter code - use dictionary MONTH_CODE for conversion to digits:
-    try:
-        date = datetime.date(int(elem.find("Year").text), int(elem.find("Month").text), int(elem.find("Day").text))
-    except Exception:
-        date = datetime.date(
-            int(elem.find("Year").text),
-            int(MONTH_CODE[elem.find("Month").text]),
-            int(elem.find("Day").text),
-        )
-    return date
+def add_date(fields, obj, attr, elem):
+    fields.add_date(obj, attr, elem.findtext("Year"), elem.findtext("Month"), elem.findtext("Day"))
 
 
 def set_abstracts(db_citation: Citation, elem):
@@ -153,25 +149,24 @@ def set_keywords(db_citation, elem):
         pass
 
     keywords = []
-    all_keywords = []
+    # some documents contain duplicate keywords which would lead to a key error, a set keeps the check O(1) for
+    # records with thousands of them
+    all_keywords = set()
     for subelem in elem:
-        # some documents contain duplicate keywords which would lead to a key error - if-clause
-        if subelem.text not in all_keywords:
-            all_keywords.append(subelem.text[:1000] if subelem.text is not None else None)
-        else:
+        if subelem.text is None:
+            continue
+        keyword = subelem.text[:1000]
+        if keyword in all_keywords:
             continue
+        all_keywords.add(keyword)
         db_keyword = Keyword()
-        if subelem.text is not None:
-            db_keyword.keyword = subelem.text[:1000]
+        db_keyword.keyword = keyword
         # catch KeyError in case there is no MajorTopicYN attribute before committing db_citation
         try:
             db_keyword.keyword_major_yn = subelem.attrib["MajorTopicYN"]
         except Exception:
             pass
-
-        # null check for keyword
-        if db_keyword.keyword is not None:
-            keywords.append(db_keyword)
+        keywords.append(db_keyword)
     db_citation.keywords = keywords
 
 
@@ -181,20 +176,20 @@ def set_suppl_mesh_list(db_citation, elem):
     db_citation.suppl_mesh_names = []
     for suppl_mesh in elem:
         db_suppl_mesh_name = SupplMeshName()
-        db_suppl_mesh_name.suppl_mesh_name = es(suppl_mesh, 80)
-        db_suppl_mesh_name.suppl_mesh_name_ui = suppl_mesh.attrib["UI"]
-        db_suppl_mesh_name.suppl_mesh_name_type = suppl_mesh.attrib["Type"]
+        db_suppl_mesh_name.suppl_mesh_name = intern_text(es(suppl_mesh, 80))
+        db_suppl_mesh_name.suppl_mesh_name_ui = intern_text(suppl_mesh.attrib["UI"])
+        db_suppl_mesh_name.suppl_mesh_name_type = intern_text(suppl_mesh.attrib["Type"])
         db_citation.suppl_mesh_names.append(db_suppl_mesh_name)
 
 
 def set_journal_issn(db_journal, elem):
     if elem.tag != "ISSN":
         return
-    db_journal.issn = elem.text
-    db_journal.issn_type = elem.attrib["IssnType"]
+    db_journal.issn = intern_text(elem.text)
+    db_journal.issn_type = intern_text(elem.attrib["IssnType"])
 
 
-def set_journal_main_info(db_journal, elem, pubmed_id, db_xml_file):
+def set_journal_main_info(db_journal, elem, fields):
     if elem.tag not in ["JournalIssue", "Book"]:
         return
 
@@ -203,39 +198,28 @@ def set_journal_main_info(db_journal, elem, pubmed_id, db_xml_file):
     if elem.find("Issue") is not None:
         db_journal.issue = elem.find("Issue").text
 
-    # ensure pub_date_year with boolean year:
-    year = False
+    # the year comes from Year, or failing that from the start or end of the MedlineDate string
+    year = None
+    medline_date = None
     for subelem in elem.find("PubDate"):
         if subelem.tag == "MedlineDate":
             db_journal.medline_date = es(subelem, 40)
+            medline_date = subelem.text
         elif subelem.tag == "Year":
-            year = True
-            db_journal.pub_date_year = int(subelem.text) if subelem.text else None
+            year = subelem.text
         elif subelem.tag == "Month":
-            if subelem.text in MONTH_CODE:
-                db_journal.pub_date_month = MONTH_CODE[subelem.text]
-            else:
-                db_journal.pub_date_month = subelem.text
+            fields.add_month(db_journal, subelem.text)
         elif subelem.tag == "Day":
             db_journal.pub_date_day = subelem.text
-    # try to cast year from beginning of MedlineDate string
-    if not year:
-        try:
-            db_journal.pub_date_year = int(subelem.text[0:4])
-        except Exception:
-            try:
-                db_journal.pub_date_year = int(subelem.text[-4:])
-            except Exception:
-                print(f"Unable to get year for {pubmed_id=}: {db_xml_file.xml_file_name=}, {subelem.text=}")
-                pass
+    fields.add_pub_year(db_journal, year, medline_date)
 
 
-def set_journal_article_date(db_journal, elem):
+def set_journal_article_date(db_journal, elem, fields):
     # if there is the attribute ArticleDate, month and day are given
     if elem.tag != "ArticleDate":
         return
-    db_journal.pub_date_year = elem.find("Year").text
-    db_journal.pub_date_month = elem.find("Month").text
+    fields.add_pub_year(db_journal, elem.findtext("Year"))
+    fields.add_month(db_journal, elem.findtext("Month"))
     db_journal.pub_date_day = elem.find("Day").text
 
 
@@ -250,9 +234,9 @@ def set_journal_title_iso(db_journal, elem):
     if elem.tag != "Journal":
         return
     if elem.find("Title") is not None:
-        db_journal.title = elem.find("Title").text
+        db_journal.title = intern_text(elem.find("Title").text)
     if elem.find("ISOAbbreviation") is not None:
-        db_journal.iso_abbreviation = elem.find("ISOAbbreviation").text
+        db_journal.iso_abbreviation = intern_text(elem.find("ISOAbbreviation").text)
 
 
 def set_article_title(db_citation, elem):
@@ -278,6 +262,7 @@ def set_authors(db_citation, elem):
     for author in elem:
         db_author = init_person(author, Author())
         db_author.collective_name = es(author.find("CollectiveName"), 2700)
+        db_author.name_key = author_key(db_author.last_name, db_author.fore_name, db_author.initials)
         db_citation.authors.append(db_author)
 
 
@@ -326,10 +311,10 @@ def set_chemicals(db_citation, elem):
     for chemical in elem:
         db_chemical = Chemical()
         if chemical.find("RegistryNumber") is not None:
-            db_chemical.registry_number = chemical.find("RegistryNumber").text
+            db_chemical.registry_number = intern_text(chemical.find("RegistryNumber").text)
         if chemical.find("NameOfSubstance") is not None:
-            db_chemical.name_of_substance = chemical.find("NameOfSubstance").text
-            db_chemical.substance_ui = chemical.find("NameOfSubstance").attrib["UI"]
+            db_chemical.name_of_substance = intern_text(chemical.find("NameOfSubstance").text)
+            db_chemical.substance_ui = intern_text(chemical.find("NameOfSubstance").attrib["UI"])
         db_citation.chemicals.append(db_chemical)
 
 
@@ -367,26 +352,29 @@ def set_journal_infos(db_citation, elem):
         return
     db_journal_info = JournalInfo()
     if elem.find("NlmUniqueID") is not None:
-        db_journal_info.nlm_unique_id = elem.find("NlmUniqueID").text
+        db_journal_info.nlm_unique_id = intern_text(elem.find("NlmUniqueID").text)
     if elem.find("Country") is not None:
-        db_journal_info.country = elem.find("Country").text
+        db_journal_info.country = intern_text(elem.find("Country").text)
     """#MedlineTA is just a name for the journal as an abbreviation
     Abstract with PubMed-ID 21625393 has no MedlineTA attributebut it has to be set in PostgreSQL, that is why "unknown" is inserted instead. There is just a <MedlineTA/> tag and the same information is given in  </JournalIssue> <Title>Biotechnology and bioprocess engineering : BBE</Title>, but this is not (yet) read in this parser -> line 173:
     """
     if elem.find("MedlineTA") is not None and elem.find("MedlineTA").text is None:
         db_journal_info.medline_ta = "unknown"
     elif elem.find("MedlineTA") is not None:
-        db_journal_info.medline_ta = elem.find("MedlineTA").text
+        db_journal_info.medline_ta = intern_text(elem.find("MedlineTA").text)
     db_citation.journal_infos = [db_journal_info]
 
 
 def set_citation_subsets(db_citation, elem):
-    if elem.tag != "CitationSubset":
+    # CitationSubset is repeated directly under MedlineCitation, there is no list element
+    if elem.tag != "CitationSubset" or elem.text is None:
         return
-    db_citation.citation_subsets = []
-    for subelem in elem:
-        db_citation_subset = CitationSubset(subelem.text)
-        db_citation.citation_subsets.append(db_citation_subset)
+    # a repeated subset would violate the (pmid, citation_subset) key
+    if any(subset.citation_subset == elem.text for subset in db_citation.citation_subsets):
+        return
+    db_citation_subset = CitationSubset()
+    db_citation_subset.citation_subset = intern_text(elem.text)
+    db_citation.citation_subsets.append(db_citation_subset)
 
 
 def set_mesh_headings(db_citation, elem):
@@ -398,17 +386,18 @@ def set_mesh_headings(db_citation, elem):
         db_mesh_heading = MeshHeading()
         mesh_desc = mesh.find("DescriptorName")
         if mesh_desc is not None:
-            db_mesh_heading.descriptor_name = mesh_desc.text
-            db_mesh_heading.descriptor_name_major_yn = mesh_desc.attrib["MajorTopicYN"]
-            db_mesh_heading.descriptor_ui = mesh_desc.attrib["UI"]
+            db_mesh_heading.descriptor_name = intern_text(mesh_desc.text)
+            db_mesh_heading.descriptor_name_major_yn = intern_text(mesh_desc.attrib["MajorTopicYN"])
+            # a few old records have no UI, DimensionCache.normalise leaves those out
+            db_mesh_heading.descriptor_ui = intern_text(mesh_desc.attrib.get("UI"))
         if mesh.find("QualifierName") is not None:
             mesh_quals = mesh.findall("QualifierName")
             for qual in mesh_quals:
                 db_qualifier = Qualifier()
-                db_qualifier.descriptor_name = mesh_desc.text
-                db_qualifier.qualifier_name = qual.text
-                db_qualifier.qualifier_name_major_yn = qual.attrib["MajorTopicYN"]
-                db_qualifier.qualifier_ui = qual.attrib["UI"]
+                db_qualifier.descriptor_name = db_mesh_heading.descriptor_name
+                db_qualifier.qualifier_name = intern_text(qual.text)
+                db_qualifier.qualifier_name_major_yn = intern_text(qual.attrib["MajorTopicYN"])
+                db_qualifier.qualifier_ui = intern_text(qual.attrib.get("UI"))
                 db_citation.qualifiers.append(db_qualifier)
         db_citation.meshheadings.append(db_mesh_heading)
 
@@ -424,6 +413,50 @@ def set_other_ids(db_citation: Citation, elem):
     db_citation.other_ids = other_ids
 
 
+def add_identifier(db_citation, id_type, value):
+    value = identifier_value(id_type, value)
+    # an identifier cut short would resolve to nothing, or to the wrong citation
+    if not id_type or value is None or len(value) > 200:
+        return
+    for db_identifier in db_citation.identifiers:
+        if db_identifier.id_type == id_type and db_identifier.id_value == value:
+            return
+    db_identifier = ArticleIdentifier()
+    db_identifier.id_type = intern_text(id_type)
+    db_identifier.id_value = value
+    db_citation.identifiers.append(db_identifier)
+
+
+def set_elocation_ids(db_citation, elem):
+    if elem.tag != "ELocationID" or elem.attrib.get("ValidYN", "Y") != "Y":
+        return
+    add_identifier(db_citation, elem.attrib.get("EIdType"), elem.text)
+
+
+def set_article_ids(db_citation, article):
+    # only the article's own ArticleIdList, the ReferenceList holds one per reference
+    for data in article:
+        if data.tag != "PubmedData" and data.tag != "PubmedBookData":
+            continue
+        for article_id in data.iterfind("ArticleIdList/ArticleId"):
+            id_type = article_id.attrib.get("IdType")
+            # the pmid itself
+            if id_type != "pubmed":
+                add_identifier(db_citation, id_type, article_id.text)
+
+
+def set_pagination(db_citation, elem):
+    if elem.tag == "StartPage":
+        db_citation.start_page = es(elem, 10)
+    elif elem.tag == "EndPage":
+        db_citation.end_page = es(elem, 10)
+    elif elem.tag == "MedlinePgn":
+        db_citation.medline_pgn = elem.text
+        # StartPage and EndPage come first where they are given
+        if db_citation.start_page is None:
+            db_citation.start_page, db_citation.end_page = page_range(elem.text)
+
+
 def set_other_abstracts(db_citation: Citation, elem):
     if elem.tag != "OtherAbstract":
         return
@@ -441,14 +474,14 @@ def set_publication_types(db_citation, elem):
     if elem.tag != "PublicationTypeList":
         return
     publication_types = []
-    all_publication_types = []
+    all_publication_types = set()
     for subelem in elem:
         # check for unique elements in PublicationTypeList
         if subelem.text not in all_publication_types:
             db_publication_type = PublicationType()
-            db_publication_type.publication_type = subelem.text
+            db_publication_type.publication_type = intern_text(subelem.text)
             publication_types.append(db_publication_type)
-            all_publication_types.append(subelem.text)
+            all_publication_types.add(subelem.text)
     db_citation.publication_types = publication_types
 
 
@@ -456,7 +489,7 @@ def set_languages(db_citation, elem):
     if elem.tag != "Language":
         return
     db_language = Language()
-    db_language.language = elem.text
+    db_language.language = intern_text(elem.text)
     db_citation.languages = [db_language]
 
 
@@ -472,30 +505,32 @@ def set_databanks_accessions(db_citation, elem):
     db_citation.accessions = []
     db_citation.databanks = []
 
-    all_databanks = []
+    # data_bank_name -> set of its accession numbers, which also tells which data banks we already have
     all_acc_numbers = {}
 
     for databank in elem:
         temp_name = databank.find("DataBankName").text
-        # check unique data_bank_name per PubMed ID and not null
-        if temp_name is not None and temp_name not in all_databanks:
+        if temp_name is None:
+            continue
+        # check unique data_bank_name per PubMed ID
+        if temp_name not in all_acc_numbers:
             db_data_bank = DataBank()
-            db_data_bank.data_bank_name = temp_name
+            db_data_bank.data_bank_name = intern_text(temp_name)
             db_citation.databanks.append(db_data_bank)
-            all_databanks.append(temp_name)
-            all_acc_numbers[temp_name] = []
-
+            all_acc_numbers[temp_name] = set()
         acc_numbers = databank.find("AccessionNumberList")
-
-        if acc_numbers is not None and temp_name is not None:
-            for acc_number in acc_numbers:
-                # check unique accession number per PubMed ID and data_bank_name
-                if acc_number.text and acc_number.text not in all_acc_numbers[temp_name]:
-                    db_accession = Accession()
-                    db_accession.data_bank_name = db_data_bank.data_bank_name
-                    db_accession.accession_number = es(acc_number, 200)
-                    db_citation.accessions.append(db_accession)
-                    all_acc_numbers[temp_name].append(es(acc_number, 200))
+        if acc_numbers is None:
+            continue
+        seen = all_acc_numbers[temp_name]
+        for acc_number in acc_numbers:
+            accession_number = es(acc_number, 200)
+            # check unique accession number per PubMed ID and data_bank_name
+            if accession_number and accession_number not in seen:
+                db_accession = Accession()
+                db_accession.data_bank_name = intern_text(temp_name)
+                db_accession.accession_number = accession_number
+                db_citation.accessions.append(db_accession)
+                seen.add(accession_number)
 
 
 def set_grants(db_citation, elem):
@@ -511,8 +546,8 @@ def set_grants(db_citation, elem):
         db_grants = Grant()
         db_grants.grantid = es(grant.find("GrantID"), 200)
         db_grants.acronym = es(grant.find("Acronym"), 20)
-        db_grants.agency = es(grant.find("Agency"), 200)
-        db_grants.country = es(grant.find("Country"), 200)
+        db_grants.agency = intern_text(es(grant.find("Agency"), 200))
+        db_grants.country = intern_text(es(grant.find("Country"), 200))
         db_citation.grants.append(db_grants)
 
 
@@ -539,34 +574,34 @@ def set_article(db_citation, elem):
 def set_owner_status(db_citation, elem):
     # catch KeyError in case there is no Owner or Status attribute before committing db_citation
     try:
-        db_citation.citation_owner = elem.attrib["Owner"]
+        db_citation.citation_owner = intern_text(elem.attrib["Owner"])
     except Exception:
         pass
     try:
-        db_citation.citation_status = elem.attrib["Status"]
+        db_citation.citation_status = intern_text(elem.attrib["Status"])
     except Exception:
         pass
 
 
-def set_citation_journal_values(db_citation, db_journal, elem, pubmed_id, db_xml_file):
+def set_citation_journal_values(db_citation, db_journal, elem, fields):
     if elem.tag == "DateCreated":
-        db_citation.date_created = get_date(elem)
+        add_date(fields, db_citation, "date_created", elem)
     if elem.tag == "DateCompleted":
-        db_citation.date_completed = get_date(elem)
+        add_date(fields, db_citation, "date_completed", elem)
     if elem.tag == "DateRevised":
-        db_citation.date_revised = get_date(elem)
+        add_date(fields, db_citation, "date_revised", elem)
     if elem.tag == "NumberOfReferences":
         db_citation.number_of_references = int(elem.text) if elem.text else 0
 
     set_journal_issn(db_journal, elem)
-    set_journal_main_info(db_journal, elem, pubmed_id, db_xml_file)
-    set_journal_article_date(db_journal, elem)
+    set_journal_main_info(db_journal, elem, fields)
+    set_journal_article_date(db_journal, elem, fields)
     set_journal_title(db_journal, elem)
     set_journal_title_iso(db_journal, elem)
 
     set_article_title(db_citation, elem)
-    if elem.tag == "MedlinePgn":
-        db_citation.medline_pgn = elem.text
+    set_pagination(db_citation, elem)
+    set_elocation_ids(db_citation, elem)
     set_authors(db_citation, elem)
     set_personal_names(db_citation, elem)
     set_investigators(db_citation, elem)
@@ -594,22 +629,105 @@ def set_citation_journal_values(db_citation, db_journal, elem, pubmed_id, db_xml
     set_suppl_mesh_list(db_citation, elem)
 
 
-good_entries = {}
+def _postorder(elem):
+    for child in elem:
+        yield from _postorder(child)
+    yield elem
 
 
-class MedlineParser:
-    def __init__(self, filepath):
-        self.filepath = filepath
-        engine = create_engine(settings.SQLALCHEMY_DATABASE_URI)
-        self.session = Session(engine)
+def citation_from_element(elem, fields, article=None):
+    """
+    Build a Citation from a complete MedlineCitation or BookDocument element, visiting its descendants in the order
+    iterparse ends them, with the identifiers of its `article` (see split_article) if given. Any exception concerns
+    this record only.
+    """
+    db_citation = Citation()
+    db_journal = Journal()
+    for node in _postorder(elem):
+        set_citation_journal_values(db_citation, db_journal, node, fields)
+    set_owner_status(db_citation, elem)
+    db_citation.journals = [db_journal]
+    db_citation.pmid = int(elem.find("PMID").text)
+    if article is not None:
+        set_article_ids(db_citation, article)
+    return db_citation
+
+
+def element_pmid(elem):
+    try:
+        return int(elem.find("PMID").text)
+    except Exception:
+        return None
 
-    def __del__(self):
-        if self.session:
-            self.session.close()
 
-    def already_parsed(self, xml_name):
-        a = self.session.query(XmlFile.xml_file_name).filter_by(xml_file_name=xml_name)
-        if a.all():
+def element_version(elem):
+    try:
+        return int(elem.find("PMID").attrib.get("Version") or 1)
+    except Exception:
+        return 1
+
+
+def file_stats(path, ok=True, error=None):
+    stats = {
+        "path": path,
+        "ok": ok,
+        "citations": 0,
+        "already_present": 0,
+        "quarantined": 0,
+        "unchanged": 0,
+        "filtered": 0,
+    }
+    if error is not None:
+        stats["error"] = error
+    return stats
+
+
+_run_state = {}
+
+
+def run_state(handle):
+    """
+    (PmidIndex, sink options) of the run `handle` belongs to, attached to once per worker, see run
+    """
+    if handle not in _run_state:
+        # a watching launcher starts a new run for every batch of files, let go of the previous one
+        for (_index_path, state_name), (latest, _sink_options) in _run_state.items():
+            latest.close()
+            release(state_name)
+        _run_state.clear()
+        index_path, state_name = handle
+        _run_state[handle] = (PmidIndex(index_path), shared(state_name))
+    return _run_state[handle]
+
+
+# the archived xml of a set of citations, with the file each is loaded from
+ARCHIVED_XML = (
+    "SELECT r.pmid, r.codec, r.raw_xml, x.xml_file_name FROM raw_article r"
+    " JOIN pmid_file_mapping m ON m.pmid = r.pmid JOIN xml_file x ON x.id = m.id_file WHERE r.pmid = ANY(:pmids)"
+)
+
+# citations are normalised and handed to the sink in batches of this size
+BATCH_SIZE = 1000
+
+
+class MedlineParser:
+    def __init__(self, filepath, sink=None, batch_size=BATCH_SIZE, latest=None, memory_limit=None, record_filter=None):
+        """
+        `latest` is the PmidIndex of the run, citations whose winning copy (highest Version, then latest file) is
+        elsewhere are skipped. Without it everything in the file is loaded. Past `memory_limit` MB of RSS, checked
+        after every batch, the sink is flushed early. With a RecordFilter only the records it matches are parsed, see
+        pubmedpg.filters.
+        """
+        self.filepath = filepath
+        self.latest = latest
+        self.memory_limit = memory_limit
+        self.record_filter = record_filter or None
+        self.sink = sink if sink is not None else make_sink("db")
+        self.batch_size = batch_size
+        self.fields = FieldNormaliser()
+
+    def already_parsed(self):
+        if self.sink.already_loaded(self.filepath):
             print(f"Processing file: {self.filepath}, {datetime.datetime.now()} already processed")
             return True
         return False
@@ -644,150 +762,504 @@ class MedlineParser:
         #     continue
         # else:
 
+    def write_batch(self, batch, xml_name):
+        self.fields.resolve(xml_name)
+        for db_citation in batch:
+            self.sink.write(db_citation)
+        batch.clear()
+
+    def check_memory(self, stats):
+        rss = rss_mb()
+        stats["peak_rss"] = max(stats.get("peak_rss", 0), rss)
+        if self.memory_limit is not None and rss > self.memory_limit:
+            self.sink.flush()
+            stats["early_flushes"] = stats.get("early_flushes", 0) + 1
+
+    def quarantine(self, pmid, elem):
+        self.sink.quarantine(pmid, etree.tostring(elem, encoding="unicode"), traceback.format_exc())
+        warnings.warn(f"\nFile: {self.filepath}\nQuarantined {pmid=}: {traceback.format_exc(limit=0).strip()}", Warning)
+
     def parse(self):
+        """
+        Parse and load the file, returning its stats: "citations" handed to the sink, "already_present" ones skipped
+        because they are in a later file, "quarantined" records that failed on their own, "ok" False with an "error"
+        if the file as a whole failed and nothing of it was kept, "unchanged" citations that were already stored as they
+        are and not written again, "filtered" records left out by the record filter, the "peak_rss" seen and any
+        "early_flushes".
+        """
+        stats = file_stats(self.filepath)
         try:
             xml_name = os.path.split(self.filepath)[-1]
-            if self.already_parsed(xml_name):
-                return True
+            if self.already_parsed():
+                return dict(stats, skipped=True)
             _file = self.filepath
             if os.path.splitext(self.filepath)[-1] == ".gz":
                 _file = gzip.open(_file, "rb")
 
-            # get an iterable
-            context = etree.iterparse(_file, events=("start", "end"))
-            # turn it into an iterator
-            context = iter(context)
+            self.sink.open(self.filepath)
 
-            # get the root element
-            event, root = next(context)
-
-            db_citation = Citation()
-            db_journal = Journal()
-
-            db_xml_file = XmlFile()
-            db_xml_file.xml_file_name = xml_name
-            db_xml_file.time_processed = datetime.datetime.now()
-
-            loop_counter = 0  # to check for memory usage each X loops
-            already_present = 0
-            pubmed_id = 0
             file_ids_processed = set()
-            for event, elem in context:
-                if event == "end":
-                    if elem.tag == "MedlineCitation" or elem.tag == "BookDocument":
-                        loop_counter += 1
-                        # if loop_counter % 2000 == 0:
-                        #     print(f"{xml_name=}: {loop_counter=}")
-                        set_owner_status(db_citation, elem)
-                        db_citation.journals = [db_journal]
-
-                        pubmed_id = int(elem.find("PMID").text)
-                        db_citation.pmid = pubmed_id
-
-                        try:
-                            if pubmed_id in file_ids_processed or good_entries.get(pubmed_id) != xml_name:
-                                already_present += 1
-                                db_citation = Citation()
-                                db_journal = Journal()
-                                elem.clear()
-                                continue
-                            file_ids_processed.add(pubmed_id)
-                            # self.manage_updates()
-                            db_citation.xml_files = [db_xml_file]  # adds an implicit add()
-                            self.session.add(db_citation)
-
-                        except IntegrityError as error:
-                            warnings.warn(f"\nFile: {db_xml_file.xml_file_name}\nIntegrityError: {error}", Warning)
-                            self.session.rollback()
-                            raise
-                        except Exception as e:
-                            warnings.warn(f"\nFile: {db_xml_file.xml_file_name}\nUnknown error: {e}", Warning)
-                            self.session.rollback()
-                            raise
-
-                        db_citation = Citation()
-                        db_journal = Journal()
-                        elem.clear()
-                    set_citation_journal_values(db_citation, db_journal, elem, pubmed_id, db_xml_file)
-
-            self.session.commit()
+            batch = []
+            # each article is dropped from the tree once processed, memory does not grow with the file
+            for elem, article in iter_articles(_file):
+                pubmed_id = element_pmid(elem)
+                if pubmed_id is not None and (
+                    pubmed_id in file_ids_processed
+                    or (self.latest is not None and not self.latest.wins(pubmed_id, xml_name, element_version(elem)))
+                ):
+                    stats["already_present"] += 1
+                    continue
+                if self.record_filter is not None and not self.record_filter(elem):
+                    stats["filtered"] += 1
+                    if pubmed_id is not None:
+                        self.sink.drop(pubmed_id)
+                        file_ids_processed.add(pubmed_id)
+                    continue
+                try:
+                    batch.append(citation_from_element(elem, self.fields, article))
+                except Exception:
+                    self.quarantine(pubmed_id, article)
+                    stats["quarantined"] += 1
+                else:
+                    self.sink.archive(batch[-1].pmid, article)
+                file_ids_processed.add(pubmed_id)
+                if len(batch) >= self.batch_size:
+                    stats["citations"] += len(batch)
+                    self.write_batch(batch, xml_name)
+                    self.check_memory(stats)
+
+            stats["citations"] += len(batch)
+            self.write_batch(batch, xml_name)
+            self.check_memory(stats)
+            self.sink.close()
+            stats["peak_rss"] = max(stats["peak_rss"], rss_mb())
+            # the sink may have quarantined more, records that only failed when flushed
+            failed_on_flush = len(self.sink.quarantined) - stats["quarantined"]
+            stats["citations"] -= failed_on_flush
+            stats["quarantined"] += failed_on_flush
+            stats["unchanged"] = len(self.sink.unchanged)
             print(
-                f"Finishing file: {self.filepath}, {datetime.datetime.now()} with {loop_counter=} citations"
-                f" {already_present=}."
+                f"Finishing file: {self.filepath}, {datetime.datetime.now()} with {stats['citations']} citations"
+                f" already_present={stats['already_present']} quarantined={stats['quarantined']}"
+                f" unchanged={stats['unchanged']} filtered={stats['filtered']}."
             )
-            return True
+            return stats
+        except Exception as e:
+            warnings.warn(f"\nFile: {self.filepath}\nUnknown error: {e}", Warning)
+            traceback.print_exc()
+            self.sink.close(ok=False)
+            return dict(stats, ok=False, error=f"{type(e).__name__}: {e}")
+
+    def retry(self, records):
+        """
+        Reparse [(pmid, raw xml)] quarantined from this file, or archived, into a sink that was `resume`d for it.
+        Records quarantined without their xml are read back from the file. Records whose winning copy is now elsewhere,
+        going by `latest` or else by the sink, are let go rather than loaded over the newer copy. Returns stats as
+        `parse` does.
+        """
+        stats = file_stats(self.filepath)
+        try:
+            # whole articles, or only the MedlineCitation for records quarantined before identifiers were parsed
+            elements = [split_article(etree.fromstring(raw_xml)) for _pmid, raw_xml in records if raw_xml is not None]
+            missing = {pmid for pmid, raw_xml in records if raw_xml is None}
+            if missing:
+                _file = gzip.open(self.filepath, "rb") if self.filepath.endswith(".gz") else self.filepath
+                for elem, article in iter_articles(_file):
+                    if element_pmid(elem) in missing:
+                        elements.append((elem, article))
+            pmids = [element_pmid(elem) for elem, _article in elements]
+            if self.latest is not None:
+                superseded = {
+                    pmid
+                    for (elem, _article), pmid in zip(elements, pmids)
+                    if not self.latest.wins(pmid, self.sink.xml_name, element_version(elem))
+                }
+            else:
+                superseded = self.sink.loaded_later(pmids)
+            self.sink.superseded.extend(superseded)
+            batch = []
+            for (elem, article), pmid in zip(elements, pmids):
+                if pmid in superseded:
+                    stats["already_present"] += 1
+                    continue
+                try:
+                    batch.append(citation_from_element(elem, self.fields, article))
+                except Exception:
+                    self.quarantine(element_pmid(elem), article)
+                else:
+                    self.sink.archive(batch[-1].pmid, article)
+            self.write_batch(batch, self.sink.xml_name)
+            self.sink.close()
+            stats["quarantined"] = len(self.sink.quarantined)
+            stats["citations"] = len(elements) - stats["quarantined"] - stats["already_present"]
+            stats["unchanged"] = len(self.sink.unchanged)
+            return stats
         except Exception as e:
             warnings.warn(f"\nFile: {self.filepath}\nUnknown error: {e}", Warning)
             traceback.print_exc()
-            self.session.rollback()
-            return False
+            self.sink.close(ok=False)
+            return dict(stats, ok=False, error=f"{type(e).__name__}: {e}")
 
 
-def start_parser(path):
+def start_parser(path, sink="db", sink_options=None, latest=None, memory_limit=None, record_filter=None):
     """
     Used to start MultiProcessor Parsing
     """
     print(f"Processing file: {path=}, {datetime.datetime.now()}, pid: {os.getpid()=}")
-    MedlineParser(path).parse()
-    return True
+    return MedlineParser(
+        path,
+        make_sink(sink, **(sink_options or {})),
+        latest=latest,
+        memory_limit=memory_limit,
+        record_filter=record_filter,
+    ).parse()
+
+
+def load_file(path, handle, sink="db", memory_limit=None, record_filter=None):
+    """
+    Pool task loading one file with the shared state of the run
+    """
+    latest, sink_options = run_state(handle)
+    return dict(start_parser(path, sink, sink_options, latest, memory_limit, record_filter), rss=rss_mb())
+
+
+def print_summary(results, memory_budget=None):
+    failed = [stats for stats in results if not stats["ok"]]
+    quarantined = [stats for stats in results if stats["quarantined"]]
+    citations = sum(stats["citations"] for stats in results)
+    records = sum(stats["quarantined"] for stats in results)
+    print("############################################################")
+    print(
+        f"{len(results)} files, {citations} citations loaded, {len(failed)} files failed, {records} records quarantined"
+    )
+    filtered = sum(stats["filtered"] for stats in results)
+    if filtered:
+        print(f"{filtered} records left out by the record filter")
+    unchanged = sum(stats["unchanged"] for stats in results)
+    if unchanged:
+        print(
+            f"{citations - unchanged} citations changed, {unchanged} unchanged and not written again"
+            f" ({unchanged / citations:.0%} unchanged)"
+        )
+    for stats in failed:
+        print(f"Failed: {stats['path']}: {stats['error']}")
+    for stats in quarantined:
+        print(f"Quarantined: {stats['path']}: {stats['quarantined']} records")
+    if records:
+        print("Retry the quarantined records with PMPG_RETRY_QUARANTINED=true")
+    rss = [stats["rss"] for stats in results if "rss" in stats]
+    if rss:
+        print(f"Worker RSS after a file: {min(rss):.0f} to {max(rss):.0f} MB")
+    peaks = [stats["peak_rss"] for stats in results if "peak_rss" in stats]
+    if peaks:
+        early = sum(stats.get("early_flushes", 0) for stats in results)
+        print(f"Peak worker RSS in a file: {max(peaks):.0f} MB, {early} early flushes")
+    workers = recommend_workers(results, memory_budget)
+    if workers is not None:
+        print(f"{workers} workers fit in the memory budget of {memory_budget:.0f} MB at that peak")
 
 
 def refresh_tables():
     try:
-        Base.metadata.drop_all(sync_engine)
-        Base.metadata.create_all(sync_engine)
+        Base.metadata.drop_all(get_sync_engine())
+        Base.metadata.create_all(get_sync_engine())
     except Exception:
         print("Can't refresh tables")
         raise
 
 
-def run(medline_path, clean, start, end, processes, baseline):
+def queue_worker(_n, paths, handle, lease=LEASE_SECONDS, sink="db", memory_limit=None, record_filter=None):
+    """
+    Claim files from the work queue and load them until there are none left, `paths` maps the file names to where
+    they are on this machine
+    """
+    engine = process_engine()
+    worker = worker_id()
+    results = []
+    while (xml_name := claim(engine, worker, lease)) is not None:
+        if xml_name not in paths:
+            stats = file_stats(xml_name, ok=False, error=f"{xml_name} not found under the medline path of {worker}")
+        else:
+            with Heartbeat(engine, xml_name, worker, lease):
+                stats = load_file(paths[xml_name], handle, sink, memory_limit, record_filter)
+        complete(engine, xml_name, worker, stats["ok"], stats.get("error"))
+        results.append(stats)
+    return results
+
+
+def load_files(
+    pool,
+    medline_path,
+    xml_paths,
+    todo,
+    processes,
+    sink="db",
+    sink_options=None,
+    normalised=False,
+    facets=False,
+    queue=False,
+    lease=LEASE_SECONDS,
+    memory_budget=None,
+    documents=False,
+    archive=False,
+    record_filter=None,
+):
+    """
+    Load the files of `todo` in `pool` and return their stats. `xml_paths` are all the files in load order, with their
+    id files written, which the PMID index is brought up to date with first. With a `memory_budget` in MB the files
+    are dispatched as the memory governor allows and the workers flush early, see pubmedpg.memory. Only the records
+    matching `record_filter` are loaded, see pubmedpg.filters.
+    """
+    print(f"Found {len(xml_paths)} files, loading ids.")
+    before = time.perf_counter()
+    index = PmidIndex.update(os.path.join(medline_path, INDEX_FILE_NAME), xml_paths)
+    print(f"Indexed {len(index)} PMIDs in {time.perf_counter() - before:.2f}s, parent RSS {rss_mb():.0f} MB")
+
+    # recorded with each file by either sink, so that a run with another filter loads it again
+    sink_options = dict(sink_options or {}, record_filter=repr(record_filter) if record_filter else None)
+    if sink == "db":
+        # one query for the whole run, workers then check their file against it without going to the db. Not
+        # with a queue, where another machine may load a file after we looked
+        session = Session(get_sync_engine())
+        sink_options["manifest"] = None if queue else load_manifest(session)
+        if normalised:
+            sink_options["dimensions"] = DimensionCache.load(session)
+        sink_options["facets"] = facets
+        sink_options["documents"] = documents
+        sink_options["archive"] = archive
+        session.close()
+    state = share(sink_options)
+    handle = (index.path, state.name)
+    memory_limit = worker_limit(memory_budget, processes)
+    if record_filter:
+        print(f"Loading only the records matching {record_filter}")
+
+    try:
+        if queue:
+            queued = enqueue(get_sync_engine(), todo, repr(record_filter) if record_filter else None)
+            print(f"Queued {queued} new or re-issued files")
+            paths = {os.path.basename(path): path for path in xml_paths}
+            worker = partial(
+                queue_worker,
+                paths=paths,
+                handle=handle,
+                lease=lease,
+                sink=sink,
+                memory_limit=memory_limit,
+                record_filter=record_filter,
+            )
+            result = pool.map_async(worker, range(processes), chunksize=1)
+            result.wait()
+            return [stats for worker_results in result.get() for stats in worker_results]
+        task = partial(load_file, handle=handle, sink=sink, memory_limit=memory_limit, record_filter=record_filter)
+        if memory_budget:
+            print(f"Memory budget {memory_budget:.0f} MB, workers flush early above {memory_limit:.0f} MB")
+            return governed_map(pool, task, todo, processes, memory_budget)
+        result = pool.map_async(task, todo, chunksize=1)
+        result.wait()
+        return result.get()
+    finally:
+        index.close()
+        state.close()
+        state.unlink()
+
+
+def run(
+    medline_path,
+    clean,
+    start,
+    end,
+    processes,
+    baseline,
+    sink="db",
+    sink_options=None,
+    normalised=False,
+    facets=False,
+    queue=False,
+    lease=LEASE_SECONDS,
+    memory_budget=None,
+    documents=False,
+    archive=False,
+    record_filter=None,
+):
+    """
+    Load the xml files under `medline_path`. With `queue` the files (after the start/end slice) are added to the
+    database work queue and the processes claim them from there, together with those of any other machine doing the
+    same against the same database, instead of loading the slice on their own.
+    """
     end = int(end) if end else None
 
-    if clean:
+    if clean and sink == "db":
         refresh_tables()
+    # a clean load counts the facets once at the end rather than file by file
+    rebuild = clean and facets and sink == "db"
+
+    xml_paths = find_xml_paths(medline_path)
+    # one pool for both passes, its workers come from a forkserver that has already imported this module
+    with worker_pool(processes, preload=["pub_med_parser"]) as pool:
+        print("First pass processing files, calculating existing ids")
+        ensure_id_files(xml_paths, processes, pool)
+        results = load_files(
+            pool,
+            medline_path,
+            xml_paths,
+            xml_paths[start:end],
+            processes,
+            sink,
+            sink_options,
+            normalised,
+            facets and not rebuild,
+            queue,
+            lease,
+            memory_budget,
+            documents,
+            archive,
+            record_filter,
+        )
+    if rebuild:
+        print("Rebuilding the MeSH facet counts")
+        rebuild_facets(get_sync_engine(), processes)
+    print_summary(results, memory_budget)
+    return results
+
+
+def watch(
+    medline_path,
+    processes,
+    sink="db",
+    sink_options=None,
+    normalised=False,
+    facets=False,
+    interval=60,
+    memory_budget=None,
+    documents=False,
+    archive=False,
+    record_filter=None,
+):
+    """
+    Load what is under `medline_path`, then keep loading the files arriving there, in sequence-number order, until
+    interrupted. The worker pool, its engines and the PMID index stay up in between, so a new update file is parsed
+    as soon as it is complete.
+    """
+    from pubmedpg.watch import Watcher
+
+    # watching before listing, nothing that arrives in between is missed
+    watcher = Watcher(medline_path, interval)
+    xml_paths = find_xml_paths(medline_path)
+    watcher.seen.update(xml_paths)
+    with worker_pool(processes, preload=["pub_med_parser"]) as pool:
+        ensure_id_files(xml_paths, processes, pool)
+        # catch up on whatever arrived while nothing was watching
+        options = dict(
+            sink=sink,
+            sink_options=sink_options,
+            normalised=normalised,
+            facets=facets,
+            documents=documents,
+            archive=archive,
+            record_filter=record_filter,
+        )
+        print_summary(
+            load_files(pool, medline_path, xml_paths, xml_paths, processes, memory_budget=memory_budget, **options),
+            memory_budget,
+        )
+        try:
+            while True:
+                new = watcher.poll()
+                if not new:
+                    continue
+                print(
+                    f"{datetime.datetime.now()}: {len(new)} new files,"
+                    f" {', '.join(os.path.basename(path) for path in new)}"
+                )
+                ensure_id_files(new, processes, pool)
+                xml_paths = xml_paths + new
+                print_summary(
+                    load_files(pool, medline_path, xml_paths, new, processes, memory_budget=memory_budget, **options),
+                    memory_budget,
+                )
+        except KeyboardInterrupt:
+            print("Stopped watching")
+        finally:
+            watcher.close()
+
+
+def retry_quarantined(medline_path, normalised=False, facets=False, documents=False, archive=False):
+    """
+    Reparse the quarantined records and load them into the files they came from. Records that fail again stay
+    quarantined with their new traceback, records superseded by a later file since are dropped.
+    """
+    session = Session(get_sync_engine())
+    records = {}
+    for record in session.query(QuarantinedRecord).order_by(QuarantinedRecord.id):
+        if record.pmid is None:
+            print(f"Not retrying a record without a PMID from {record.xml_file_name}, quarantined as {record.id}")
+            continue
+        records.setdefault(record.xml_file_name, {})[record.pmid] = record.raw_xml
+    dimensions = DimensionCache.load(session) if normalised else None
+    session.close()
+
+    xml_paths = find_xml_paths(medline_path)
+    paths = {os.path.basename(path): path for path in xml_paths}
+    latest = None
+    if xml_paths and os.path.exists(os.path.join(medline_path, INDEX_FILE_NAME)):
+        # which copies win as of the files there now, as a load would see it
+        ensure_id_files(xml_paths, 1)
+        latest = PmidIndex.update(os.path.join(medline_path, INDEX_FILE_NAME), xml_paths)
+    results = []
+    for xml_name, file_records in sorted(records.items()):
+        print(f"Retrying {len(file_records)} quarantined records from {xml_name}")
+        sink = make_sink("db", dimensions=dimensions, facets=facets, documents=documents, archive=archive)
+        try:
+            sink.resume(xml_name)
+        except Exception as e:
+            # e.g. the file was removed from xml_file since
+            results.append(file_stats(xml_name, ok=False, error=f"{type(e).__name__}: {e}"))
+            continue
+        # the index only knows the files under medline_path, the sink checks the others against the database
+        parser = MedlineParser(paths.get(xml_name, xml_name), sink, latest=latest if xml_name in paths else None)
+        results.append(parser.retry(list(file_records.items())))
+    if latest is not None:
+        latest.close()
+    print_summary(results)
+    return results
 
-    xml_paths = []
-    for root, _dirs, files in os.walk(medline_path):
-        for filename in files:
-            if filename.endswith(".xml") or filename.endswith(".xml.gz"):
-                xml_paths.append(os.path.join(root, filename))
-    xml_paths.sort()
-    print("First pass processing files, calculating existing ids")
-    ensure_id_files(xml_paths, processes)
-
-    print(f"Found {len(xml_paths)} files to parse, loading ids.")
-    for xml_ids_path in [f"{path}.txt" for path in xml_paths]:
-        with open(xml_ids_path, "r") as f:
-            for line in f:
-                if line.strip():
-                    good_entries[int(line.split(":")[0].strip())] = os.path.basename(xml_ids_path).removesuffix(".txt")
-
-    with Pool(processes=processes) as pool:
-        result = pool.map_async(start_parser, xml_paths[start:end])
-        result.wait()
-        result.get()
 
-    # without multiprocessing:
-    # for path in paths:
-    #    _start_parser(( path, existing,))
+def reparse(pmids, normalised=False, facets=False, documents=False, batch_size=10000):
+    """
+    Run the current parser over the archived xml of `pmids` and load what it makes of them in place of their
+    citations, without the source files. Citations that come out as they were are skipped by their content hash, and
+    those a later file was loaded for in the meantime are left to it. Citations without archived xml, loaded without
+    --archive, are counted and left alone.
+    """
+    from pubmedpg.archive import decompress
+
+    session = Session(get_sync_engine())
+    dimensions = DimensionCache.load(session) if normalised else None
+    pmids = sorted(set(pmids))
+    results = []
+    missing = 0
+    for start in range(0, len(pmids), batch_size):
+        end = start + batch_size
+        records = {}
+        for pmid, codec, raw_xml, xml_name in session.execute(text(ARCHIVED_XML), {"pmids": pmids[start:end]}):
+            records.setdefault(xml_name, []).append((pmid, decompress(raw_xml, codec)))
+        missing += len(pmids[start:end]) - sum(len(file_records) for file_records in records.values())
+        for xml_name, file_records in sorted(records.items()):
+            print(f"Reparsing {len(file_records)} archived citations from {xml_name}")
+            sink = make_sink("db", dimensions=dimensions, facets=facets, documents=documents, archive=True)
+            sink.resume(xml_name)
+            results.append(MedlineParser(xml_name, sink).retry(file_records))
+        session.rollback()
+    session.close()
+    if missing:
+        print(f"{missing} of {len(pmids)} PMIDs have no archived xml and were not reparsed")
+    print_summary(results)
+    return results
 
 
 if __name__ == "__main__":
-    start = os.environ.get("PMPG_FILELIST_START", 0)
-    end = os.environ.get("PMPG_FILELIST_END", None)
-    processes = os.environ.get("PMPG_PROCESSES", 2)
-    baseline = str(os.environ.get("PMPG_BASELINE", False)).lower() == "true"
-    medline_path = os.environ.get("PMPG_MEDLINE_PATH", "data/xmls/")
-    clean = str(os.environ.get("PMPG_CLEAN", False)).lower() == "true"
-
-    print(f"Launching with {start=}, {end=}, {processes=}, {medline_path=}, {clean=}, {baseline=}")
-    # log start time of programme:
-    before = time.asctime()
-    run(medline_path, clean, int(start), end, int(processes), baseline)
-    # end time programme
-    after = time.asctime()
+    from pubmedpg.cli import main
 
-    print("############################################################")
-    print(f"Programme started: {before} - ended: {after}")
-    print("############################################################")
+    # configured through the PMPG_* environment variables, see .env.example and pubmedpg.cli
+    main(sys.argv[1:])
@@ -4,12 +4,116 @@ import traceback
 import xml.etree.cElementTree as etree
 from multiprocessing import Pool
 
+from pubmedpg.manifest import file_signature
+
 __version__ = "0.1.0"
 
+# the last line of an id file, written only once all the ids are in, e.g.
+# #count=30000 size=21334563 mtime=1645488000000000000 md5=0e0f...
+TRAILER_PREFIX = "#"
+
+CITATION_TAGS = ("MedlineCitation", "BookDocument")
+
+
+def find_xml_paths(medline_path):
+    xml_paths = []
+    for root, _dirs, files in os.walk(medline_path):
+        for filename in files:
+            if filename.endswith(".xml") or filename.endswith(".xml.gz"):
+                xml_paths.append(os.path.join(root, filename))
+    xml_paths.sort()
+    return xml_paths
+
+
+def _trailer(count, xml_file):
+    signature = file_signature(xml_file)
+    mtime = os.stat(xml_file).st_mtime_ns
+    return f"{TRAILER_PREFIX}count={count} size={signature['size']} mtime={mtime} md5={signature['md5']}"
+
+
+def read_id_file(ids_path):
+    """
+    [(pmid, version)] from an id file, skipping the trailer
+    """
+    ids = []
+    with open(ids_path, "r") as f:
+        for line in f:
+            if line.strip() and not line.startswith(TRAILER_PREFIX):
+                pmid, version = line.split(":")
+                ids.append((int(pmid.strip()), version.strip()))
+    return ids
+
+
+def id_file_is_valid(xml_file):
+    """
+    True if `<xml_file>.txt` was completely written for the current content of `xml_file`: it must end with a trailer
+    whose id count matches the file and whose size and md5, or without an NLM .md5 file size and mtime, match the
+    source, so truncated id files and files that NLM re-issued under the same name are redone
+    """
+    ids_path = f"{xml_file}.txt"
+    if not os.path.exists(ids_path):
+        return False
+    count = 0
+    last = ""
+    with open(ids_path, "r") as f:
+        for line in f:
+            if line.strip():
+                count += 1
+                last = line.strip()
+    if not last.startswith(TRAILER_PREFIX):
+        return False
+    fields = dict(field.split("=", 1) for field in last.removeprefix(TRAILER_PREFIX).split())
+    signature = file_signature(xml_file, compute_md5=False)
+    if fields.get("count") != str(count - 1) or fields.get("size") != str(signature["size"]):
+        return False
+    if signature["md5"] is not None:
+        return fields.get("md5") == signature["md5"]
+    # without a .md5 file from NLM, rehashing every archive on every run is too slow, a file re-issued at the same
+    # size still has a new mtime
+    return fields.get("mtime") == str(os.stat(xml_file).st_mtime_ns)
+
+
+def split_article(elem):
+    """
+    (citation, article) for a PubmedArticle or PubmedBookArticle, the citation being its MedlineCitation or
+    BookDocument. A bare MedlineCitation or BookDocument is its own article. The citation is None for anything else,
+    e.g. a DeleteCitation.
+    """
+    if elem.tag in CITATION_TAGS:
+        return elem, elem
+    for tag in CITATION_TAGS:
+        citation = elem.find(tag)
+        if citation is not None:
+            return citation, elem
+    return None, elem
+
+
+def iter_articles(source):
+    """
+    (citation, article) pairs of an xml file or file object, see split_article, each yielded once the article has been
+    read. The article is then removed from the root, PubmedData and all, so however large the file only the article
+    being processed is in memory.
+    """
+    context = etree.iterparse(source, events=("start", "end"))
+    _event, root = next(context)
+    depth = 0
+    for event, elem in context:
+        if event == "start":
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 0:
+            continue
+        # a child of the root, an article or, in older files, the citation itself
+        citation, article = split_article(elem)
+        if citation is not None:
+            yield citation, article
+        root.remove(elem)
+
 
 def get_all_ids(xml_file):
     try:
-        if not os.path.exists(f"{xml_file}.txt"):
+        if not id_file_is_valid(xml_file):
             print(f"Processing {xml_file}")
         else:
             print(f"Not processing {xml_file}, already done")
@@ -17,18 +121,16 @@ def get_all_ids(xml_file):
 
         ids = []
         with gzip.open(xml_file, "rb") as f:
-            context = etree.iterparse(f, events=("start", "end"))
-            context = iter(context)
-            event, root = next(context)
-            for event, elem in context:
-                if event == "end":
-                    if elem.tag == "MedlineCitation" or elem.tag == "BookDocument":
-                        pmid_elem = elem.find("PMID")
-                        ids.append(f"{int(pmid_elem.text)}:{pmid_elem.attrib['Version']}")
-
-            with open(f"{xml_file}.txt", "w") as f:
+            for elem, _article in iter_articles(f):
+                pmid_elem = elem.find("PMID")
+                ids.append(f"{int(pmid_elem.text)}:{pmid_elem.attrib['Version']}")
+
+            # write then rename, so an interrupted run never leaves a partial id file behind
+            with open(f"{xml_file}.txt.tmp", "w") as f:
                 for fid in ids:
                     f.write(f"{fid}\n")
+                f.write(f"{_trailer(len(ids), xml_file)}\n")
+            os.replace(f"{xml_file}.txt.tmp", f"{xml_file}.txt")
     except Exception as e:
         print(e)
         traceback.print_exc()
@@ -36,7 +138,13 @@ def get_all_ids(xml_file):
     return True
 
 
-def ensure_id_files(paths, processes):
+def ensure_id_files(paths, processes, pool=None):
+    """
+    Write the missing or stale id files of `paths`, in `pool` if given, otherwise in a pool of `processes` workers
+    """
+    if pool is not None:
+        pool.map(get_all_ids, paths)
+        return
     with Pool(processes=processes) as pool:
         result = pool.map_async(get_all_ids, paths)
         result.get()
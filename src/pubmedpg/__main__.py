@@ -0,0 +1,3 @@
+from pubmedpg.cli import main
+
+main()
@@ -0,0 +1,105 @@
+"""
+    Compression of the raw xml of each PubmedArticle, kept in raw_article by the loader with --archive so that
+    `python -m pubmedpg reparse` can run the current parser over chosen citations without the source files.
+
+    An article is a few kB of xml that is mostly the same markup in every record, too little for a compressor to learn
+    from on its own, so each one is compressed against a preset dictionary of that markup (zlib's zdict, or a raw
+    content dictionary with the optional zstandard package, the archive extra). The codec is stored with every row and
+    both stay readable; ZDICT must therefore never change, a new dictionary would need a new codec name.
+"""
+import zlib
+
+# the markup and values common to most articles, the most frequent last where zlib finds them cheapest
+ZDICT = (
+    b'<DataBankList CompleteYN="Y"><DataBank><DataBankName>ClinicalTrials.gov</DataBankName><AccessionNumberList>'
+    b"<AccessionNumber></AccessionNumber></AccessionNumberList></DataBank></DataBankList>"
+    b'<GrantList CompleteYN="Y"><Grant><GrantID></GrantID><Acronym></Acronym><Agency>NIH HHS</Agency>'
+    b"<Country>United States</Country></Grant></GrantList>"
+    b'<SupplMeshList><SupplMeshName Type="Disease" UI=""></SupplMeshName></SupplMeshList>'
+    b'<ChemicalList><Chemical><RegistryNumber>0</RegistryNumber><NameOfSubstance UI="D"></NameOfSubstance></Chemical>'
+    b"</ChemicalList>"
+    b'<CommentsCorrectionsList><CommentsCorrections RefType="Cites"><RefSource></RefSource><PMID Version="1"></PMID>'
+    b"</CommentsCorrections></CommentsCorrectionsList>"
+    b'<ReferenceList><Reference><Citation></Citation><ArticleIdList><ArticleId IdType="pubmed"></ArticleId>'
+    b"</ArticleIdList></Reference></ReferenceList>"
+    b'<KeywordList Owner="NOTNLM"><Keyword MajorTopicYN="N"></Keyword></KeywordList>'
+    b'<CoiStatement></CoiStatement><PubmedData><History><PubMedPubDate PubStatus="received"><Year>20</Year>'
+    b'<Month></Month><Day></Day></PubMedPubDate><PubMedPubDate PubStatus="accepted"><Year>20</Year><Month></Month>'
+    b'<Day></Day></PubMedPubDate><PubMedPubDate PubStatus="entrez"><Year>20</Year><Month></Month><Day></Day><Hour>'
+    b'</Hour><Minute></Minute></PubMedPubDate><PubMedPubDate PubStatus="pubmed"><Year>20</Year><Month></Month><Day>'
+    b'</Day><Hour></Hour><Minute></Minute></PubMedPubDate><PubMedPubDate PubStatus="medline"><Year>20</Year><Month>'
+    b"</Month><Day></Day><Hour></Hour><Minute></Minute></PubMedPubDate></History>"
+    b'<PublicationStatus>ppublish</PublicationStatus><ArticleIdList><ArticleId IdType="pubmed"></ArticleId>'
+    b'<ArticleId IdType="doi">10.</ArticleId><ArticleId IdType="pii"></ArticleId><ArticleId IdType="pmc">PMC'
+    b"</ArticleId></ArticleIdList></PubmedData></PubmedArticle>"
+    b'<PubmedArticle><MedlineCitation Status="MEDLINE" IndexingMethod="Automated" Owner="NLM"><PMID Version="1">'
+    b"</PMID><DateCompleted><Year>20</Year><Month></Month><Day></Day></DateCompleted><DateRevised><Year>20</Year>"
+    b'<Month></Month><Day></Day></DateRevised><Article PubModel="Print-Electronic"><Journal>'
+    b'<ISSN IssnType="Electronic"></ISSN><JournalIssue CitedMedium="Internet"><Volume></Volume><Issue></Issue>'
+    b"<PubDate><Year>20</Year><Month></Month><Day></Day></PubDate></JournalIssue><Title></Title><ISOAbbreviation>"
+    b"</ISOAbbreviation></Journal><ArticleTitle></ArticleTitle><Pagination><StartPage></StartPage><EndPage>"
+    b'</EndPage><MedlinePgn></MedlinePgn></Pagination><ELocationID EIdType="doi" ValidYN="Y">10.</ELocationID>'
+    b'<ELocationID EIdType="pii" ValidYN="Y"></ELocationID><Abstract><AbstractText Label="BACKGROUND" '
+    b'NlmCategory="BACKGROUND"></AbstractText><AbstractText Label="METHODS" NlmCategory="METHODS"></AbstractText>'
+    b'<AbstractText Label="RESULTS" NlmCategory="RESULTS"></AbstractText><AbstractText Label="CONCLUSIONS" '
+    b'NlmCategory="CONCLUSIONS"></AbstractText><CopyrightInformation>Copyright \xc2\xa9 20 The Author(s). '
+    b'</CopyrightInformation></Abstract><AuthorList CompleteYN="Y"><Author ValidYN="Y"><LastName></LastName>'
+    b'<ForeName></ForeName><Initials></Initials><Identifier Source="ORCID">0000-000</Identifier><AffiliationInfo>'
+    b"<Affiliation>Department of , University of , </Affiliation></AffiliationInfo></Author></AuthorList>"
+    b'<Language>eng</Language><PublicationTypeList><PublicationType UI="D016428">Journal Article</PublicationType>'
+    b'<PublicationType UI="D013485">Research Support, Non-U.S. Gov\'t</PublicationType></PublicationTypeList>'
+    b'<ArticleDate DateType="Electronic"><Year>20</Year><Month></Month><Day></Day></ArticleDate></Article>'
+    b"<MedlineJournalInfo><Country>United States</Country><MedlineTA></MedlineTA><NlmUniqueID></NlmUniqueID>"
+    b"<ISSNLinking></ISSNLinking></MedlineJournalInfo><CitationSubset>IM</CitationSubset><MeshHeadingList>"
+    b'<MeshHeading><DescriptorName UI="D006801" MajorTopicYN="N">Humans</DescriptorName></MeshHeading>'
+    b'<MeshHeading><DescriptorName UI="D008297" MajorTopicYN="N">Male</DescriptorName></MeshHeading>'
+    b'<MeshHeading><DescriptorName UI="D005260" MajorTopicYN="N">Female</DescriptorName></MeshHeading>'
+    b'<MeshHeading><DescriptorName UI="D" MajorTopicYN="Y"></DescriptorName><QualifierName UI="Q" MajorTopicYN="N">'
+    b"</QualifierName></MeshHeading></MeshHeadingList></MedlineCitation>"
+)
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+
+_zstd = {}
+
+
+def _zstandard():
+    # (compressor, decompressor), created once per process
+    if not _zstd:
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("zstd archives require zstandard, install pubmedpg with the archive extra") from e
+        dictionary = zstandard.ZstdCompressionDict(ZDICT, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+        _zstd["compressor"] = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dictionary)
+        _zstd["decompressor"] = zstandard.ZstdDecompressor(dict_data=dictionary)
+    return _zstd["compressor"], _zstd["decompressor"]
+
+
+def default_codec():
+    """
+    "zstd" if zstandard is installed, otherwise "zlib"
+    """
+    try:
+        _zstandard()
+    except ImportError:
+        return "zlib"
+    return "zstd"
+
+
+def compress(raw_xml, codec="zlib"):
+    if codec == "zstd":
+        return _zstandard()[0].compress(raw_xml)
+    if codec == "zlib":
+        compressor = zlib.compressobj(ZLIB_LEVEL, zdict=ZDICT)
+        return compressor.compress(raw_xml) + compressor.flush()
+    raise ValueError(f"Unknown codec {codec!r}, expected 'zlib' or 'zstd'")
+
+
+def decompress(data, codec="zlib"):
+    if codec == "zstd":
+        return _zstandard()[1].decompress(data)
+    if codec == "zlib":
+        decompressor = zlib.decompressobj(zdict=ZDICT)
+        return decompressor.decompress(data) + decompressor.flush()
+    raise ValueError(f"Unknown codec {codec!r}, expected 'zlib' or 'zstd'")
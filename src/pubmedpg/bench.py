@@ -0,0 +1,147 @@
+"""
+    Stress benchmark for pathological MEDLINE records.
+
+    A handful of citations carry thousands of authors, investigators, keywords or DataBank accessions. This builds
+    synthetic records of a given size, a tenth of each list repeated so the per-record deduplication is exercised,
+    and times turning them into Citation objects with the same per-element setters the loader uses. Time per record
+    should grow linearly with the list size, e.g.
+
+        cd src; python -m pubmedpg.bench 1000 10000
+
+    `write_synthetic_file` writes whole files of such records, for checking that parsing a file takes the same memory
+    whatever its length.
+"""
+import gzip
+import io
+import sys
+import time
+
+from pubmedpg import iter_articles
+
+DATA_BANKS = ("GENBANK", "PDB", "ClinicalTrials.gov", "RefSeq")
+
+
+def _person(tag, i):
+    return (
+        f"<{tag} ValidYN='Y'><LastName>Lastname{i}</LastName><ForeName>Forename</ForeName><Initials>F</Initials>"
+        f"<AffiliationInfo><Affiliation>Institute {i % 50}</Affiliation></AffiliationInfo></{tag}>"
+    )
+
+
+def synthetic_article(pmid, size):
+    """
+    A PubmedArticle whose MedlineCitation has `size` authors, investigators, keywords, publication types and
+    accessions, with duplicates among the latter three and a repeated citation subset, followed by its PubmedData
+    """
+    unique = size - size // 10
+    authors = "".join(_person("Author", i) for i in range(size))
+    investigators = "".join(_person("Investigator", i) for i in range(size))
+    keywords = "".join(f"<Keyword MajorTopicYN='N'>keyword {i % unique}</Keyword>" for i in range(size))
+    publication_types = "".join(
+        f"<PublicationType UI='D{i % unique:06d}'>Type {i % unique}</PublicationType>" for i in range(size)
+    )
+    data_banks = "".join(
+        f"<DataBank><DataBankName>{name}</DataBankName><AccessionNumberList>"
+        + "".join(
+            f"<AccessionNumber>{name[:2]}{i % unique:08d}</AccessionNumber>" for i in range(n, size, len(DATA_BANKS))
+        )
+        + "</AccessionNumberList></DataBank>"
+        for n, name in enumerate(DATA_BANKS)
+    )
+    return (
+        "<PubmedArticle><MedlineCitation Status='MEDLINE' Owner='NLM'>"
+        f"<PMID Version='1'>{pmid}</PMID>"
+        "<DateCompleted><Year>2001</Year><Month>03</Month><Day>12</Day></DateCompleted>"
+        "<Article PubModel='Print'><Journal><ISSN IssnType='Print'>0000-0000</ISSN>"
+        "<JournalIssue CitedMedium='Print'><Volume>1</Volume><PubDate><Year>2000</Year><Month>Jan</Month></PubDate>"
+        "</JournalIssue><Title>Synthetic journal</Title><ISOAbbreviation>Synth J</ISOAbbreviation></Journal>"
+        f"<ArticleTitle>Synthetic record with {size} of everything</ArticleTitle>"
+        f"<AuthorList CompleteYN='Y'>{authors}</AuthorList><Language>eng</Language>"
+        f"<DataBankList CompleteYN='Y'>{data_banks}</DataBankList>"
+        f"<PublicationTypeList>{publication_types}</PublicationTypeList></Article>"
+        "<CitationSubset>IM</CitationSubset><CitationSubset>IM</CitationSubset>"
+        f"<KeywordList Owner='NOTNLM'>{keywords}</KeywordList>"
+        f"<InvestigatorList>{investigators}</InvestigatorList>"
+        "</MedlineCitation><PubmedData><History>"
+        "<PubMedPubDate PubStatus='pubmed'><Year>2000</Year><Month>1</Month><Day>1</Day></PubMedPubDate>"
+        "</History><PublicationStatus>ppublish</PublicationStatus><ArticleIdList>"
+        f"<ArticleId IdType='pubmed'>{pmid}</ArticleId><ArticleId IdType='doi'>10.0000/synth.{pmid}</ArticleId>"
+        "</ArticleIdList></PubmedData></PubmedArticle>"
+    )
+
+
+def synthetic_citation(pmid, size):
+    """
+    The bytes of a PubmedArticleSet holding the one synthetic_article
+    """
+    return f"<PubmedArticleSet>{synthetic_article(pmid, size)}</PubmedArticleSet>".encode()
+
+
+def write_synthetic_file(path, count, size=3):
+    """
+    Write a gzipped PubmedArticleSet of `count` synthetic articles with pmids 1 to `count`
+    """
+    with gzip.open(path, "wt", compresslevel=1) as f:
+        f.write("<PubmedArticleSet>")
+        for pmid in range(1, count + 1):
+            f.write(synthetic_article(pmid, size))
+        f.write("</PubmedArticleSet>")
+
+
+def parse_record(data):
+    """
+    Parse one synthetic record into a Citation, as MedlineParser.parse does, and return it
+    """
+    # the loader script lives next to the package, only needed when actually timing
+    from pub_med_parser import citation_from_element
+    from pubmedpg.normalise import FieldNormaliser
+
+    fields = FieldNormaliser()
+    for elem, article in iter_articles(io.BytesIO(data)):
+        db_citation = citation_from_element(elem, fields, article)
+        fields.resolve()
+        return db_citation
+
+
+def parse_file(path):
+    """
+    Run the loader's parse over a file, the citations going nowhere, and return its stats
+    """
+    from pub_med_parser import MedlineParser
+    from pubmedpg.sinks import Sink
+
+    class DiscardSink(Sink):
+        def write(self, db_citation):
+            pass
+
+    return MedlineParser(path, sink=DiscardSink()).parse()
+
+
+def time_records(sizes, repeat=3):
+    """
+    {size: best wall time in seconds of `repeat` runs of parse_record}
+    """
+    timings = {}
+    for size in sizes:
+        data = synthetic_citation(size, size)
+        best = None
+        for _ in range(repeat):
+            before = time.perf_counter()
+            parse_record(data)
+            elapsed = time.perf_counter() - before
+            best = elapsed if best is None else min(best, elapsed)
+        timings[size] = best
+    return timings
+
+
+def main(argv=None):
+    sizes = [int(size) for size in (argv or sys.argv[1:])] or [1000, 10000]
+    timings = time_records(sizes)
+    smallest = min(sizes)
+    for size, elapsed in timings.items():
+        ratio = elapsed / timings[smallest] if timings[smallest] else float("nan")
+        print(f"{size=}: {elapsed:.3f}s, {ratio:.1f}x the time of {smallest} for {size / smallest:.1f}x the size")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+    Command line entry point, `python -m pubmedpg <command>`, or `python pub_med_parser.py` as the container runs it.
+
+    Every option defaults to its PMPG_* environment variable, see .env.example. Without a command, the environment
+    picks one as it always has: retry with PMPG_RETRY_QUARANTINED, watch with PMPG_WATCH, export with PMPG_SINK=parquet,
+    otherwise load.
+    Nothing beyond the standard library is imported until a command needs it, and only the commands that go to the
+    database read the database settings, so `ids` and `bench` start fast and run without any.
+"""
+import argparse
+import os
+import sys
+import time
+
+
+def _env_flag(name):
+    return str(os.environ.get(name, False)).lower() == "true"
+
+
+def _add_file_options(parser):
+    parser.add_argument("--medline-path", default=os.environ.get("PMPG_MEDLINE_PATH", "data/xmls/"))
+    parser.add_argument("--processes", type=int, default=int(os.environ.get("PMPG_PROCESSES", 2)))
+
+
+def _add_memory_option(parser):
+    parser.add_argument(
+        "--memory-budget",
+        type=float,
+        default=float(os.environ.get("PMPG_MEMORY_BUDGET") or 0),
+        help="MB the loader and its workers keep within, by default the container's memory limit if there is one",
+    )
+
+
+def _add_filter_options(parser):
+    group = parser.add_argument_group(
+        "record filter", "load only the records matching all of these, see pubmedpg.filters"
+    )
+    group.add_argument("--filter-mesh", default=os.environ.get("PMPG_FILTER_MESH"), help="MeSH descriptor UIs")
+    group.add_argument(
+        "--filter-journals",
+        default=os.environ.get("PMPG_FILTER_JOURNALS"),
+        help="NLM unique ids, ISSNs or MedlineTA abbreviations",
+    )
+    group.add_argument("--filter-years", default=os.environ.get("PMPG_FILTER_YEARS"), help="2020, 2015- or 2010-2019")
+    group.add_argument("--filter-languages", default=os.environ.get("PMPG_FILTER_LANGUAGES"), help="e.g. eng,fre")
+
+
+def _record_filter(args):
+    from pubmedpg.filters import RecordFilter
+
+    try:
+        return RecordFilter(args.filter_mesh, args.filter_journals, args.filter_years, args.filter_languages) or None
+    except ValueError as e:
+        sys.exit(f"pubmedpg: invalid record filter: {e}")
+
+
+def _add_load_options(parser):
+    _add_file_options(parser)
+    parser.add_argument("--start", type=int, default=int(os.environ.get("PMPG_FILELIST_START", 0)))
+    parser.add_argument("--end", type=int, default=os.environ.get("PMPG_FILELIST_END") or None)
+    parser.add_argument("--normalised", action=argparse.BooleanOptionalAction, default=_env_flag("PMPG_NORMALISED"))
+    parser.add_argument("--facets", action=argparse.BooleanOptionalAction, default=_env_flag("PMPG_FACETS"))
+    parser.add_argument("--documents", action=argparse.BooleanOptionalAction, default=_env_flag("PMPG_DOCUMENTS"))
+    parser.add_argument("--archive", action=argparse.BooleanOptionalAction, default=_env_flag("PMPG_ARCHIVE"))
+    parser.add_argument("--queue", action=argparse.BooleanOptionalAction, default=_env_flag("PMPG_QUEUE"))
+    parser.add_argument("--lease", type=int, default=int(os.environ.get("PMPG_QUEUE_LEASE", 600)))
+    _add_memory_option(parser)
+    _add_filter_options(parser)
+
+
+def _run(args, clean=False, baseline=False, sink="db", sink_options=None):
+    from pub_med_parser import run
+    from pubmedpg.memory import memory_budget
+
+    budget = memory_budget(args.memory_budget)
+    print(
+        f"Launching with start={args.start}, end={args.end}, processes={args.processes},"
+        f" medline_path={args.medline_path!r}, {clean=}, {baseline=}, {sink=}, normalised={args.normalised},"
+        f" facets={args.facets}, documents={args.documents}, archive={args.archive}, queue={args.queue},"
+        f" memory_budget={budget}"
+    )
+    before = time.asctime()
+    run(
+        args.medline_path,
+        clean,
+        args.start,
+        args.end,
+        args.processes,
+        baseline,
+        sink,
+        sink_options,
+        args.normalised,
+        args.facets,
+        args.queue,
+        args.lease,
+        budget,
+        args.documents,
+        args.archive,
+        _record_filter(args),
+    )
+    after = time.asctime()
+
+    print("############################################################")
+    print(f"Programme started: {before} - ended: {after}")
+    print("############################################################")
+
+
+def ids(args):
+    from pubmedpg import ensure_id_files, find_xml_paths
+
+    ensure_id_files(find_xml_paths(args.medline_path), args.processes)
+
+
+def load(args):
+    _run(args, clean=args.clean, baseline=args.baseline)
+
+
+def update(args):
+    _run(args)
+
+
+def export(args):
+    _run(args, sink="parquet", sink_options={"path": args.parquet_path, "batch_size": args.batch_size})
+
+
+def watch(args):
+    from pub_med_parser import watch as watch_files
+    from pubmedpg.memory import memory_budget
+
+    watch_files(
+        args.medline_path,
+        args.processes,
+        normalised=args.normalised,
+        facets=args.facets,
+        interval=args.interval,
+        memory_budget=memory_budget(args.memory_budget),
+        documents=args.documents,
+        archive=args.archive,
+        record_filter=_record_filter(args),
+    )
+
+
+def verify(args):
+    from pub_med_parser import get_sync_engine
+    from pubmedpg.verify import verify as verify_files
+
+    if verify_files(get_sync_engine(), args.medline_path, args.processes, args.tables, _record_filter(args)):
+        sys.exit(1)
+
+
+def retry(args):
+    from pub_med_parser import retry_quarantined
+
+    retry_quarantined(args.medline_path, args.normalised, args.facets, args.documents, args.archive)
+
+
+def reparse(args):
+    from pub_med_parser import get_sync_engine
+    from pub_med_parser import reparse as reparse_pmids
+
+    pmids = list(args.pmids)
+    if args.query:
+        from sqlalchemy import text
+
+        with get_sync_engine().connect() as conn:
+            pmids.extend(row[0] for row in conn.execute(text(args.query)))
+    reparse_pmids(pmids, args.normalised, args.facets, args.documents)
+
+
+def rebuild(args):
+    from sqlalchemy.orm import Session
+
+    from pub_med_parser import get_sync_engine
+    from pubmedpg.crud import rebuild_citation_edges, rebuild_facets
+
+    engine = get_sync_engine()
+    if args.edges:
+        with Session(engine) as session:
+            rebuild_citation_edges(session)
+    if args.facets:
+        rebuild_facets(engine, args.processes)
+
+
+def requeue(args):
+    from pub_med_parser import get_sync_engine
+    from pubmedpg.workqueue import requeue as requeue_files
+
+    print(f"Put {requeue_files(get_sync_engine(), args.status)} {args.status} files back in the queue")
+
+
+def bench(args):
+    from pubmedpg.bench import main as bench_main
+
+    bench_main([str(size) for size in args.sizes])
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(prog="pubmedpg", description="Load MEDLINE/PubMed xml into PostgreSQL")
+    commands = parser.add_subparsers(dest="command")
+
+    command = commands.add_parser("ids", help="write the id file of every xml file that needs one")
+    _add_file_options(command)
+    command.set_defaults(func=ids)
+
+    command = commands.add_parser("load", help="load the xml files into the database")
+    _add_load_options(command)
+    command.add_argument("--clean", action=argparse.BooleanOptionalAction, default=_env_flag("PMPG_CLEAN"))
+    command.add_argument("--baseline", action=argparse.BooleanOptionalAction, default=_env_flag("PMPG_BASELINE"))
+    command.set_defaults(func=load)
+
+    command = commands.add_parser("update", help="load new and changed xml files, never dropping any tables")
+    _add_load_options(command)
+    command.set_defaults(func=update)
+
+    command = commands.add_parser("export", help="write the xml files to parquet instead of the database")
+    _add_load_options(command)
+    command.add_argument("--parquet-path", default=os.environ.get("PMPG_PARQUET_PATH", "data/parquet/"))
+    command.add_argument("--batch-size", type=int, default=int(os.environ.get("PMPG_PARQUET_BATCH_SIZE", 50000)))
+    command.set_defaults(func=export)
+
+    command = commands.add_parser("watch", help="load the xml files, then keep loading new ones as they arrive")
+    _add_file_options(command)
+    command.add_argument("--normalised", action=argparse.BooleanOptionalAction, default=_env_flag("PMPG_NORMALISED"))
+    command.add_argument("--facets", action=argparse.BooleanOptionalAction, default=_env_flag("PMPG_FACETS"))
+    command.add_argument("--documents", action=argparse.BooleanOptionalAction, default=_env_flag("PMPG_DOCUMENTS"))
+    command.add_argument("--archive", action=argparse.BooleanOptionalAction, default=_env_flag("PMPG_ARCHIVE"))
+    command.add_argument(
+        "--interval",
+        type=int,
+        default=int(os.environ.get("PMPG_WATCH_INTERVAL", 60)),
+        help="seconds between looks for new files when polling, without inotify_simple",
+    )
+    _add_memory_option(command)
+    _add_filter_options(command)
+    command.set_defaults(func=watch)
+
+    command = commands.add_parser("verify", help="compare the database with the xml files, exit 1 on differences")
+    _add_file_options(command)
+    command.add_argument(
+        "--tables",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="also count the rows of every table, parsing the files instead of reading their id files",
+    )
+    _add_filter_options(command)
+    command.set_defaults(func=verify)
+
+    command = commands.add_parser("retry", help="reparse and load the quarantined records")
+    command.add_argument("--medline-path", default=os.environ.get("PMPG_MEDLINE_PATH", "data/xmls/"))
+    command.add_argument("--normalised", action=argparse.BooleanOptionalAction, default=_env_flag("PMPG_NORMALISED"))
+    command.add_argument("--facets", action=argparse.BooleanOptionalAction, default=_env_flag("PMPG_FACETS"))
+    command.add_argument("--documents", action=argparse.BooleanOptionalAction, default=_env_flag("PMPG_DOCUMENTS"))
+    command.add_argument("--archive", action=argparse.BooleanOptionalAction, default=_env_flag("PMPG_ARCHIVE"))
+    command.set_defaults(func=retry)
+
+    command = commands.add_parser("reparse", help="rerun the parser over the archived xml of chosen citations")
+    command.add_argument("pmids", type=int, nargs="*", help="PMIDs to reparse")
+    command.add_argument("--query", help="SQL whose first column gives more PMIDs, e.g. 'SELECT pmid FROM raw_article'")
+    command.add_argument("--normalised", action=argparse.BooleanOptionalAction, default=_env_flag("PMPG_NORMALISED"))
+    command.add_argument("--facets", action=argparse.BooleanOptionalAction, default=_env_flag("PMPG_FACETS"))
+    command.add_argument("--documents", action=argparse.BooleanOptionalAction, default=_env_flag("PMPG_DOCUMENTS"))
+    command.set_defaults(func=reparse)
+
+    command = commands.add_parser("requeue", help="put the files of the work queue in a status back as pending")
+    command.add_argument(
+        "--status",
+        choices=["failed", "done", "claimed"],
+        default="failed",
+        help="e.g. failed once the cause is fixed, or done to have every file loaded again",
+    )
+    command.set_defaults(func=requeue)
+
+    command = commands.add_parser("rebuild", help="recompute the citation graph and MeSH facet tables from scratch")
+    command.add_argument("--processes", type=int, default=int(os.environ.get("PMPG_PROCESSES", 2)))
+    command.add_argument("--facets", action=argparse.BooleanOptionalAction, default=True)
+    command.add_argument("--edges", action=argparse.BooleanOptionalAction, default=True)
+    command.set_defaults(func=rebuild)
+
+    command = commands.add_parser("bench", help="time parsing synthetic records with very long lists")
+    command.add_argument("sizes", type=int, nargs="*", default=[1000, 10000])
+    command.set_defaults(func=bench)
+    return parser
+
+
+def default_command():
+    if _env_flag("PMPG_RETRY_QUARANTINED"):
+        return "retry"
+    if _env_flag("PMPG_WATCH"):
+        return "watch"
+    if os.environ.get("PMPG_SINK", "db") == "parquet":
+        return "export"
+    return "load"
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    args = make_parser().parse_args(argv or [default_command()])
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+from .author import backfill_author_keys, citations_by_author  # noqa: F401
+from .documents import document, documents  # noqa: F401
+from .facets import (  # noqa: F401
+    apply_facet_delta,
+    cooccurring_descriptors,
+    descriptor_counts_by_year,
+    qualifier_counts,
+    rebuild_facets,
+    top_descriptors,
+)
+from .graph import edges, neighbourhood, rebuild_citation_edges, refresh_citation_edges  # noqa: F401
+from .identifiers import bulk_resolve, identifiers, resolve  # noqa: F401
+from .stream import iter_citations, pmid_ranges  # noqa: F401
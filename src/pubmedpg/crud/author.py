@@ -0,0 +1,58 @@
+from sqlalchemy import or_, select
+
+from pubmedpg.models.pubmed import Author
+from pubmedpg.normalise import author_key, fold_name
+
+
+def author_key_filter(name):
+    """
+    Turn a name as people type it into a filter on Author.name_key:
+    "Smith J", "Smith JA", "Smith, John" -> exact key "smith j"
+    "Smith" -> every "smith <initial>" key, plus authors recorded without a forename, but not "smith jones <initial>"
+    """
+    if "," in name:
+        last_name, fore_name = name.split(",", 1)
+        return Author.name_key == author_key(last_name, fore_name)
+    tokens = name.split()
+    if len(tokens) > 1 and len(tokens[-1]) <= 3 and tokens[-1].isalpha() and tokens[-1].isupper():
+        return Author.name_key == author_key(" ".join(tokens[:-1]), initials=tokens[-1])
+    folded = fold_name(name)
+    # folded names are only letters, digits and spaces, so there is nothing to escape for LIKE, and the initial is the
+    # one character after the last name
+    return or_(Author.name_key == folded, Author.name_key.like(f"{folded} _"))
+
+
+def citations_by_author(session, name, limit=1000, after_pmid=None):
+    """
+    PMIDs of the citations with an author matching `name`, in PMID order. Uses the ix_author_name_key index for
+    both the exact and the prefix form, page through large results by passing the last PMID as `after_pmid`.
+    """
+    query = select(Author.pmid).where(author_key_filter(name)).distinct().order_by(Author.pmid)
+    if after_pmid is not None:
+        query = query.where(Author.pmid > after_pmid)
+    if limit is not None:
+        query = query.limit(limit)
+    return [pmid for (pmid,) in session.execute(query)]
+
+
+def backfill_author_keys(session, batch_size=50000):
+    """
+    Fill in name_key for author rows loaded before the column existed, in id order and one commit per batch
+    """
+    last_id = 0
+    updated = 0
+    while True:
+        rows = session.execute(
+            select(Author.id, Author.last_name, Author.fore_name, Author.initials)
+            .where(Author.id > last_id, Author.name_key.is_(None), Author.last_name.isnot(None))
+            .order_by(Author.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return updated
+        session.bulk_update_mappings(
+            Author, [{"id": row.id, "name_key": author_key(row.last_name, row.fore_name, row.initials)} for row in rows]
+        )
+        session.commit()
+        last_id = rows[-1].id
+        updated += len(rows)
@@ -0,0 +1,18 @@
+from sqlalchemy import select
+
+from pubmedpg.models.pubmed import CitationDocument
+
+
+def document(session, pmid):
+    """
+    The citation_document of `pmid` as a dict, None if it has none. A single primary key read.
+    """
+    return session.execute(select(CitationDocument.document).where(CitationDocument.pmid == pmid)).scalar()
+
+
+def documents(session, pmids):
+    """
+    {pmid: document} of those of `pmids` that have one, in one query
+    """
+    query = select(CitationDocument.pmid, CitationDocument.document).where(CitationDocument.pmid.in_(list(pmids)))
+    return dict(tuple(row) for row in session.execute(query))
@@ -0,0 +1,180 @@
+from multiprocessing.pool import ThreadPool
+
+from sqlalchemy import text
+
+# MeSH headings from either schema, a citation is only ever in one of them
+MESH = "(SELECT pmid, descriptor_ui FROM mesh_heading UNION ALL SELECT pmid, descriptor_ui FROM mesh_heading_ref)"
+QUALIFIERS = (
+    "(SELECT q.pmid, m.descriptor_ui, q.qualifier_ui FROM qualifier q"
+    " JOIN mesh_heading m ON m.pmid = q.pmid AND m.descriptor_name = q.descriptor_name"
+    " UNION ALL SELECT pmid, descriptor_ui, qualifier_ui FROM qualifier_ref)"
+)
+
+# table -> (key columns, aggregate query with a {where} placeholder restricting m.pmid, its output named as the table)
+FACETS = {
+    "mesh_year_count": (
+        ("descriptor_ui", "pub_date_year"),
+        f"SELECT m.descriptor_ui, j.pub_date_year, count(DISTINCT m.pmid) AS citation_count FROM {MESH} m"
+        " JOIN journal j ON j.pmid = m.pmid WHERE j.pub_date_year IS NOT NULL AND {where} GROUP BY 1, 2",
+    ),
+    "mesh_qualifier_count": (
+        ("descriptor_ui", "qualifier_ui"),
+        f"SELECT m.descriptor_ui, m.qualifier_ui, count(DISTINCT m.pmid) AS citation_count FROM {QUALIFIERS} m"
+        " WHERE m.descriptor_ui IS NOT NULL AND {where} GROUP BY 1, 2",
+    ),
+    "mesh_cooccurrence": (
+        ("descriptor_ui_a", "descriptor_ui_b"),
+        "SELECT m.descriptor_ui AS descriptor_ui_a, b.descriptor_ui AS descriptor_ui_b, count(DISTINCT m.pmid) AS"
+        f" citation_count FROM {MESH} m JOIN {MESH} b ON b.pmid = m.pmid AND m.descriptor_ui < b.descriptor_ui WHERE"
+        " {where} GROUP BY 1, 2",
+    ),
+}
+
+# co-occurring pairs seen in fewer citations than this are dropped by a rebuild, and hidden from queries
+COOCCURRENCE_THRESHOLD = 5
+
+
+def _aggregate_range(engine, table, lo, hi):
+    keys, query = FACETS[table]
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                f"INSERT INTO {table}_stage ({', '.join(keys)}, citation_count)"
+                f" {query.format(where='m.pmid BETWEEN :lo AND :hi')}"
+            ),
+            {"lo": lo, "hi": hi},
+        )
+
+
+def rebuild_facets(engine, processes=4, ranges=None, threshold=COOCCURRENCE_THRESHOLD):
+    """
+    Recompute every facet table from scratch. The pmid space is cut into `ranges` slices (4 per process by default)
+    aggregated in parallel into unlogged staging tables, each slice with its own connection, and the partial counts
+    are then summed into the facet tables in one statement per table.
+    """
+    ranges = ranges or processes * 4
+    with engine.begin() as conn:
+        lo, hi = conn.execute(text("SELECT min(pmid), max(pmid) FROM citation")).one()
+        for table in FACETS:
+            conn.execute(text(f"DROP TABLE IF EXISTS {table}_stage"))
+            conn.execute(text(f"CREATE UNLOGGED TABLE {table}_stage (LIKE {table})"))
+    if lo is None:
+        return
+    step = (hi - lo) // ranges + 1
+    tasks = [(engine, table, start, start + step - 1) for table in FACETS for start in range(lo, hi + 1, step)]
+    with ThreadPool(processes=processes) as pool:
+        pool.starmap(_aggregate_range, tasks)
+    with engine.begin() as conn:
+        for table, (keys, _query) in FACETS.items():
+            having = f" HAVING sum(citation_count) >= {int(threshold)}" if table == "mesh_cooccurrence" else ""
+            conn.execute(text(f"TRUNCATE {table}"))
+            conn.execute(
+                text(
+                    f"INSERT INTO {table} SELECT {', '.join(keys)}, sum(citation_count) FROM {table}_stage"
+                    f" GROUP BY {', '.join(keys)}{having}"
+                )
+            )
+            conn.execute(text(f"DROP TABLE {table}_stage"))
+
+
+def apply_facet_delta(session, pmids, sign=1, threshold=COOCCURRENCE_THRESHOLD):
+    """
+    Add (sign=1) or remove (sign=-1) the contribution of `pmids` to every facet table, in the session's transaction.
+    Call with -1 before deleting citations and with 1 once new ones are flushed. Keys are upserted in sorted order so
+    concurrent loaders lock rows in the same order, and removed once their count drops to 0.
+
+    As after a rebuild, co-occurring pairs are only kept while seen in `threshold` citations: a pair that is not in
+    mesh_cooccurrence yet is added when one delta brings `threshold` citations of it, pairs building up over several
+    updates wait for the next rebuild_facets.
+    """
+    if not pmids:
+        return
+    for table, (keys, query) in FACETS.items():
+        key_list = ", ".join(keys)
+        floor = int(threshold) if table == "mesh_cooccurrence" else 1
+        known = " AND ".join(f"t.{key} = delta.{key}" for key in keys)
+        rows = session.execute(
+            text(
+                f"INSERT INTO {table} ({key_list}, citation_count)"
+                f" SELECT {', '.join(f'delta.{key}' for key in keys)}, :sign * delta.citation_count"
+                f" FROM ({query.format(where='m.pmid = ANY(:pmids)')}) AS delta"
+                f" WHERE :sign * delta.citation_count >= :floor OR EXISTS (SELECT 1 FROM {table} t WHERE {known})"
+                f" ORDER BY {key_list}"
+                f" ON CONFLICT ({key_list}) DO UPDATE SET citation_count = {table}.citation_count +"
+                f" excluded.citation_count RETURNING {key_list}, citation_count"
+            ),
+            {"pmids": list(pmids), "sign": sign, "floor": floor},
+        ).all()
+        gone = [row[:-1] for row in rows if row[-1] < floor]
+        if gone:
+            session.execute(
+                text(f"DELETE FROM {table} WHERE ({key_list}) IN (SELECT * FROM unnest(:a, :b))"),
+                {"a": [key[0] for key in gone], "b": [key[1] for key in gone]},
+            )
+
+
+def descriptor_counts_by_year(session, descriptor_ui, start_year=None, end_year=None):
+    """
+    [(year, citations)] for one descriptor
+    """
+    return [
+        tuple(row)
+        for row in session.execute(
+            text(
+                "SELECT pub_date_year, citation_count FROM mesh_year_count WHERE descriptor_ui = :ui"
+                " AND citation_count > 0 AND pub_date_year BETWEEN :start AND :end ORDER BY pub_date_year"
+            ),
+            {"ui": descriptor_ui, "start": start_year or 0, "end": end_year or 9999},
+        )
+    ]
+
+
+def top_descriptors(session, year, limit=50):
+    """
+    [(descriptor_ui, citations)] for the most used descriptors of a publication year
+    """
+    return [
+        tuple(row)
+        for row in session.execute(
+            text(
+                "SELECT descriptor_ui, citation_count FROM mesh_year_count WHERE pub_date_year = :year"
+                " ORDER BY citation_count DESC LIMIT :limit"
+            ),
+            {"year": year, "limit": limit},
+        )
+    ]
+
+
+def qualifier_counts(session, descriptor_ui):
+    """
+    [(qualifier_ui, citations)] for the qualifiers used with one descriptor, most used first
+    """
+    return [
+        tuple(row)
+        for row in session.execute(
+            text(
+                "SELECT qualifier_ui, citation_count FROM mesh_qualifier_count WHERE descriptor_ui = :ui"
+                " AND citation_count > 0 ORDER BY citation_count DESC"
+            ),
+            {"ui": descriptor_ui},
+        )
+    ]
+
+
+def cooccurring_descriptors(session, descriptor_ui, limit=50, threshold=COOCCURRENCE_THRESHOLD):
+    """
+    [(descriptor_ui, citations)] for the descriptors most often assigned together with `descriptor_ui`
+    """
+    return [
+        tuple(row)
+        for row in session.execute(
+            text(
+                "SELECT other, citation_count FROM ("
+                " SELECT descriptor_ui_b AS other, citation_count FROM mesh_cooccurrence WHERE descriptor_ui_a = :ui"
+                " UNION ALL"
+                " SELECT descriptor_ui_a AS other, citation_count FROM mesh_cooccurrence WHERE descriptor_ui_b = :ui"
+                ") AS pairs WHERE citation_count >= :threshold ORDER BY citation_count DESC LIMIT :limit"
+            ),
+            {"ui": descriptor_ui, "threshold": threshold, "limit": limit},
+        )
+    ]
@@ -0,0 +1,73 @@
+from sqlalchemy import select, text
+
+from pubmedpg.models.pubmed import CitationEdge
+
+EDGES_FROM_COMMENTS = (
+    "INSERT INTO citation_edge (pmid, ref_type, ref_pmid)"
+    " SELECT DISTINCT pmid, ref_type, pmid_version FROM comment WHERE pmid_version IS NOT NULL"
+)
+
+
+def rebuild_citation_edges(session):
+    """
+    Recompute the whole edge table from comment in one statement, for after a bulk load
+    """
+    session.execute(text("TRUNCATE citation_edge"))
+    session.execute(text(EDGES_FROM_COMMENTS))
+    session.commit()
+
+
+def refresh_citation_edges(session, pmids):
+    """
+    Recompute the outgoing edges of `pmids` in the session's current transaction, once their comment rows are flushed
+    """
+    if not pmids:
+        return
+    pmids = list(pmids)
+    session.execute(text("DELETE FROM citation_edge WHERE pmid = ANY(:pmids)"), {"pmids": pmids})
+    session.execute(text(f"{EDGES_FROM_COMMENTS} AND pmid = ANY(:pmids)"), {"pmids": pmids})
+
+
+def edges(session, pmids, direction="both", ref_types=None):
+    """
+    [(pmid, ref_type, ref_pmid)] touching any of `pmids`. "out" gives what the citations refer to ("CommentOn",
+    "RetractionOf" ...), "in" what refers to them, e.g. everything commenting on or retracting them.
+    """
+    pmids = list(pmids)
+    conditions = []
+    if direction in ("out", "both"):
+        conditions.append(CitationEdge.pmid.in_(pmids))
+    if direction in ("in", "both"):
+        conditions.append(CitationEdge.ref_pmid.in_(pmids))
+    if not conditions:
+        raise ValueError(f"Unknown direction {direction!r}, expected 'in', 'out' or 'both'")
+    found = set()
+    # one query per direction, so each is a plain probe of its own index
+    for condition in conditions:
+        query = select(CitationEdge.pmid, CitationEdge.ref_type, CitationEdge.ref_pmid).where(condition)
+        if ref_types:
+            query = query.where(CitationEdge.ref_type.in_(list(ref_types)))
+        found.update(tuple(row) for row in session.execute(query))
+    return sorted(found)
+
+
+def neighbourhood(session, pmid, hops=1, direction="both", ref_types=None, max_nodes=10000):
+    """
+    Breadth-first expansion from `pmid`, one indexed query per hop and direction rather than recursive SQL.
+    Returns ({pmid: hop distance}, [(pmid, ref_type, ref_pmid)]), stopping early once `max_nodes` are reached.
+    """
+    distances = {pmid: 0}
+    found = set()
+    frontier = {pmid}
+    for hop in range(1, hops + 1):
+        if not frontier or len(distances) >= max_nodes:
+            break
+        next_frontier = set()
+        for edge in edges(session, frontier, direction, ref_types):
+            found.add(edge)
+            for node in (edge[0], edge[2]):
+                if node not in distances and len(distances) < max_nodes:
+                    distances[node] = hop
+                    next_frontier.add(node)
+        frontier = next_frontier
+    return distances, sorted(found)
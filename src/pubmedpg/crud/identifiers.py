@@ -0,0 +1,93 @@
+import io
+import itertools
+
+from sqlalchemy import select
+
+from pubmedpg.models.pubmed import ArticleIdentifier
+from pubmedpg.normalise import identifier_value
+
+# kind -> (pmid, value) rows of the indexed column holding identifiers of that kind
+BULK_SOURCES = {
+    "doi": "SELECT pmid, id_value AS value FROM article_identifier WHERE id_type = 'doi'",
+    "pmc": "SELECT pmid, id_value AS value FROM article_identifier WHERE id_type = 'pmc'",
+    "pii": "SELECT pmid, id_value AS value FROM article_identifier WHERE id_type = 'pii'",
+    "mid": "SELECT pmid, id_value AS value FROM article_identifier WHERE id_type = 'mid'",
+    "other_id": "SELECT pmid, other_id AS value FROM other_id",
+    "accession": "SELECT pmid, accession_number AS value FROM accession",
+    "grant": 'SELECT pmid, grantid AS value FROM "grant"',
+    "ref_source": "SELECT pmid, ref_source AS value FROM comment",
+}
+
+BULK_BATCH_SIZE = 100000
+COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def resolve(session, id_value, id_type="doi"):
+    """
+    PMIDs of the citations with identifier `id_value` of `id_type` ("doi", "pmc", "pii", "mid" ...), usually one.
+    A probe of ix_article_identifier_id_type_id_value.
+    """
+    id_value = identifier_value(id_type, id_value)
+    if id_value is None:
+        return []
+    query = (
+        select(ArticleIdentifier.pmid)
+        .where(ArticleIdentifier.id_type == id_type, ArticleIdentifier.id_value == id_value)
+        .order_by(ArticleIdentifier.pmid)
+    )
+    return [pmid for (pmid,) in session.execute(query)]
+
+
+def identifiers(session, pmid):
+    """
+    [(id_type, id_value)] of a citation
+    """
+    query = (
+        select(ArticleIdentifier.id_type, ArticleIdentifier.id_value)
+        .where(ArticleIdentifier.pmid == pmid)
+        .order_by(ArticleIdentifier.id_type, ArticleIdentifier.id_value)
+    )
+    return [tuple(row) for row in session.execute(query)]
+
+
+def _copy_rows(values):
+    # COPY's text format, one value per line with its backslashes, tabs and line breaks escaped
+    values = [value for value in values if value is not None]
+    rows = "\n".join(values)
+    if "\\" in rows or "\t" in rows or "\r" in rows or rows.count("\n") != len(values) - 1:
+        rows = "\n".join(value.translate(COPY_ESCAPES) for value in values)
+    return f"{rows}\n" if values else ""
+
+
+def bulk_resolve(engine, values, kind="doi", batch_size=BULK_BATCH_SIZE):
+    """
+    (value, pmid) for every one of `values` that resolves, in no particular order, and as many times as the value
+    occurs. The values are COPYed into a temporary table and joined against the indexed column of `kind`, see
+    BULK_SOURCES, in one statement whose rows are streamed back through a server-side cursor, so a million
+    identifiers take seconds rather than a million round trips.
+    """
+    if kind not in BULK_SOURCES:
+        raise ValueError(f"Unknown identifier kind {kind!r}, expected one of {', '.join(BULK_SOURCES)}")
+    return _bulk_resolve(engine, iter(values), kind, batch_size)
+
+
+def _bulk_resolve(engine, values, kind, batch_size):
+    # stored DOIs are lower case, see identifier_value
+    id_value = "lower(btrim(i.value))" if kind == "doi" else "btrim(i.value)"
+    with engine.begin() as conn:
+        cursor = conn.connection.cursor()
+        cursor.execute("CREATE TEMPORARY TABLE resolve_input (value text) ON COMMIT DROP")
+        # enough for the hash of a few million identifiers to stay in memory, for this transaction only
+        cursor.execute("SET LOCAL work_mem = '256MB'")
+        while batch := list(itertools.islice(values, batch_size)):
+            cursor.copy_expert("COPY resolve_input FROM STDIN", io.StringIO(_copy_rows(batch)))
+        # row estimates for the planner, a hash join over the input rather than one index probe per value
+        cursor.execute("ANALYZE resolve_input")
+        cursor.close()
+        cursor = conn.connection.cursor(name="resolve_output")
+        cursor.itersize = batch_size
+        cursor.execute(
+            f"SELECT i.value, s.pmid FROM resolve_input i JOIN ({BULK_SOURCES[kind]}) s ON s.value = {id_value}"
+        )
+        yield from cursor
+        cursor.close()
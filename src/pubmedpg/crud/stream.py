@@ -0,0 +1,91 @@
+"""
+    Streaming reads of (pmid, title, abstract, MeSH) for downstream jobs such as embedding every citation.
+
+    Rows come from a named server-side cursor, `batch_size` at a time, so memory stays flat however many citations a
+    range holds, and the MeSH headings are aggregated per citation in the same query rather than loaded through the
+    ORM relationships one citation at a time. A range is read `window` pmids per query, which keeps each aggregate
+    small. To spread a full export over processes, give each its own engine and one of the `pmid_ranges`:
+
+        for batch in iter_citations(engine, lo, hi, arrow=True):
+            ...
+"""
+from sqlalchemy import text
+
+COLUMNS = ("pmid", "article_title", "abstract_text", "descriptor_uis", "descriptor_names")
+
+# MeSH headings with their names from either schema, a citation is only ever in one of them
+MESH_NAMES = (
+    "(SELECT pmid, descriptor_ui, descriptor_name FROM mesh_heading"
+    " UNION ALL SELECT r.pmid, r.descriptor_ui, d.descriptor_name FROM mesh_heading_ref r"
+    " JOIN mesh_descriptor d ON d.descriptor_ui = r.descriptor_ui)"
+)
+
+CITATIONS = (
+    "SELECT c.pmid, c.article_title, a.abstract_text, m.descriptor_uis, m.descriptor_names FROM citation c"
+    " LEFT JOIN abstract a ON a.pmid = c.pmid"
+    " LEFT JOIN ("
+    " SELECT pmid, array_agg(descriptor_ui ORDER BY descriptor_name) AS descriptor_uis,"
+    " array_agg(descriptor_name ORDER BY descriptor_name) AS descriptor_names"
+    f" FROM {MESH_NAMES} mesh WHERE pmid BETWEEN :lo AND :hi GROUP BY pmid"
+    ") m ON m.pmid = c.pmid"
+    " WHERE c.pmid BETWEEN :lo AND :hi ORDER BY c.pmid"
+)
+
+BATCH_SIZE = 10000
+WINDOW = 250000
+
+
+def pmid_ranges(engine, shards):
+    """
+    [(lo, hi)] cutting the pmids of citation into `shards` contiguous ranges, as rebuild_facets does
+    """
+    with engine.connect() as conn:
+        lo, hi = conn.execute(text("SELECT min(pmid), max(pmid) FROM citation")).one()
+    if lo is None:
+        return []
+    step = (hi - lo) // shards + 1
+    return [(start, min(start + step - 1, hi)) for start in range(lo, hi + 1, step)]
+
+
+def _arrow_batch(rows):
+    import pyarrow as pa
+
+    columns = list(zip(*rows)) or [()] * len(COLUMNS)
+    return pa.RecordBatch.from_arrays(
+        [
+            pa.array(columns[0], type=pa.int32()),
+            pa.array(columns[1], type=pa.string()),
+            pa.array(columns[2], type=pa.string()),
+            pa.array(columns[3], type=pa.list_(pa.string())),
+            pa.array(columns[4], type=pa.list_(pa.string())),
+        ],
+        names=list(COLUMNS),
+    )
+
+
+def iter_citations(engine, lo=None, hi=None, batch_size=BATCH_SIZE, arrow=False, window=WINDOW):
+    """
+    Batches of at most `batch_size` citations with `lo` <= pmid <= `hi` (all of them by default) in pmid order, each a
+    list of tuples of COLUMNS or a pyarrow RecordBatch with `arrow`. Citations without an abstract or MeSH headings
+    have None there.
+    """
+    if arrow:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError("Arrow batches require pyarrow, install pubmedpg with the parquet extra") from e
+    if lo is None or hi is None:
+        with engine.connect() as conn:
+            first, last = conn.execute(text("SELECT min(pmid), max(pmid) FROM citation")).one()
+        if first is None:
+            return
+        lo = first if lo is None else lo
+        hi = last if hi is None else hi
+    with engine.connect() as conn:
+        # stream_results makes psycopg2 use a named cursor, fetching max_row_buffer rows per round trip
+        conn = conn.execution_options(stream_results=True, max_row_buffer=batch_size)
+        for start in range(lo, hi + 1, window):
+            end = min(start + window - 1, hi)
+            result = conn.execute(text(CITATIONS), {"lo": start, "hi": end})
+            for rows in result.partitions(batch_size):
+                yield _arrow_batch(rows) if arrow else [tuple(row) for row in rows]
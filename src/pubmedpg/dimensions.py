@@ -0,0 +1,109 @@
+"""
+    Dimension cache for the normalised schema.
+
+    `DimensionCache.normalise` rewrites a parsed Citation so that its MeSH headings and qualifiers become
+    MeshHeadingRef/QualifierRef rows and its journal title moves to JournalTitle, remembering every dimension row it
+    has not seen before or has seen under another name, as when NLM renames a descriptor or a journal. `flush` upserts
+    those in their own short transaction, sorted by key so that concurrent workers always take row locks in the same
+    order, before the citations referencing them are committed.
+"""
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+
+from pubmedpg.models.pubmed import JournalTitle, MeshDescriptor, MeshHeadingRef, MeshQualifier, QualifierRef
+
+DIMENSIONS = (
+    ("descriptors", MeshDescriptor, "descriptor_ui", ("descriptor_name",)),
+    ("qualifiers", MeshQualifier, "qualifier_ui", ("qualifier_name",)),
+    ("journals", JournalTitle, "nlm_unique_id", ("title", "iso_abbreviation")),
+)
+
+
+class DimensionCache:
+    def __init__(self, descriptors=(), qualifiers=(), journals=()):
+        # key -> row values already in the database
+        self.known = {"descriptors": dict(descriptors), "qualifiers": dict(qualifiers), "journals": dict(journals)}
+        # key -> row values for the ones that are not yet, or under other values
+        self.pending = {"descriptors": {}, "qualifiers": {}, "journals": {}}
+
+    @classmethod
+    def load(cls, session):
+        known = {}
+        for kind, model, key_column, value_columns in DIMENSIONS:
+            columns = [getattr(model, column) for column in value_columns]
+            known[kind] = (
+                (key, dict(zip(value_columns, values)))
+                for key, *values in session.query(getattr(model, key_column), *columns)
+            )
+        return cls(**known)
+
+    def _add(self, kind, key, values):
+        if key is not None and self.known[kind].get(key) != values:
+            # later citations win, they carry the current name
+            self.pending[kind][key] = values
+
+    def normalise(self, db_citation):
+        descriptor_uis = {}
+        mesh_heading_refs = []
+        for db_mesh_heading in db_citation.meshheadings:
+            ui = db_mesh_heading.descriptor_ui
+            if ui is None:
+                # the UI is part of the key, a heading without one cannot be stored
+                continue
+            descriptor_uis[db_mesh_heading.descriptor_name] = ui
+            self._add("descriptors", ui, {"descriptor_name": db_mesh_heading.descriptor_name})
+            mesh_heading_refs.append(
+                MeshHeadingRef(descriptor_ui=ui, descriptor_name_major_yn=db_mesh_heading.descriptor_name_major_yn)
+            )
+        qualifier_refs = []
+        for db_qualifier in db_citation.qualifiers:
+            descriptor_ui = descriptor_uis.get(db_qualifier.descriptor_name)
+            if descriptor_ui is None or db_qualifier.qualifier_ui is None:
+                # nor a qualifier whose heading is unknown or without a UI of its own
+                continue
+            self._add("qualifiers", db_qualifier.qualifier_ui, {"qualifier_name": db_qualifier.qualifier_name})
+            qualifier_refs.append(
+                QualifierRef(
+                    descriptor_ui=descriptor_ui,
+                    qualifier_ui=db_qualifier.qualifier_ui,
+                    qualifier_name_major_yn=db_qualifier.qualifier_name_major_yn,
+                )
+            )
+        db_citation.meshheadings = []
+        db_citation.qualifiers = []
+        db_citation.mesh_heading_refs = mesh_heading_refs
+        db_citation.qualifier_refs = qualifier_refs
+
+        # journals without an NLM unique id keep their title inline
+        if db_citation.journals and db_citation.journal_infos and db_citation.journal_infos[0].nlm_unique_id:
+            db_journal = db_citation.journals[0]
+            self._add(
+                "journals",
+                db_citation.journal_infos[0].nlm_unique_id,
+                {"title": db_journal.title, "iso_abbreviation": db_journal.iso_abbreviation},
+            )
+            db_journal.title = None
+            db_journal.iso_abbreviation = None
+
+    def flush(self, engine):
+        with engine.begin() as conn:
+            for kind, model, key_column, value_columns in DIMENSIONS:
+                pending = self.pending[kind]
+                if not pending:
+                    continue
+                rows = [dict(values, **{key_column: key}) for key, values in sorted(pending.items())]
+                statement = insert(model.__table__)
+                # a citation without a journal title does not blank the one on record
+                conn.execute(
+                    statement.on_conflict_do_update(
+                        index_elements=[key_column],
+                        set_={
+                            column: func.coalesce(statement.excluded[column], model.__table__.c[column])
+                            for column in value_columns
+                        },
+                    ),
+                    rows,
+                )
+        for kind, pending in self.pending.items():
+            self.known[kind].update(pending)
+            pending.clear()
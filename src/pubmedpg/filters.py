@@ -0,0 +1,104 @@
+"""
+    Predicates selecting the slice of MEDLINE a deployment loads, evaluated on the MedlineCitation element before any
+    set_* function or ORM object touches it, so a record that is left out costs only its share of the decompress and
+    scan. A record is kept if it matches every predicate given, and a predicate if any of its values match:
+
+        mesh        MeSH descriptor UIs (D000445,D005561) of any of its MeshHeadings, major topic or not. A subtree is
+                    given as the UIs of its descriptors, the citation xml holds no tree numbers.
+        journals    NLM unique ids, ISSNs (print, electronic or linking) or MedlineTA abbreviations of its journal
+        years       the publication year of its journal issue, 2020, 2015- or 2010-2019, from MedlineDate if there is no
+                    Year
+        languages   its Language codes, eng,fre, in any case
+
+    Records left out of a load still replace earlier copies of themselves, so a citation revised out of the slice by
+    an update file is removed rather than left as it was.
+"""
+import re
+
+YEAR = re.compile(r"\d{4}")
+
+
+def _values(values):
+    # "a, b" or an iterable
+    if isinstance(values, str):
+        values = values.split(",")
+    return {value.strip() for value in values or () if value and value.strip()}
+
+
+def parse_years(years):
+    """
+    (first, last) of "2020", "2015-" or "2010-2019", either None for an open end, None for no years. ValueError for
+    anything else, including a range running backwards.
+    """
+    if not years:
+        return None
+    first, dash, last = str(years).partition("-")
+    first = int(first) if first.strip() else None
+    last = int(last) if last.strip() else (None if dash else first)
+    if first is not None and last is not None and first > last:
+        raise ValueError(f"Year range {years!r} runs backwards, expected first-last")
+    return first, last
+
+
+def element_year(elem):
+    pub_date = elem.find("Article/Journal/JournalIssue/PubDate")
+    if pub_date is None:
+        return None
+    match = YEAR.search(pub_date.findtext("Year") or pub_date.findtext("MedlineDate") or "")
+    return int(match.group()) if match else None
+
+
+class RecordFilter:
+    """
+    Called with a MedlineCitation element, True if the record is to be loaded. False as a boolean when it has no
+    predicates and keeps everything.
+    """
+
+    def __init__(self, mesh=None, journals=None, years=None, languages=None):
+        self.descriptor_uis = _values(mesh)
+        self.journals = _values(journals)
+        self.journal_abbreviations = {journal.lower() for journal in self.journals}
+        self.years = parse_years(years)
+        self.languages = {language.lower() for language in _values(languages)}
+
+    def __bool__(self):
+        return bool(self.descriptor_uis or self.journals or self.years or self.languages)
+
+    def __repr__(self):
+        predicates = {
+            "mesh": sorted(self.descriptor_uis),
+            "journals": sorted(self.journals),
+            "years": self.years,
+            "languages": sorted(self.languages),
+        }
+        return f"RecordFilter({', '.join(f'{name}={value}' for name, value in predicates.items() if value)})"
+
+    def _journal(self, elem):
+        for path in ("MedlineJournalInfo/NlmUniqueID", "MedlineJournalInfo/ISSNLinking", "Article/Journal/ISSN"):
+            if elem.findtext(path) in self.journals:
+                return True
+        return (elem.findtext("MedlineJournalInfo/MedlineTA") or "").lower() in self.journal_abbreviations
+
+    def _year(self, elem):
+        year = element_year(elem)
+        if year is None:
+            return False
+        first, last = self.years
+        return (first is None or year >= first) and (last is None or year <= last)
+
+    def __call__(self, elem):
+        # the cheapest first
+        if self.languages and not any(
+            (language.text or "").lower() in self.languages for language in elem.iterfind("Article/Language")
+        ):
+            return False
+        if self.years and not self._year(elem):
+            return False
+        if self.journals and not self._journal(elem):
+            return False
+        if self.descriptor_uis and not any(
+            descriptor.get("UI") in self.descriptor_uis
+            for descriptor in elem.iterfind("MeshHeadingList/MeshHeading/DescriptorName")
+        ):
+            return False
+        return True
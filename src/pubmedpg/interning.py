@@ -0,0 +1,45 @@
+"""
+    Deduplication of the low-cardinality strings that repeat across millions of citations.
+
+    Every `elem.text` is a fresh str, so a baseline load holds millions of copies of "Humans", "Journal Article",
+    "eng" and the like. `intern_text` returns one shared instance per distinct value instead, from a per-process table
+    that stops growing at `MAX_SIZE` entries (values seen after that pass through unchanged). The parquet sink writes
+    the same columns dictionary encoded, see DICTIONARY_COLUMNS.
+"""
+
+MAX_SIZE = 200000
+
+# table -> columns that only take a few thousand distinct values
+DICTIONARY_COLUMNS = {
+    "citation": {"citation_owner", "citation_status", "keyword_list_owner"},
+    "citation_subset": {"citation_subset"},
+    "chemical": {"registry_number", "name_of_substance", "substance_ui"},
+    "data_bank": {"data_bank_name"},
+    "accession": {"data_bank_name"},
+    "grant": {"agency", "country"},
+    "journal": {"issn", "issn_type", "title", "iso_abbreviation"},
+    "journal_info": {"nlm_unique_id", "medline_ta", "country"},
+    "language": {"language"},
+    "mesh_heading": {"descriptor_name", "descriptor_name_major_yn", "descriptor_ui"},
+    "publication_type": {"publication_type"},
+    "qualifier": {
+        "descriptor_name",
+        "qualifier_name",
+        "qualifier_name_major_yn",
+        "qualifier_ui",
+    },
+    "suppl_mesh_name": {"suppl_mesh_name", "suppl_mesh_name_ui", "suppl_mesh_name_type"},
+}
+
+_table = {}
+
+
+def intern_text(value):
+    if value is None:
+        return None
+    interned = _table.get(value)
+    if interned is not None:
+        return interned
+    if len(_table) < MAX_SIZE:
+        _table[value] = value
+    return value
@@ -0,0 +1,100 @@
+"""
+    Run manifest: what we know about each source xml file (size, mtime, md5), how far its load got and with which
+    record filter, see pubmedpg.filters.
+
+    The db side lives in the xml_file table and is read in a single query at startup. NLM ships a `.md5` file next to
+    every archive, which is used when present so that checking a file does not mean reading it.
+"""
+import datetime
+import hashlib
+import os
+from collections import namedtuple
+
+STATUS_LOADING = "loading"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+ManifestEntry = namedtuple("ManifestEntry", "id size mtime md5 status record_filter", defaults=(None,))
+
+
+def read_md5_file(path):
+    """
+    The digest from an NLM `<name>.md5` file, in the `MD5(pubmed22n0001.xml.gz)= <hex>` format, or None
+    """
+    md5_path = f"{path}.md5"
+    if not os.path.exists(md5_path):
+        return None
+    with open(md5_path, "r") as f:
+        content = f.read().strip()
+    return content.rsplit("=", 1)[-1].strip().lower() or None
+
+
+def file_md5(path, chunk_size=1024 * 1024):
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_signature(path, compute_md5=True):
+    """
+    {"size", "mtime", "md5"} for a source file, md5 comes from the NLM `.md5` file if there is one and is otherwise
+    computed, or left as None if `compute_md5` is False
+    """
+    stat = os.stat(path)
+    md5 = read_md5_file(path)
+    if md5 is None and compute_md5:
+        md5 = file_md5(path)
+    return {"size": stat.st_size, "mtime": datetime.datetime.fromtimestamp(stat.st_mtime), "md5": md5}
+
+
+def is_current(entry, signature, record_filter=None):
+    """
+    True if the manifest entry records a completed load of exactly this file, with the same `record_filter` (its repr)
+    """
+    if entry is None or entry.status != STATUS_DONE or entry.record_filter != record_filter:
+        return False
+    if entry.size is None and entry.mtime is None and entry.md5 is None:
+        # loaded before there was a manifest, taken as it is
+        return True
+    if entry.md5 and signature["md5"]:
+        return entry.md5 == signature["md5"]
+    return entry.size == signature["size"] and entry.mtime == signature["mtime"]
+
+
+def check_file(entry, path, record_filter=None):
+    """
+    (is_current, signature) for the source file at `path` against its manifest entry, loaded with `record_filter` (its
+    repr) this time. Size and mtime are compared
+    first, the file is only hashed when they differ but the size does not and the entry has an md5 to compare with,
+    e.g. an archive copied again.
+    """
+    signature = file_signature(path, compute_md5=False)
+    if is_current(entry, signature, record_filter):
+        return True, signature
+    if entry is None or entry.record_filter != record_filter:
+        return False, signature
+    if entry.status == STATUS_DONE and entry.md5 and signature["md5"] is None:
+        if entry.size == signature["size"]:
+            signature["md5"] = file_md5(path)
+            return entry.md5 == signature["md5"], signature
+    return False, signature
+
+
+def load_manifest(session):
+    """
+    {xml_file_name: ManifestEntry} for every file the database knows about, in one query
+    """
+    from pubmedpg.models.pubmed import XmlFile
+
+    query = session.query(
+        XmlFile.xml_file_name,
+        XmlFile.id,
+        XmlFile.file_size,
+        XmlFile.file_mtime,
+        XmlFile.md5,
+        XmlFile.status,
+        XmlFile.record_filter,
+    )
+    return {name: ManifestEntry(*values) for name, *values in query}
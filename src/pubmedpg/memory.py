@@ -0,0 +1,114 @@
+"""
+    Memory governor of a run, keeping the workers of a load inside a memory budget.
+
+    The budget is PMPG_MEMORY_BUDGET in MB, or the memory limit of the container (cgroup) the loader runs in. From it
+    each worker gets an equal share, less what the launching process holds, and the parser has the sink flush what it
+    has so far once the worker's RSS goes over its share, rather than holding a whole file's citations until the end.
+    The launcher reads the RSS of the workers from /proc while it dispatches, and holds back the next file while the
+    pool is near the budget, so a few large files arriving together wait for each other instead of getting the
+    container OOM-killed. Each file reports the peak RSS of its worker, from which the summary recommends how many
+    workers the budget fits.
+"""
+import os
+import time
+from multiprocessing import active_children
+
+from pubmedpg.pool import rss_mb
+
+# the launcher holds back new files above this share of the budget
+DISPATCH_HEADROOM = 0.9
+CGROUP_LIMITS = ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes")
+# cgroup v1 reports no limit as a huge number rather than "max"
+UNLIMITED = 2**60
+
+
+def process_rss_mb(pid):
+    """
+    Resident set size of process `pid` in MB, None if it is gone or there is no /proc
+    """
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def container_limit_mb():
+    """
+    The memory limit of the cgroup this process runs in, in MB, None without one
+    """
+    for path in CGROUP_LIMITS:
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < UNLIMITED:
+            return int(value) / 2**20
+        return None
+    return None
+
+
+def memory_budget(configured=None):
+    """
+    The memory budget of a run in MB: `configured` if given, otherwise the container's limit, None for no budget
+    """
+    if configured:
+        return float(configured)
+    return container_limit_mb()
+
+
+def worker_limit(budget, processes):
+    """
+    The RSS in MB above which a worker flushes early, its share of what the launcher leaves of `budget`
+    """
+    if not budget:
+        return None
+    return max(budget - rss_mb(), 0) / processes
+
+
+def recommend_workers(results, budget):
+    """
+    How many workers fit in `budget` MB next to the launcher, going by the largest peak RSS of a file in `results`
+    """
+    peaks = [stats["peak_rss"] for stats in results if stats.get("peak_rss")]
+    if not budget or not peaks:
+        return None
+    return max(1, int((budget - rss_mb()) // max(peaks)))
+
+
+def pool_rss_mb():
+    """
+    RSS of this process and its worker processes in MB
+    """
+    return rss_mb() + sum(process_rss_mb(child.pid) or 0 for child in active_children())
+
+
+def governed_map(pool, task, items, processes, budget, interval=0.2):
+    """
+    `pool.map(task, items)` dispatching one item at a time, at most `processes` at once and none while the pool's RSS
+    is over DISPATCH_HEADROOM of `budget` MB, unless nothing is running. Results are in the order of `items`.
+    """
+    results = [None] * len(items)
+    running = {}
+    held = 0
+    holding = False
+    queued = list(enumerate(items))
+    queued.reverse()
+    while queued or running:
+        for i, result in list(running.items()):
+            if result.ready():
+                results[i] = result.get()
+                del running[i]
+        if queued and len(running) < processes:
+            if not running or pool_rss_mb() < DISPATCH_HEADROOM * budget:
+                i, item = queued.pop()
+                running[i] = pool.apply_async(task, (item,))
+                holding = False
+                continue
+            held += not holding
+            holding = True
+        time.sleep(interval)
+    if held:
+        print(f"Held back the next file {held} times with the pool near its {budget:.0f} MB memory budget")
+    return results
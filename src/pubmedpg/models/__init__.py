@@ -1,9 +1,11 @@
 from .pubmed import (  # noqa: F401
     Abstract,
     Accession,
+    ArticleIdentifier,
     Author,
     Chemical,
     Citation,
+    CitationEdge,
     CitationSubset,
     Comment,
     DataBank,
@@ -12,9 +14,16 @@ from .pubmed import (  # noqa: F401
     Investigator,
     Journal,
     JournalInfo,
+    JournalTitle,
     Keyword,
     Language,
+    MeshCooccurrence,
+    MeshDescriptor,
     MeshHeading,
+    MeshHeadingRef,
+    MeshQualifier,
+    MeshQualifierCount,
+    MeshYearCount,
     Note,
     OtherAbstract,
     OtherId,
@@ -22,6 +31,9 @@ from .pubmed import (  # noqa: F401
     PmidFileMapping,
     PublicationType,
     Qualifier,
+    QualifierRef,
+    QuarantinedRecord,
+    QueuedFile,
     SpaceFlight,
     SupplMeshName,
     XmlFile,
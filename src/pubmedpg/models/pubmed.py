@@ -1,6 +1,7 @@
 # -*- coding: UTF-8 -*-
 
-from sqlalchemy import Column, Date, DateTime, Enum, ForeignKey, Integer, String, Text
+from sqlalchemy import BigInteger, Column, Date, DateTime, Enum, ForeignKey, Index, Integer, LargeBinary, String, Text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import backref, relationship
 
 from pubmedpg.db.base import Base
@@ -70,9 +71,19 @@ class XmlFile(Base):
     dtd_public_id = Column(String(200))  # ,   nullable=False)
     dtd_system_id = Column(String(200))  # ,   nullable=False)
     time_processed = Column(DateTime())
+    # run manifest, see pubmedpg.manifest
+    file_size = Column(BigInteger)
+    file_mtime = Column(DateTime())
+    md5 = Column(String(32))
+    status = Column(String(10), nullable=False, default="done", server_default="done")
+    # repr of the RecordFilter the file was loaded with, None for all of it
+    record_filter = Column(Text)
 
     def __repr__(self):
-        return f"XmlFile({self.xml_file_name}, {self.doc_type_name}, {self.dtd_system_id}, {self.time_processed})"
+        return (
+            f"XmlFile({self.xml_file_name}, {self.doc_type_name}, {self.dtd_system_id}, {self.time_processed},"
+            f" {self.status})"
+        )
 
     citation = relationship(
         Citation, secondary=PmidFileMapping.__table__, backref=backref("xml_files", order_by=xml_file_name)
@@ -183,7 +194,7 @@ class Comment(Base):
         index=True,
     )
     ref_type = Column(String(21), nullable=False)
-    ref_source = Column(String(255), nullable=False)
+    ref_source = Column(String(255), nullable=False, index=True)
     pmid_version = Column(Integer, index=True)
 
     def __repr__(self):
@@ -295,6 +306,25 @@ class OtherId(Base):
     citation = relationship(Citation, backref=backref("other_ids", order_by=pmid, cascade="all, delete-orphan"))
 
 
+# Identifiers of the article, from PubmedData's ArticleIdList (doi, pmc, pii, mid ...) and the Article's valid
+# ELocationIDs, so resolving a DOI or PMCID to its PMID is one probe of the (id_type, id_value) index. See
+# pubmedpg.normalise.identifier_value for how values are stored.
+class ArticleIdentifier(Base):
+    pmid = Column(
+        ForeignKey("citation.pmid", deferrable=True, initially="DEFERRED", ondelete="CASCADE", onupdate="CASCADE"),
+        primary_key=True,
+    )
+    id_type = Column(String(20), primary_key=True)
+    id_value = Column(String(200), primary_key=True)
+
+    __table_args__ = (Index("ix_article_identifier_id_type_id_value", id_type, id_value),)
+
+    def __repr__(self):
+        return f"ArticleIdentifier ({self.pmid}, {self.id_type}, {self.id_value})"
+
+    citation = relationship(Citation, backref=backref("identifiers", order_by=id_type, cascade="all, delete-orphan"))
+
+
 class Keyword(Base):
     pmid = Column(
         ForeignKey("citation.pmid", deferrable=True, initially="DEFERRED", ondelete="CASCADE", onupdate="CASCADE"),
@@ -376,6 +406,10 @@ class Author(Base):
     initials = Column(String(10))
     suffix = Column(String(20))
     collective_name = Column(String(2700), index=True)
+    # folded last name plus first initial, see pubmedpg.normalise.author_key
+    name_key = Column(String(310))
+
+    __table_args__ = (Index("ix_author_name_key", name_key, postgresql_ops={"name_key": "varchar_pattern_ops"}),)
 
     def __repr__(self):
         return f"Author ({self.last_name}, {self.fore_name}, {self.initials}, {self.suffix}, {self.collective_name})"
@@ -475,3 +509,194 @@ class SupplMeshName(Base):
     citation = relationship(
         Citation, backref=backref("suppl_mesh_names", order_by=suppl_mesh_name, cascade="all, delete-orphan")
     )
+
+
+# Optional normalised schema (PMPG_NORMALISED=true): MeSH descriptors, qualifiers and journal titles are stored once
+# in dimension tables keyed by their NLM UI, and the per-citation fact tables only carry the UIs. In that mode
+# mesh_heading and qualifier stay empty and journal.title/iso_abbreviation are left null, see pubmedpg.dimensions.
+
+
+class MeshDescriptor(Base):
+    descriptor_ui = Column(String(10), primary_key=True)
+    descriptor_name = Column(String(500), nullable=False)
+
+    def __repr__(self):
+        return f"MeshDescriptor ({self.descriptor_ui}, {self.descriptor_name})"
+
+
+class MeshQualifier(Base):
+    qualifier_ui = Column(String(10), primary_key=True)
+    qualifier_name = Column(String(500), nullable=False)
+
+    def __repr__(self):
+        return f"MeshQualifier ({self.qualifier_ui}, {self.qualifier_name})"
+
+
+class JournalTitle(Base):
+    nlm_unique_id = Column(String(20), primary_key=True)
+    title = Column(String(2000))
+    iso_abbreviation = Column(String(200))
+
+    def __repr__(self):
+        return f"JournalTitle ({self.nlm_unique_id}, {self.title}, {self.iso_abbreviation})"
+
+
+class MeshHeadingRef(Base):
+    pmid = Column(
+        ForeignKey("citation.pmid", deferrable=True, initially="DEFERRED", ondelete="CASCADE", onupdate="CASCADE"),
+        primary_key=True,
+    )
+    descriptor_ui = Column(
+        ForeignKey("mesh_descriptor.descriptor_ui", deferrable=True, initially="DEFERRED"),
+        primary_key=True,
+        index=True,
+    )
+    descriptor_name_major_yn = Column(YESNO_ENUM, default="N")
+
+    def __repr__(self):
+        return f"MeshHeadingRef ({self.descriptor_ui}, {self.descriptor_name_major_yn})"
+
+    citation = relationship(
+        Citation, backref=backref("mesh_heading_refs", order_by=descriptor_ui, cascade="all, delete-orphan")
+    )
+
+
+class QualifierRef(Base):
+    pmid = Column(
+        ForeignKey("citation.pmid", deferrable=True, initially="DEFERRED", ondelete="CASCADE", onupdate="CASCADE"),
+        primary_key=True,
+    )
+    descriptor_ui = Column(
+        ForeignKey("mesh_descriptor.descriptor_ui", deferrable=True, initially="DEFERRED"),
+        primary_key=True,
+        index=True,
+    )
+    qualifier_ui = Column(
+        ForeignKey("mesh_qualifier.qualifier_ui", deferrable=True, initially="DEFERRED"),
+        primary_key=True,
+        index=True,
+    )
+    qualifier_name_major_yn = Column(YESNO_ENUM, default="N")
+
+    def __repr__(self):
+        return f"QualifierRef ({self.descriptor_ui}, {self.qualifier_ui}, {self.qualifier_name_major_yn})"
+
+    citation = relationship(
+        Citation, backref=backref("qualifier_refs", order_by=qualifier_ui, cascade="all, delete-orphan")
+    )
+
+
+# Records that failed to parse or to load, with the source xml and traceback, so the rest of their file can still be
+# committed and they can be retried on their own. raw_xml is None for records that only failed when flushed, those are
+# read back from the source file on retry.
+class QuarantinedRecord(Base):
+    id = Column(Integer, nullable=False, autoincrement=True, primary_key=True)
+    pmid = Column(Integer, index=True)
+    xml_file_name = Column(String(50), nullable=False, index=True)
+    raw_xml = Column(Text)
+    error = Column(Text, nullable=False)
+    time_quarantined = Column(DateTime())
+
+    def __repr__(self):
+        return f"QuarantinedRecord ({self.pmid}, {self.xml_file_name}, {self.time_quarantined})"
+
+
+# Files of a load shared out between any number of loaders pointed at the same database, claimed with
+# SELECT ... FOR UPDATE SKIP LOCKED under a lease that the loader keeps extending while it works, see pubmedpg.workqueue
+class QueuedFile(Base):
+    xml_file_name = Column(String(50), primary_key=True)
+    status = Column(String(10), nullable=False, default="pending", server_default="pending", index=True)
+    worker = Column(String(100))
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    lease_expires = Column(DateTime())
+    heartbeat = Column(DateTime())
+    time_enqueued = Column(DateTime())
+    time_finished = Column(DateTime())
+    error = Column(Text)
+
+    def __repr__(self):
+        return f"QueuedFile ({self.xml_file_name}, {self.status}, {self.worker}, {self.attempts})"
+
+
+# PMID -> PMID edges materialised from comment rows that reference another PMID (comment.pmid_version holds the
+# referenced PMID), indexed in both directions, see pubmedpg.crud.graph
+class CitationEdge(Base):
+    pmid = Column(
+        ForeignKey("citation.pmid", deferrable=True, initially="DEFERRED", ondelete="CASCADE", onupdate="CASCADE"),
+        primary_key=True,
+    )
+    ref_type = Column(String(21), primary_key=True)
+    ref_pmid = Column(Integer, primary_key=True)
+
+    __table_args__ = (Index("ix_citation_edge_ref_pmid_ref_type", ref_pmid, ref_type),)
+
+    def __repr__(self):
+        return f"CitationEdge ({self.pmid}, {self.ref_type}, {self.ref_pmid})"
+
+
+# The whole citation as one JSONB document, its columns plus a list of rows per child table, written by the loader
+# with --documents so a complete record is a single primary key read, see pubmedpg.crud.documents
+class CitationDocument(Base):
+    pmid = Column(
+        ForeignKey("citation.pmid", deferrable=True, initially="DEFERRED", ondelete="CASCADE", onupdate="CASCADE"),
+        primary_key=True,
+    )
+    document = Column(JSONB, nullable=False)
+
+    def __repr__(self):
+        return f"CitationDocument ({self.pmid})"
+
+
+# Hash of the rows each citation was loaded as, an update re-sending a citation unchanged skips writing it again
+class CitationHash(Base):
+    pmid = Column(
+        ForeignKey("citation.pmid", deferrable=True, initially="DEFERRED", ondelete="CASCADE", onupdate="CASCADE"),
+        primary_key=True,
+    )
+    content_hash = Column(String(32), nullable=False)
+
+    def __repr__(self):
+        return f"CitationHash ({self.pmid}, {self.content_hash})"
+
+
+# The PubmedArticle xml each citation was parsed from, compressed, written by the loader with --archive so citations
+# can be reparsed without their source files, see pubmedpg.archive
+class RawArticle(Base):
+    pmid = Column(
+        ForeignKey("citation.pmid", deferrable=True, initially="DEFERRED", ondelete="CASCADE", onupdate="CASCADE"),
+        primary_key=True,
+    )
+    codec = Column(String(10), nullable=False)
+    raw_xml = Column(LargeBinary, nullable=False)
+
+    def __repr__(self):
+        return f"RawArticle ({self.pmid}, {self.codec})"
+
+
+# Summary tables for MeSH facets, built after a load and kept up to date by the loader, see pubmedpg.crud.facets
+class MeshYearCount(Base):
+    descriptor_ui = Column(String(10), primary_key=True)
+    pub_date_year = Column(Integer, primary_key=True, index=True)
+    citation_count = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"MeshYearCount ({self.descriptor_ui}, {self.pub_date_year}, {self.citation_count})"
+
+
+class MeshQualifierCount(Base):
+    descriptor_ui = Column(String(10), primary_key=True)
+    qualifier_ui = Column(String(10), primary_key=True)
+    citation_count = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"MeshQualifierCount ({self.descriptor_ui}, {self.qualifier_ui}, {self.citation_count})"
+
+
+class MeshCooccurrence(Base):
+    # each pair is stored once, with descriptor_ui_a < descriptor_ui_b
+    descriptor_ui_a = Column(String(10), primary_key=True)
+    descriptor_ui_b = Column(String(10), primary_key=True, index=True)
+    citation_count = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"MeshCooccurrence ({self.descriptor_ui_a}, {self.descriptor_ui_b}, {self.citation_count})"
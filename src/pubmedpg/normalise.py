@@ -0,0 +1,189 @@
+"""
+    Normalisation of raw field text collected during a parse.
+
+    The set_* functions record the raw Year/Month/Day and MedlineDate strings against the object and attribute they
+    belong to, and a batch of citations is converted in one pass before it goes to the sink. Conversion goes through
+    precomputed lookup tables and a cache of already converted values (there are only a few tens of thousands of
+    distinct dates in MEDLINE), so odd dates come out as None rather than as one raised exception each.
+
+    The author name keys used by the author index are computed here too, so the loader and the read side agree.
+"""
+import calendar
+import datetime
+import unicodedata
+
+# convert 3 letter code of months to digits for unique publication format
+MONTH_CODE = {
+    "Jan": "01",
+    "Feb": "02",
+    "Mar": "03",
+    "Apr": "04",
+    "May": "05",
+    "Jun": "06",
+    "Jul": "07",
+    "Aug": "08",
+    "Sep": "09",
+    "Oct": "10",
+    "Nov": "11",
+    "Dec": "12",
+}
+
+# every spelling of a month number we see in DateCreated/DateCompleted/DateRevised: 1, 01, Jan, JAN, jan
+MONTH_NUMBER = {}
+for _name, _code in MONTH_CODE.items():
+    for _key in (_name, _name.upper(), _name.lower(), _code, str(int(_code))):
+        MONTH_NUMBER[_key] = int(_code)
+
+DAY_NUMBER = {}
+for _day in range(1, 32):
+    DAY_NUMBER[str(_day)] = DAY_NUMBER[f"{_day:02d}"] = _day
+
+_date_cache = {}
+_year_cache = {}
+
+
+def _year(text):
+    if text is not None and len(text) == 4 and text.isdigit():
+        return int(text)
+    return None
+
+
+def _to_date(year, month, day):
+    y = _year(year)
+    m = MONTH_NUMBER.get(month)
+    d = DAY_NUMBER.get(day)
+    if y is None or m is None or d is None or d > calendar.monthrange(y, m)[1]:
+        return None
+    return datetime.date(y, m, d)
+
+
+def normalise_dates(raw_dates):
+    """
+    [(year, month, day) strings] -> [datetime.date or None]
+    """
+    dates = []
+    for raw in raw_dates:
+        if raw not in _date_cache:
+            _date_cache[raw] = _to_date(*raw)
+        dates.append(_date_cache[raw])
+    return dates
+
+
+def _to_pub_year(year, medline_date):
+    if year is not None:
+        return _year(year.strip())
+    if medline_date is None:
+        return None
+    # MedlineDate is free text like "1998 Dec-1999 Jan" or "Winter 2001", try the start then the end
+    medline_date = medline_date.strip()
+    y = _year(medline_date[:4])
+    return y if y is not None else _year(medline_date[-4:])
+
+
+def normalise_pub_years(raw_years):
+    """
+    [(Year text, MedlineDate text)] -> [int or None]
+    """
+    years = []
+    for raw in raw_years:
+        if raw not in _year_cache:
+            _year_cache[raw] = _to_pub_year(*raw)
+        years.append(_year_cache[raw])
+    return years
+
+
+def normalise_months(raw_months):
+    """
+    [PubDate Month text] -> [two digit month where the text is a month code, otherwise the text unchanged]
+    """
+    return [MONTH_CODE.get(raw, raw) for raw in raw_months]
+
+
+class FieldNormaliser:
+    """
+    Collects raw values for a batch of citations and fills in the converted values with `resolve`. Later additions
+    for the same object and attribute win, as plain attribute assignment would.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.dates = ([], [])
+        self.pub_years = ([], [])
+        self.months = ([], [])
+
+    def add_date(self, obj, attr, year, month, day):
+        self.dates[0].append((obj, attr))
+        self.dates[1].append((year, month, day))
+
+    def add_pub_year(self, obj, year, medline_date=None):
+        self.pub_years[0].append((obj, "pub_date_year"))
+        self.pub_years[1].append((year, medline_date))
+
+    def add_month(self, obj, month):
+        self.months[0].append((obj, "pub_date_month"))
+        self.months[1].append(month)
+
+    def resolve(self, xml_name=None):
+        for (targets, raw), normalise in (
+            (self.dates, normalise_dates),
+            (self.pub_years, normalise_pub_years),
+            (self.months, normalise_months),
+        ):
+            for (obj, attr), value in zip(targets, normalise(raw)):
+                setattr(obj, attr, value)
+        for (obj, _attr), raw in zip(*self.pub_years):
+            if obj.pub_date_year is None and any(raw):
+                pubmed_id = obj.citation.pmid if obj.citation is not None else None
+                print(f"Unable to get year for {pubmed_id=}: {xml_name=}, {raw=}")
+        self.clear()
+
+
+def fold_name(text):
+    """
+    Case-folded, accent-stripped name with punctuation dropped and whitespace collapsed: "Müller-Lüdenscheidt, Jr."
+    -> "muller ludenscheidt jr"
+    """
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    kept = "".join(c if c.isalnum() else " " for c in decomposed if not unicodedata.combining(c))
+    return " ".join(kept.split())
+
+
+def page_range(medline_pgn):
+    """
+    (start page, end page) of the first range in a MedlinePgn, with the abbreviated end page written out, e.g.
+    "123-9, 140" -> ("123", "129"), "e1234" -> ("e1234", None). Each is at most 10 characters, or None.
+    """
+    first = (medline_pgn or "").split(",")[0].split(";")[0].strip()
+    start, _, end = first.partition("-")
+    start = start.strip()
+    end = end.strip()
+    if start.isdigit() and end.isdigit() and len(end) < len(start):
+        end = start[: len(start) - len(end)] + end
+    return start[:10] or None, end[:10] or None
+
+
+def identifier_value(id_type, value):
+    """
+    An article identifier as stored and looked up: stripped, and lower case for DOIs, which compare case-insensitively,
+    e.g. ("doi", " 10.1000/ABC ") -> "10.1000/abc". None if there is nothing left.
+    """
+    value = (value or "").strip()
+    if not value:
+        return None
+    return value.lower() if id_type == "doi" else value
+
+
+def author_key(last_name, fore_name=None, initials=None):
+    """
+    Last name plus first initial, both folded, e.g. ("Müller", "Jörg", "J") -> "muller j". None without a last name,
+    as for collective authors.
+    """
+    last = fold_name(last_name)
+    if not last:
+        return None
+    first = fold_name(initials) or fold_name(fore_name)
+    return f"{last} {first[0]}" if first else last
@@ -0,0 +1,227 @@
+"""
+    PMID -> (version, xml file) index, telling each load task which file holds the winning version of a citation.
+
+    The index is one binary file next to the xml files, built from their id files and memory-mapped by the launching
+    process and every worker, so it is read from the page cache in milliseconds and exists in memory once however
+    many workers map it. It holds:
+
+        header        magic, number of files, number of PMIDs
+        files         for each file its name and the trailer of its id file, in load order
+        pmids         uint32, sorted
+        ordinals      uint16, the file of each PMID, an index into the files
+        versions      uint8, the PMID Version of that file's copy
+
+    A PMID found in more than one file is won by its highest Version, then by the latest file. `update` reuses the
+    existing index when the files it was built from are unchanged and only merges in the id files of new ones, e.g. the
+    daily update files; anything else (a file re-issued or removed) rebuilds it from all the id files.
+"""
+import bisect
+import mmap
+import os
+import struct
+from array import array
+
+from pubmedpg import TRAILER_PREFIX, read_id_file
+
+INDEX_FILE_NAME = "pmid_index.bin"
+MAGIC = b"PMPGIDX1"
+HEADER = struct.Struct("<8sIQ")
+LENGTH = struct.Struct("<H")
+MAX_FILES = 2**16
+MAX_VERSION = 2**8 - 1
+
+
+def id_file_trailer(xml_path):
+    # the last line, without reading the whole file
+    with open(f"{xml_path}.txt", "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 512))
+        last = f.read().decode().strip().rsplit("\n", 1)[-1]
+    return last if last.startswith(TRAILER_PREFIX) else ""
+
+
+def _pack(pmid, version, ordinal):
+    # sorts by pmid, then version, then file, so the last of each run of equal pmids is the winner
+    return (pmid << 24) | (version << 16) | ordinal
+
+
+def _keys_from_id_files(xml_paths, first_ordinal=0):
+    keys = array("Q")
+    for ordinal, xml_path in enumerate(xml_paths, first_ordinal):
+        if ordinal >= MAX_FILES:
+            raise ValueError(f"A PmidIndex holds at most {MAX_FILES} files")
+        keys.extend(
+            _pack(pmid, min(int(version or 1), MAX_VERSION), ordinal)
+            for pmid, version in read_id_file(f"{xml_path}.txt")
+        )
+    return keys
+
+
+def _winners(keys):
+    """
+    Sorted packed keys -> pmids, ordinals and versions arrays with the last (winning) key of each pmid
+    """
+    pmids = array("I")
+    ordinals = array("H")
+    versions = array("B")
+    previous = None
+    for key in keys:
+        pmid = key >> 24
+        if pmid == previous:
+            ordinals[-1] = key & 0xFFFF
+            versions[-1] = (key >> 16) & 0xFF
+        else:
+            pmids.append(pmid)
+            ordinals.append(key & 0xFFFF)
+            versions.append((key >> 16) & 0xFF)
+            previous = pmid
+    return pmids, ordinals, versions
+
+
+def _merge(index, pmids, ordinals, versions):
+    """
+    The index's arrays with the winners from newer files merged in. Update files mostly revise PMIDs already indexed,
+    replaced in place, or add PMIDs above all the others, appended, so this is a copy of the arrays plus a bisect per
+    new entry rather than a full sort.
+    """
+    merged = (array("I", index.pmids), array("H", index.ordinals), array("B", index.versions))
+    inserts = []
+    for pmid, ordinal, version in zip(pmids, ordinals, versions):
+        i = index._find(pmid)
+        if i is None:
+            inserts.append((pmid, ordinal, version))
+        elif version >= merged[2][i]:
+            merged[1][i] = ordinal
+            merged[2][i] = version
+    if not inserts:
+        return merged
+    # splice the new PMIDs in between slices of the old arrays
+    result = (array("I"), array("H"), array("B"))
+    start = 0
+    for pmid, ordinal, version in inserts:
+        end = bisect.bisect_left(merged[0], pmid, start)
+        for values, old, new in zip(result, merged, (pmid, ordinal, version)):
+            values.extend(old[start:end])
+            values.append(new)
+        start = end
+    for values, old in zip(result, merged):
+        values.extend(old[start:])
+    return result
+
+
+class PmidIndex:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, file_count, count = HEADER.unpack_from(self.mm)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a PmidIndex")
+        offset = HEADER.size
+        self.xml_names = []
+        self.trailers = []
+        for _ in range(file_count):
+            for values in (self.xml_names, self.trailers):
+                (length,) = LENGTH.unpack_from(self.mm, offset)
+                offset += LENGTH.size
+                end = offset + length
+                values.append(self.mm[offset:end].decode())
+                offset = end
+        offset += -offset % 8
+        pmids_end = offset + 4 * count
+        ordinals_end = pmids_end + 2 * count
+        versions_end = ordinals_end + count
+        self.view = memoryview(self.mm)
+        self.pmids = self.view[offset:pmids_end].cast("I")
+        self.ordinals = self.view[pmids_end:ordinals_end].cast("H")
+        self.versions = self.view[ordinals_end:versions_end].cast("B")
+
+    @classmethod
+    def write(cls, path, files, pmids, ordinals, versions):
+        """
+        Write an index of `files` [(xml name, id file trailer)] from the arrays of its entries and open it
+        """
+        header = bytearray(HEADER.pack(MAGIC, len(files), len(pmids)))
+        for xml_name, trailer in files:
+            for value in (xml_name.encode(), trailer.encode()):
+                header += LENGTH.pack(len(value)) + value
+        header += bytes(-len(header) % 8)
+        # write then rename, workers of a running load keep the old one mapped
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(header)
+            pmids.tofile(f)
+            ordinals.tofile(f)
+            versions.tofile(f)
+        os.replace(f"{path}.tmp", path)
+        return cls(path)
+
+    @classmethod
+    def build(cls, path, xml_paths):
+        """
+        Index the id files of `xml_paths`, given in load order
+        """
+        files = [(os.path.basename(xml_path), id_file_trailer(xml_path)) for xml_path in xml_paths]
+        return cls.write(path, files, *_winners(sorted(_keys_from_id_files(xml_paths))))
+
+    @classmethod
+    def update(cls, path, xml_paths):
+        """
+        The index of `xml_paths` at `path`, brought up to date by merging in the files added since it was written, or
+        rebuilt if any of the files it holds changed
+        """
+        if not os.path.exists(path):
+            return cls.build(path, xml_paths)
+        try:
+            index = cls(path)
+        except (ValueError, struct.error):
+            # truncated or from an older format
+            return cls.build(path, xml_paths)
+        files = [(os.path.basename(xml_path), id_file_trailer(xml_path)) for xml_path in xml_paths]
+        known = len(index.xml_names)
+        if files[:known] != list(zip(index.xml_names, index.trailers)):
+            index.close()
+            return cls.build(path, xml_paths)
+        if len(files) == known:
+            return index
+        new = _winners(sorted(_keys_from_id_files(xml_paths[known:], known)))
+        try:
+            merged = _merge(index, *new)
+        finally:
+            index.close()
+        return cls.write(path, files, *merged)
+
+    def __len__(self):
+        return len(self.pmids)
+
+    def _find(self, pmid):
+        i = bisect.bisect_left(self.pmids, pmid)
+        if i < len(self.pmids) and self.pmids[i] == pmid:
+            return i
+        return None
+
+    def get(self, pmid, default=None):
+        """
+        The name of the file holding the winning version of `pmid`
+        """
+        i = self._find(pmid)
+        return default if i is None else self.xml_names[self.ordinals[i]]
+
+    def version(self, pmid):
+        i = self._find(pmid)
+        return None if i is None else self.versions[i]
+
+    def wins(self, pmid, xml_name, version=1):
+        """
+        True if the copy of `pmid` with `version` in file `xml_name` is the one to load
+        """
+        i = self._find(pmid)
+        return (
+            i is not None
+            and self.xml_names[self.ordinals[i]] == xml_name
+            and self.versions[i] == min(version, MAX_VERSION)
+        )
+
+    def close(self):
+        for view in (self.pmids, self.ordinals, self.versions, self.view):
+            view.release()
+        self.mm.close()
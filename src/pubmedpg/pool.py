@@ -0,0 +1,105 @@
+"""
+    The worker pool of a run, shared by the id pass and the load pass.
+
+    Workers come from a forkserver that has already imported the loader, so they start quickly and inherit nothing of
+    the parent's heap. Read-only state that every task needs (the manifest and dimension caches in the sink options)
+    is handed over explicitly: `share` pickles it into a shared memory block once and tasks carry only the block's
+    name, which `shared` loads once per worker. Only the hand-over goes through shared memory, pickling the state once
+    instead of into every task: each worker unpickles a private copy, so the state costs its size once per worker.
+    What is actually shared between the workers is the PMID index, a file every worker maps, see pubmedpg.pmid_index.
+"""
+import os
+import pickle
+import resource
+import struct
+import sys
+import time
+from multiprocessing import get_all_start_methods, get_context, shared_memory
+
+HEADER = struct.Struct("<Q")
+
+_shared = {}
+# set in each worker by the pool initializer, see worker_pool
+_started = None
+STARTUP_TIMEOUT = 120
+
+
+def rss_mb():
+    """
+    Resident set size of this process in MB, the peak where the current one is not available
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kB on Linux, bytes on macOS
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def _init_worker(started):
+    global _started
+    _started = started
+
+
+def worker_info(_n=None):
+    # held until every worker has taken one, so no worker answers twice
+    _started.wait(STARTUP_TIMEOUT)
+    return os.getpid(), rss_mb()
+
+
+def worker_pool(processes, preload=()):
+    """
+    A started pool of `processes` workers, with the modules of `preload` imported by the forkserver before it forks
+    them. Prints how long they took to start and their RSS.
+    """
+    if "forkserver" in get_all_start_methods():
+        context = get_context("forkserver")
+        context.set_forkserver_preload(list(preload))
+    else:
+        context = get_context()
+    before = time.perf_counter()
+    started = context.Barrier(processes)
+    pool = context.Pool(processes=processes, initializer=_init_worker, initargs=(started,))
+    # one task per worker, each waiting at the barrier, so they have all started by the time this returns
+    workers = dict(pool.map(worker_info, range(processes), chunksize=1))
+    print(
+        f"Started {processes} {context.get_start_method()} workers in {time.perf_counter() - before:.2f}s,"
+        f" RSS {', '.join(f'{rss:.0f}' for rss in workers.values())} MB"
+    )
+    return pool
+
+
+def share(obj):
+    """
+    Pickle `obj` into a new shared memory block and return the block, whose `name` tasks pass to `shared`. The caller
+    unlinks it once the tasks are done.
+    """
+    data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    shm = shared_memory.SharedMemory(create=True, size=HEADER.size + len(data))
+    HEADER.pack_into(shm.buf, 0, len(data))
+    start = HEADER.size
+    end = start + len(data)
+    shm.buf[start:end] = data
+    return shm
+
+
+def shared(name):
+    """
+    The object `share` put in block `name`, unpickled into a copy of this process's own on its first call here
+    """
+    if name not in _shared:
+        shm = shared_memory.SharedMemory(name=name)
+        (size,) = HEADER.unpack_from(shm.buf)
+        start = HEADER.size
+        end = start + size
+        _shared[name] = pickle.loads(shm.buf[start:end])
+        shm.close()
+    return _shared[name]
+
+
+def release(name):
+    """
+    Forget this process's copy of block `name`, once the run it was shared for is over
+    """
+    _shared.pop(name, None)
@@ -0,0 +1,626 @@
+"""
+    Output sinks for parsed citations.
+
+    The parser builds the same ORM object graph (a Citation with its child relationships) whatever the destination,
+    and hands each finished Citation to a sink. DbSink adds them to a Session, ParquetSink flattens them into per-table
+    rows and writes one Parquet file per table and input file, without a database in the loop.
+"""
+import datetime
+import hashlib
+import json
+import os
+import traceback
+from xml.etree import ElementTree
+
+from sqlalchemy import Date, DateTime, Integer, inspect, text
+from sqlalchemy.orm import configure_mappers
+
+from pubmedpg.archive import compress, default_codec
+from pubmedpg.crud.facets import apply_facet_delta
+from pubmedpg.crud.graph import refresh_citation_edges
+from pubmedpg.interning import DICTIONARY_COLUMNS
+from pubmedpg.manifest import (
+    STATUS_DONE,
+    STATUS_FAILED,
+    STATUS_LOADING,
+    check_file,
+    file_md5,
+    file_signature,
+    load_manifest,
+)
+from pubmedpg.models.pubmed import (
+    Citation,
+    CitationDocument,
+    CitationHash,
+    PmidFileMapping,
+    QuarantinedRecord,
+    RawArticle,
+    XmlFile,
+)
+
+_citation_layout = None
+_engines = {}
+
+
+def process_engine():
+    """
+    The engine of this process, created on first use and kept, so every file a worker loads reuses its pooled
+    connections. Keyed by pid, a forked child never uses its parent's.
+    """
+    pid = os.getpid()
+    if pid not in _engines:
+        from sqlalchemy import create_engine
+
+        from pubmedpg.core.config import settings
+
+        _engines[pid] = create_engine(settings.SQLALCHEMY_DATABASE_URI)
+    return _engines[pid]
+
+
+def citation_layout():
+    """
+    (relationship key, table name, [(attribute key, column name, scalar default)]) for the Citation table and each of
+    its one-to-many child relationships, in a stable order. Computed once per process.
+    """
+    global _citation_layout
+    if _citation_layout is None:
+        configure_mappers()
+
+        def columns(mapper):
+            cols = []
+            for attr in mapper.column_attrs:
+                col = attr.columns[0]
+                default = col.default.arg if col.default is not None and col.default.is_scalar else None
+                cols.append((attr.key, col.name, default))
+            return cols
+
+        mapper = inspect(Citation)
+        layout = [(None, mapper.local_table.name, columns(mapper))]
+        for rel in sorted(mapper.relationships, key=lambda r: r.key):
+            if rel.secondary is not None or not rel.uselist:
+                continue
+            layout.append((rel.key, rel.mapper.local_table.name, columns(rel.mapper)))
+        _citation_layout = layout
+    return _citation_layout
+
+
+def citation_rows(db_citation):
+    """
+    Flatten a Citation and its children into {table name: [row dicts]}, filling in the pmid foreign key and column
+    defaults that would otherwise only be applied by the database at flush time.
+    """
+    rows = {}
+    for rel_key, table, cols in citation_layout():
+        objs = [db_citation] if rel_key is None else getattr(db_citation, rel_key)
+        if not objs:
+            continue
+        table_rows = rows.setdefault(table, [])
+        for obj in objs:
+            row = {}
+            for key, name, default in cols:
+                value = getattr(obj, key)
+                row[name] = default if value is None else value
+            row["pmid"] = db_citation.pmid
+            table_rows.append(row)
+    return rows
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, (datetime.date, datetime.datetime)) else value
+
+
+def citation_document(db_citation):
+    """
+    A Citation as one JSON-ready dict: its columns, and for each child table with rows a list of them without the pmid
+    and the surrogate ids, which are only allocated when the rows are flushed
+    """
+    rows = citation_rows(db_citation)
+    document = {name: _json_value(value) for name, value in rows.pop(citation_layout()[0][1])[0].items()}
+    for table, table_rows in rows.items():
+        document[table] = [
+            {name: _json_value(value) for name, value in row.items() if name not in ("pmid", "id")}
+            for row in table_rows
+        ]
+    return document
+
+
+def content_hash(db_citation, *extra):
+    """
+    Hash of the rows a Citation is written as, and of anything in `extra` that changes what else is written for it
+    """
+    rows = citation_rows(db_citation)
+    canonical = json.dumps([rows, extra], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.md5(canonical.encode()).hexdigest()
+
+
+class Sink:
+    """
+    Receives the citations parsed from one xml file. `open` is called with the file path before the first citation,
+    `flush` any number of times in between, `close` after the last one, with `ok` False if the file failed and anything written for it should be discarded.
+    Records that could not be parsed go to `quarantine` instead of `write`, with their raw xml and traceback, and are
+    kept by the sink alongside the file's citations. PMIDs written that the sink found already stored exactly as they
+    are, and so skipped, are in `unchanged`.
+    """
+
+    def already_loaded(self, path):
+        return False
+
+    def open(self, path):
+        self.xml_name = os.path.basename(path)
+        self.quarantined = []
+        self.unchanged = []
+        # retried records a later copy has replaced since, see loaded_later
+        self.superseded = []
+
+    def quarantine(self, pmid, raw_xml, error):
+        self.quarantined.append(
+            {
+                "pmid": pmid,
+                "xml_file_name": self.xml_name,
+                "raw_xml": raw_xml,
+                "error": error,
+                "time_quarantined": datetime.datetime.now(),
+            }
+        )
+
+    def loaded_later(self, pmids):
+        """
+        The pmids of `pmids` loaded from a file after the one being written, for retried records without a PMID index
+        to go by
+        """
+        return set()
+
+    def archive(self, pmid, article):
+        """
+        The PubmedArticle element the citation `pmid` about to be written was parsed from, for sinks that keep it
+        """
+
+    def drop(self, pmid):
+        """
+        A record of the file the load leaves out, whose copies from earlier files are not to be kept either
+        """
+
+    def write(self, db_citation):
+        raise NotImplementedError
+
+    def flush(self):
+        """
+        Hand over what was written so far and let go of it, called early by the parser when memory runs short
+        """
+
+    def close(self, ok=True):
+        pass
+
+
+class DbSink(Sink):
+    """
+    Loads citations through a Session, one transaction per xml file. The xml_file row is committed up front with
+    status "loading" and switched to "done" in the same transaction as the citations, so an interrupted load is left
+    visible in the manifest and redone on the next run. `manifest` is the result of `load_manifest`, loaded once by
+    the caller, otherwise it is queried here. With a DimensionCache as `dimensions`, citations are written to the
+    normalised MeSH/journal schema. The citation graph edges of the file's citations are refreshed in the same
+    transaction, as are the MeSH facet counts if `facets` is set, and with `documents` each citation is also written
+    to citation_document as built by `citation_document` before it is normalised, so with the MeSH names. With
+    `archive` the xml of each citation's PubmedArticle goes to raw_article, compressed, see pubmedpg.archive.
+    `record_filter` is the repr of the RecordFilter the parser loads with, recorded with the file so that a run with
+    another filter loads it again.
+
+    Citations already in the database from an earlier file are replaced, the caller only writes the copies that win.
+    Citations are flushed in a savepoint when the parser calls `flush`, or all at once from `close`, and expunged from
+    the session once flushed, so an early flush frees their memory. If a flush fails, its citations are retried one
+    savepoint each and the ones that still fail are quarantined (without raw xml, see `retry_quarantined`), so one bad
+    record no longer loses the whole file. The hash of the rows each citation is written as goes to citation_hash, a
+    citation sent again by an update with the same hash only has its pmid_file_mapping moved to the new file.
+    """
+
+    def __init__(
+        self, manifest=None, dimensions=None, facets=False, documents=False, archive=False, record_filter=None
+    ):
+        from sqlalchemy.orm import Session
+
+        self.engine = process_engine()
+        self.session = Session(self.engine)
+        self.manifest = manifest
+        self.dimensions = dimensions
+        self.facets = facets
+        self.documents = documents
+        self.codec = default_codec() if archive else None
+        self.record_filter = record_filter
+        self.signature = None
+        self.db_xml_file = None
+        # written and not yet flushed, with their documents, hashes and compressed xml by pmid, and the pmids flushed
+        # so far
+        self.pending = []
+        self.pending_documents = {}
+        self.pending_hashes = {}
+        self.pending_xml = {}
+        self.pmids = []
+        # left out by the record filter, their earlier copies are deleted
+        self.dropped = []
+
+    def __del__(self):
+        if getattr(self, "session", None):
+            self.session.close()
+
+    def already_loaded(self, path):
+        if self.manifest is None:
+            self.manifest = load_manifest(self.session)
+        entry = self.manifest.get(os.path.basename(path))
+        current, self.signature = check_file(entry, path, self.record_filter)
+        if current and (entry.size, entry.mtime) != (self.signature["size"], self.signature["mtime"]):
+            # loaded before there was a manifest, or copied again, record what it is now so the next run need not hash
+            self.session.execute(
+                text(
+                    "UPDATE xml_file SET file_size = :size, file_mtime = :mtime, md5 = COALESCE(:md5, md5)"
+                    " WHERE id = :id"
+                ),
+                {"id": entry.id, **self.signature},
+            )
+            self.session.commit()
+        return current
+
+    def open(self, path):
+        super().open(path)
+        if self.signature is None:
+            self.signature = file_signature(path)
+        elif self.signature["md5"] is None:
+            # already_loaded leaves hashing to a file that is loaded
+            self.signature["md5"] = file_md5(path)
+        entry = (self.manifest or {}).get(self.xml_name)
+        if entry is not None:
+            # a re-issued, failed or interrupted file, drop whatever made it in last time
+            if self.facets:
+                stale = self.session.execute(
+                    text("SELECT pmid FROM pmid_file_mapping WHERE id_file = :id_file"), {"id_file": entry.id}
+                )
+                apply_facet_delta(self.session, [pmid for (pmid,) in stale], -1)
+            self.session.execute(
+                text(
+                    "DELETE FROM citation WHERE pmid IN (SELECT pmid FROM pmid_file_mapping WHERE id_file = :id_file)"
+                ),
+                {"id_file": entry.id},
+            )
+            self.session.execute(
+                text("DELETE FROM quarantined_record WHERE xml_file_name = :name"), {"name": self.xml_name}
+            )
+            self.db_xml_file = self.session.get(XmlFile, entry.id)
+        else:
+            self.db_xml_file = XmlFile()
+            self.db_xml_file.xml_file_name = self.xml_name
+            self.session.add(self.db_xml_file)
+        self.db_xml_file.time_processed = datetime.datetime.now()
+        self.db_xml_file.file_size = self.signature["size"]
+        self.db_xml_file.file_mtime = self.signature["mtime"]
+        self.db_xml_file.md5 = self.signature["md5"]
+        self.db_xml_file.record_filter = self.record_filter
+        self.db_xml_file.status = STATUS_LOADING
+        self.session.commit()
+
+    def resume(self, xml_name):
+        """
+        Add citations to an already loaded file without reloading it, for retrying its quarantined records
+        """
+        Sink.open(self, xml_name)
+        self.db_xml_file = self.session.query(XmlFile).filter(XmlFile.xml_file_name == xml_name).one()
+
+    def loaded_later(self, pmids):
+        # files load in name order, pubmed22n0001 ... and the update files after the baseline
+        rows = self.session.execute(
+            text(
+                "SELECT m.pmid FROM pmid_file_mapping m JOIN xml_file x ON x.id = m.id_file"
+                " WHERE m.pmid = ANY(:pmids) AND x.xml_file_name > :name"
+            ),
+            {"pmids": [pmid for pmid in pmids if pmid is not None], "name": self.xml_name},
+        )
+        return {pmid for (pmid,) in rows}
+
+    def archive(self, pmid, article):
+        if self.codec is not None:
+            self.pending_xml[pmid] = compress(ElementTree.tostring(article, encoding="utf-8"), self.codec)
+
+    def drop(self, pmid):
+        self.dropped.append(pmid)
+
+    def _archive(self, pmids):
+        rows = [
+            {"pmid": pmid, "codec": self.codec, "raw_xml": self.pending_xml[pmid]}
+            for pmid in pmids
+            if pmid in self.pending_xml
+        ]
+        if rows:
+            self.session.execute(RawArticle.__table__.insert(), rows)
+
+    def write(self, db_citation):
+        if self.documents:
+            self.pending_documents[db_citation.pmid] = citation_document(db_citation)
+        if self.dimensions is not None:
+            self.dimensions.normalise(db_citation)
+        self.pending_hashes[db_citation.pmid] = content_hash(db_citation, self.documents)
+        self.pending.append(db_citation)
+
+    def _supersede(self, pmids):
+        # copies loaded from earlier files, which the PMID index says this one replaces
+        with self.session.no_autoflush:
+            if self.facets:
+                stale = self.session.execute(
+                    text("SELECT pmid FROM citation WHERE pmid = ANY(:pmids)"), {"pmids": pmids}
+                )
+                apply_facet_delta(self.session, [pmid for (pmid,) in stale], -1)
+            self.session.execute(text("DELETE FROM citation WHERE pmid = ANY(:pmids)"), {"pmids": pmids})
+
+    def _skip_unchanged(self, citations):
+        # the citations whose stored copy has the same hash keep it, moved to this file
+        hashes = self.session.execute(
+            text("SELECT pmid, content_hash FROM citation_hash WHERE pmid = ANY(:pmids)"),
+            {"pmids": [db_citation.pmid for db_citation in citations]},
+        )
+        unchanged = {pmid for pmid, stored in hashes if stored == self.pending_hashes[pmid]}
+        if not unchanged:
+            return citations
+        # upserted, a citation that lost its mapping row would otherwise stay without one
+        self.session.execute(
+            text(
+                "INSERT INTO pmid_file_mapping (pmid, id_file) SELECT pmid, :id_file FROM unnest(CAST(:pmids AS int[]))"
+                " AS pmid ORDER BY pmid ON CONFLICT (pmid) DO UPDATE SET id_file = excluded.id_file"
+            ),
+            {"id_file": self.db_xml_file.id, "pmids": sorted(unchanged)},
+        )
+        if self.codec is not None:
+            # the xml may differ in what is not loaded, which a reparse would want
+            self.session.execute(text("DELETE FROM raw_article WHERE pmid = ANY(:pmids)"), {"pmids": list(unchanged)})
+            self._archive(unchanged)
+        self.unchanged.extend(unchanged)
+        return [db_citation for db_citation in citations if db_citation.pmid not in unchanged]
+
+    def _add(self, citations):
+        # the mapping rows go in directly, through the xml_files relationship the file's row would keep every citation
+        self.session.add_all(citations)
+        self.session.flush()
+        self.session.execute(
+            PmidFileMapping.__table__.insert(),
+            [{"pmid": db_citation.pmid, "id_file": self.db_xml_file.id} for db_citation in citations],
+        )
+        self.session.execute(
+            CitationHash.__table__.insert(),
+            [
+                {"pmid": db_citation.pmid, "content_hash": self.pending_hashes[db_citation.pmid]}
+                for db_citation in citations
+            ],
+        )
+        if self.documents:
+            self.session.execute(
+                CitationDocument.__table__.insert(),
+                [
+                    {"pmid": db_citation.pmid, "document": self.pending_documents[db_citation.pmid]}
+                    for db_citation in citations
+                ],
+            )
+        if self.codec is not None:
+            self._archive([db_citation.pmid for db_citation in citations])
+
+    def _flush_each(self, citations):
+        loaded = []
+        for db_citation in citations:
+            try:
+                # the earlier copy stays if this one fails
+                with self.session.begin_nested():
+                    if not self._skip_unchanged([db_citation]):
+                        continue
+                    self._supersede([db_citation.pmid])
+                    self._add([db_citation])
+            except Exception:
+                self.quarantine(db_citation.pmid, None, traceback.format_exc())
+            else:
+                loaded.append(db_citation)
+        return loaded
+
+    def flush(self):
+        if not self.pending:
+            return
+        if self.dimensions is not None:
+            self.dimensions.flush(self.engine)
+        citations, self.pending = self.pending, []
+        unchanged = len(self.unchanged)
+        try:
+            with self.session.begin_nested():
+                loaded = self._skip_unchanged(citations)
+                if loaded:
+                    self._supersede([db_citation.pmid for db_citation in loaded])
+                    self._add(loaded)
+        except Exception:
+            # the savepoint took the moved mappings with it
+            del self.unchanged[unchanged:]
+            loaded = self._flush_each(citations)
+        citations = loaded
+        self.pmids.extend(db_citation.pmid for db_citation in citations)
+        for db_citation in citations:
+            self.session.expunge(db_citation)
+        self.pending_documents.clear()
+        self.pending_hashes.clear()
+        self.pending_xml.clear()
+
+    def close(self, ok=True):
+        if ok:
+            self.flush()
+            if self.dropped:
+                self._supersede(self.dropped)
+            refresh_citation_edges(self.session, self.pmids)
+            if self.facets:
+                apply_facet_delta(self.session, self.pmids)
+            # whatever loaded or failed again this time replaces earlier quarantined copies
+            self.session.execute(
+                text("DELETE FROM quarantined_record WHERE xml_file_name = :name AND pmid = ANY(:pmids)"),
+                {
+                    "name": self.xml_name,
+                    "pmids": (
+                        self.pmids + self.unchanged + self.superseded + [row["pmid"] for row in self.quarantined]
+                    ),
+                },
+            )
+            self.session.add_all(QuarantinedRecord(**row) for row in self.quarantined)
+            if self.db_xml_file.status == STATUS_LOADING:
+                self.db_xml_file.status = STATUS_DONE
+            self.session.commit()
+            return
+        self.session.rollback()
+        # a file being resumed keeps its status, what loaded before is still there
+        if self.db_xml_file is not None and self.db_xml_file.status == STATUS_LOADING:
+            self.db_xml_file.status = STATUS_FAILED
+            self.session.commit()
+
+
+def _arrow_type(pa, column):
+    if isinstance(column.type, Integer):
+        return pa.int32()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(column.type, Date):
+        return pa.date32()
+    return pa.string()
+
+
+def _coerce(value, arrow_type, pa):
+    # a few setters store the raw element text, e.g. ArticleDate years
+    if value is None or not pa.types.is_integer(arrow_type) or isinstance(value, int):
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+class ParquetSink(Sink):
+    """
+    Writes <path>/<table>/<xml file name>.parquet for every table that gets rows, plus a pmid_file_mapping table
+    keyed by xml file name rather than by xml_file.id, since there is no database to allocate ids. Rows are buffered
+    and written as one row group per `batch_size` rows, with the DICTIONARY_COLUMNS dictionary encoded. Files are
+    written under a temporary name and only renamed into place when the input file completes, so a finished output
+    file is also the marker that the input was done. Quarantined records go to <path>/quarantine/<xml file name>.jsonl.
+    `record_filter` is the repr of the RecordFilter the parser exports with, kept in the metadata of the marker so that
+    an export with another filter writes the file again.
+    """
+
+    def __init__(self, path, batch_size=50000, record_filter=None):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("The parquet sink requires pyarrow, install pubmedpg with the parquet extra") from e
+        self.pa = pa
+        self.pq = pq
+        self.path = path
+        self.batch_size = int(batch_size)
+        self.record_filter = record_filter
+        self.buffers = {}
+        self.writers = {}
+        self.schemas = {}
+        for _rel_key, table, _cols in citation_layout():
+            columns = {c.name: c for c in Citation.metadata.tables[table].columns}
+            dictionary_columns = DICTIONARY_COLUMNS.get(table, ())
+            self.schemas[table] = pa.schema(
+                [
+                    (
+                        name,
+                        pa.dictionary(pa.int32(), pa.string())
+                        if name in dictionary_columns
+                        else _arrow_type(pa, columns[name]),
+                    )
+                    for _key, name, _d in _cols
+                ]
+            )
+        self.schemas["pmid_file_mapping"] = pa.schema(
+            [("pmid", pa.int32()), ("xml_file_name", pa.string())],
+            metadata={"record_filter": record_filter} if record_filter else None,
+        )
+
+    def _target(self, table, xml_name):
+        return os.path.join(self.path, table, f"{xml_name}.parquet")
+
+    def already_loaded(self, path):
+        marker = self._target("pmid_file_mapping", os.path.basename(path))
+        if not os.path.exists(marker):
+            return False
+        # exported with the same filter, or both without one
+        metadata = self.pq.read_schema(marker).metadata or {}
+        return metadata.get(b"record_filter") == (self.record_filter.encode() if self.record_filter else None)
+
+    def open(self, path):
+        super().open(path)
+        self.buffers = {}
+        self.writers = {}
+
+    def write(self, db_citation):
+        rows = citation_rows(db_citation)
+        rows["pmid_file_mapping"] = [{"pmid": db_citation.pmid, "xml_file_name": self.xml_name}]
+        for table, table_rows in rows.items():
+            buffer = self.buffers.setdefault(table, [])
+            buffer.extend(table_rows)
+            if len(buffer) >= self.batch_size:
+                self._flush(table)
+
+    def _flush(self, table):
+        buffer = self.buffers.get(table)
+        if not buffer:
+            return
+        schema = self.schemas[table]
+        arrays = [
+            self.pa.array([_coerce(row.get(field.name), field.type, self.pa) for row in buffer], type=field.type)
+            for field in schema
+        ]
+        self._writer(table).write_table(self.pa.Table.from_arrays(arrays, schema=schema))
+        self.buffers[table] = []
+
+    def _writer(self, table):
+        if table not in self.writers:
+            target = self._target(table, self.xml_name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            self.writers[table] = self.pq.ParquetWriter(f"{target}.tmp", self.schemas[table])
+        return self.writers[table]
+
+    def flush(self):
+        # smaller row groups, the buffers are what the sink holds
+        for table in list(self.buffers):
+            self._flush(table)
+
+    def close(self, ok=True):
+        if ok:
+            self.flush()
+            # an empty mapping still marks the input file as done
+            self._writer("pmid_file_mapping")
+            # what an earlier export of the file, e.g. with another filter, wrote to tables that get no rows now
+            for table in self.schemas:
+                if table not in self.writers and os.path.exists(self._target(table, self.xml_name)):
+                    os.remove(self._target(table, self.xml_name))
+            if self.quarantined:
+                self._write_quarantine()
+            elif os.path.exists(self._quarantine_target()):
+                os.remove(self._quarantine_target())
+        # the mapping is the done marker, so it goes into place last
+        for table in sorted(self.writers, key=lambda t: t == "pmid_file_mapping"):
+            self.writers[table].close()
+            target = self._target(table, self.xml_name)
+            if ok:
+                os.replace(f"{target}.tmp", target)
+            else:
+                os.remove(f"{target}.tmp")
+        self.buffers = {}
+        self.writers = {}
+
+    def _quarantine_target(self):
+        return os.path.join(self.path, "quarantine", f"{self.xml_name}.jsonl")
+
+    def _write_quarantine(self):
+        target = self._quarantine_target()
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(f"{target}.tmp", "w") as f:
+            for row in self.quarantined:
+                f.write(json.dumps(row, default=str) + "\n")
+        os.replace(f"{target}.tmp", target)
+
+
+def make_sink(kind="db", **options):
+    if kind == "db":
+        return DbSink(**options)
+    if kind == "parquet":
+        return ParquetSink(**options)
+    raise ValueError(f"Unknown sink {kind!r}, expected 'db' or 'parquet'")
@@ -0,0 +1,217 @@
+"""
+    Reconciliation of the database with the xml files, `python -m pubmedpg verify`.
+
+    The expected side is worked out per file in the worker pool: the PMIDs of its id file that the PMID index says it
+    wins, less its quarantined records, as a count and a sum, or with `tables` the rows the loader would write to
+    each table, counted by parsing the file into a CountingSink. A load with a record filter is checked with the same
+    filter, by parsing the files too. The database side is one grouped query per table
+    over pmid_file_mapping. Only the files whose numbers disagree are looked at PMID by PMID, so a clean check after
+    a nightly update costs a pass over the id files and a handful of aggregates.
+"""
+import os
+from collections import Counter
+from functools import partial
+
+from pubmedpg import ensure_id_files, find_xml_paths, read_id_file
+from pubmedpg.pmid_index import INDEX_FILE_NAME, PmidIndex
+from pubmedpg.sinks import Sink, citation_layout, citation_rows
+
+# table -> its rows in either schema, a citation is only ever in one of them. The parse always gives the first.
+DB_SOURCES = {
+    "mesh_heading": "(SELECT pmid FROM mesh_heading UNION ALL SELECT pmid FROM mesh_heading_ref)",
+    "qualifier": "(SELECT pmid FROM qualifier UNION ALL SELECT pmid FROM qualifier_ref)",
+}
+NORMALISED_TABLES = {"mesh_heading_ref", "qualifier_ref"}
+
+FILE_CITATIONS = (
+    "SELECT x.xml_file_name, count(*), sum(m.pmid) FROM pmid_file_mapping m JOIN xml_file x ON x.id = m.id_file"
+    " GROUP BY 1"
+)
+FILE_ROWS = (
+    "SELECT x.xml_file_name, count(*) FROM {source} t JOIN pmid_file_mapping m ON m.pmid = t.pmid"
+    " JOIN xml_file x ON x.id = m.id_file GROUP BY 1"
+)
+
+
+class CountingSink(Sink):
+    """
+    Counts the rows each table would get from the citations written to it, leaving out the `excluded` pmids
+    """
+
+    def __init__(self, excluded=()):
+        self.excluded = set(excluded)
+        self.pmids = []
+        self.rows = Counter()
+
+    def write(self, db_citation):
+        if db_citation.pmid in self.excluded:
+            return
+        self.pmids.append(db_citation.pmid)
+        for table, table_rows in citation_rows(db_citation).items():
+            self.rows[table] += len(table_rows)
+
+
+def expected_pmids(path, index, excluded=()):
+    """
+    The PMIDs of the file at `path` that a load puts in the database, as the loader picks them
+    """
+    xml_name = os.path.basename(path)
+    excluded = set(excluded)
+    return sorted(
+        {
+            pmid
+            for pmid, version in read_id_file(f"{path}.txt")
+            if pmid not in excluded and index.wins(pmid, xml_name, int(version or 1))
+        }
+    )
+
+
+def parse_counts(path, index, excluded=(), record_filter=None):
+    """
+    A CountingSink with what parsing the file at `path` as the loader does writes to the database
+    """
+    from pub_med_parser import MedlineParser
+
+    sink = CountingSink(excluded)
+    MedlineParser(path, sink=sink, latest=index, record_filter=record_filter).parse()
+    return sink
+
+
+def expected_counts(path, index_path, quarantined, tables=False, record_filter=None):
+    """
+    Pool task: {"xml_name", "citations", "pmid_sum", "rows": {table: rows}} the database should hold for one file
+    """
+    index = PmidIndex(index_path)
+    try:
+        if tables or record_filter:
+            sink = parse_counts(path, index, quarantined.get(os.path.basename(path), ()), record_filter)
+            pmids = sink.pmids
+            rows = dict(sink.rows) if tables else {}
+        else:
+            pmids = expected_pmids(path, index, quarantined.get(os.path.basename(path), ()))
+            rows = {}
+    finally:
+        index.close()
+    return {"xml_name": os.path.basename(path), "citations": len(pmids), "pmid_sum": sum(pmids), "rows": rows}
+
+
+def database_counts(engine, tables=False):
+    """
+    ({xml_name: (citations, pmid sum)}, {table: {xml_name: rows}}, {xml_name: status}, {xml_name: {quarantined pmids}})
+    """
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        citations = {name: (count, int(total)) for name, count, total in conn.execute(text(FILE_CITATIONS))}
+        rows = {}
+        if tables:
+            for _rel_key, table, _cols in citation_layout()[1:]:
+                if table in NORMALISED_TABLES:
+                    continue
+                source = DB_SOURCES.get(table, f'"{table}"')
+                rows[table] = dict(tuple(row) for row in conn.execute(text(FILE_ROWS.format(source=source))))
+        statuses = dict(tuple(row) for row in conn.execute(text("SELECT xml_file_name, status FROM xml_file")))
+        quarantined = {}
+        for name, pmid in conn.execute(text("SELECT xml_file_name, pmid FROM quarantined_record")):
+            quarantined.setdefault(name, set()).add(pmid)
+    return citations, rows, statuses, quarantined
+
+
+def database_pmids(engine, xml_name):
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        return [
+            pmid
+            for (pmid,) in conn.execute(
+                text(
+                    "SELECT m.pmid FROM pmid_file_mapping m JOIN xml_file x ON x.id = m.id_file"
+                    " WHERE x.xml_file_name = :name ORDER BY 1"
+                ),
+                {"name": xml_name},
+            )
+        ]
+
+
+def verify(engine, medline_path, processes, tables=False, record_filter=None):
+    """
+    Compare every xml file under `medline_path` with what the database holds for it, loaded with `record_filter`,
+    and print the differences. Returns [{"xml_name", "problem", ...}], empty if everything matches.
+    """
+    from pubmedpg.pool import worker_pool
+
+    xml_paths = find_xml_paths(medline_path)
+    citations, rows, statuses, quarantined = database_counts(engine, tables)
+    with worker_pool(processes, preload=["pub_med_parser"]) as pool:
+        ensure_id_files(xml_paths, processes, pool)
+        index = PmidIndex.update(os.path.join(medline_path, INDEX_FILE_NAME), xml_paths)
+        task = partial(
+            expected_counts, index_path=index.path, quarantined=quarantined, tables=tables, record_filter=record_filter
+        )
+        expected = pool.map(task, xml_paths, chunksize=1)
+
+    problems = []
+    for path, counts in zip(xml_paths, expected):
+        xml_name = counts["xml_name"]
+        status = statuses.get(xml_name)
+        if status != "done":
+            if counts["citations"]:
+                problems.append({"xml_name": xml_name, "problem": "not loaded", "status": status})
+            continue
+        if citations.get(xml_name, (0, 0)) != (counts["citations"], counts["pmid_sum"]):
+            if record_filter:
+                wanted = set(parse_counts(path, index, quarantined.get(xml_name, ()), record_filter).pmids)
+            else:
+                wanted = set(expected_pmids(path, index, quarantined.get(xml_name, ())))
+            found = set(database_pmids(engine, xml_name))
+            problems.append(
+                {
+                    "xml_name": xml_name,
+                    "problem": "pmids",
+                    "missing": sorted(wanted - found),
+                    "extra": sorted(found - wanted),
+                }
+            )
+        for table, count in sorted(counts["rows"].items()):
+            if table != "citation" and rows[table].get(xml_name, 0) != count:
+                problems.append(
+                    {
+                        "xml_name": xml_name,
+                        "problem": "rows",
+                        "table": table,
+                        "expected": count,
+                        "found": rows[table].get(xml_name, 0),
+                    }
+                )
+        # tables the file should have no rows in
+        for table, table_rows in rows.items():
+            if table not in counts["rows"] and table_rows.get(xml_name):
+                problems.append(
+                    {
+                        "xml_name": xml_name,
+                        "problem": "rows",
+                        "table": table,
+                        "expected": 0,
+                        "found": table_rows[xml_name],
+                    }
+                )
+    index.close()
+    print_problems(problems, len(xml_paths), sum(len(pmids) for pmids in quarantined.values()))
+    return problems
+
+
+def print_problems(problems, files, quarantined):
+    print("############################################################")
+    print(f"Verified {files} files, {len(problems)} problems, {quarantined} records quarantined")
+    for problem in problems:
+        if problem["problem"] == "not loaded":
+            print(f"{problem['xml_name']}: not loaded, status {problem['status']}")
+        elif problem["problem"] == "pmids":
+            print(
+                f"{problem['xml_name']}: {len(problem['missing'])} PMIDs missing {problem['missing'][:10]},"
+                f" {len(problem['extra'])} extra {problem['extra'][:10]}"
+            )
+        else:
+            print(
+                f"{problem['xml_name']}: {problem['table']} has {problem['found']} rows, expected {problem['expected']}"
+            )
@@ -0,0 +1,105 @@
+"""
+    Notices xml files arriving under the medline path, for the long running `watch` command.
+
+    With the optional inotify_simple package (Linux) the directories are watched and a file is reported once it is
+    closed after writing or moved in, which is how mirroring tools finish a download. Otherwise the directories are
+    polled every `interval` seconds and a file is reported once its size has stopped changing between two polls. New
+    files come out in sequence-number order, pubmed24n1200 before pubmed24n1201 and the 2024 files after the 2023 ones,
+    so the updates are applied in the order NLM published them.
+"""
+import os
+import re
+import time
+
+SEQUENCE = re.compile(r"(\d+)n(\d+)\.xml(\.gz)?$")
+
+
+def is_xml_path(path):
+    return path.endswith(".xml") or path.endswith(".xml.gz")
+
+
+def sequence_key(path):
+    """
+    Sort key putting NLM file names (pubmed<yy>n<number>.xml.gz) in publication order, others after them by name
+    """
+    name = os.path.basename(path)
+    match = SEQUENCE.search(name)
+    if match is None:
+        return (1, 0, 0, name)
+    return (0, int(match.group(1)), int(match.group(2)), name)
+
+
+class Watcher:
+    """
+    `poll()` waits up to `interval` seconds and returns the xml files that have arrived since the previous call,
+    complete and in sequence-number order. Files present when the watcher was created count as seen.
+    """
+
+    def __init__(self, medline_path, interval=60):
+        self.medline_path = medline_path
+        self.interval = interval
+        self.seen = set(self._walk())
+        self.sizes = {}
+        try:
+            from inotify_simple import INotify, flags
+        except ImportError:
+            self.inotify = None
+            print(f"Polling {medline_path} every {interval}s for new files, install inotify_simple to be notified")
+            return
+        self.inotify = INotify()
+        self.flags = flags
+        self.directories = {}
+        for root, _dirs, _files in os.walk(medline_path):
+            self._add_directory(root)
+        print(f"Watching {medline_path} for new files")
+
+    def _walk(self):
+        for root, _dirs, files in os.walk(self.medline_path):
+            for filename in files:
+                if is_xml_path(filename):
+                    yield os.path.join(root, filename)
+
+    def _add_directory(self, path):
+        mask = self.flags.CLOSE_WRITE | self.flags.MOVED_TO | self.flags.CREATE
+        self.directories[self.inotify.add_watch(path, mask)] = path
+
+    def _notified(self):
+        arrived = []
+        for event in self.inotify.read(timeout=self.interval * 1000):
+            path = os.path.join(self.directories.get(event.wd, self.medline_path), event.name)
+            if event.mask & self.flags.ISDIR:
+                for root, _dirs, files in os.walk(path):
+                    self._add_directory(root)
+                    # a directory moved in arrives with its files complete, and files written to a new directory
+                    # before its watch was added send no event of their own, poll drops what is reported twice
+                    arrived.extend(os.path.join(root, filename) for filename in files if is_xml_path(filename))
+            elif event.mask & (self.flags.CLOSE_WRITE | self.flags.MOVED_TO) and is_xml_path(path):
+                arrived.append(path)
+        return arrived
+
+    def _polled(self):
+        time.sleep(self.interval)
+        arrived = []
+        sizes = {}
+        for path in self._walk():
+            if path in self.seen:
+                continue
+            try:
+                sizes[path] = os.path.getsize(path)
+            except OSError:
+                continue
+            # still being written while it keeps growing
+            if self.sizes.get(path) == sizes[path]:
+                arrived.append(path)
+        self.sizes = sizes
+        return arrived
+
+    def poll(self):
+        arrived = self._polled() if self.inotify is None else self._notified()
+        new = sorted({path for path in arrived if path not in self.seen}, key=sequence_key)
+        self.seen.update(new)
+        return new
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
@@ -0,0 +1,179 @@
+"""
+    Database backed work queue for sharing a load between machines.
+
+    Every loader enqueues the files it can see (names already queued are left alone, unless they were done and the
+    manifest says the file changed since, a re-issue by NLM under the same name), then claims one file at a time
+    with SELECT ... FOR UPDATE SKIP LOCKED, so concurrent loaders never wait on or claim the same row. A claim is a
+    lease: `Heartbeat` keeps extending it while the file loads, and a file whose lease ran out (its loader died) can be
+    claimed again by anyone. Files that failed are put back for another try until `max_attempts`, then left failed.
+"""
+import os
+import socket
+import threading
+import warnings
+
+from sqlalchemy import text
+
+from pubmedpg.manifest import check_file, load_manifest
+
+STATUS_PENDING = "pending"
+STATUS_CLAIMED = "claimed"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+LEASE_SECONDS = 600
+MAX_ATTEMPTS = 3
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue(engine, xml_paths, record_filter=None):
+    """
+    Queue the files of `xml_paths` not queued yet, and put those done but no longer current in the manifest, or done
+    with another `record_filter` (its repr), back as pending. Returns how many were added or put back.
+    """
+    from sqlalchemy.orm import Session
+
+    paths = {os.path.basename(path): path for path in xml_paths}
+    if not paths:
+        return 0
+    with Session(engine) as session:
+        manifest = load_manifest(session)
+    changed = sorted(
+        name
+        for name, path in paths.items()
+        if name in manifest and not check_file(manifest[name], path, record_filter)[0]
+    )
+    with engine.begin() as conn:
+        added = conn.execute(
+            text(
+                "INSERT INTO queued_file (xml_file_name, status, attempts, time_enqueued)"
+                " SELECT name, :pending, 0, now() FROM unnest(CAST(:names AS varchar[])) AS name"
+                " ON CONFLICT (xml_file_name) DO NOTHING"
+            ),
+            {"names": sorted(paths), "pending": STATUS_PENDING},
+        ).rowcount
+        reissued = conn.execute(
+            text(
+                "UPDATE queued_file SET status = :pending, attempts = 0, worker = NULL, error = NULL,"
+                " time_enqueued = now() WHERE status = :done AND xml_file_name = ANY(CAST(:names AS varchar[]))"
+            ),
+            {"names": changed, "pending": STATUS_PENDING, "done": STATUS_DONE},
+        ).rowcount
+        return added + reissued
+
+
+def requeue(engine, status=STATUS_FAILED):
+    """
+    Put the files in `status` back as pending with their attempts reset, e.g. the failed ones once fixed
+    """
+    with engine.begin() as conn:
+        return conn.execute(
+            text(
+                "UPDATE queued_file SET status = :pending, attempts = 0, worker = NULL, error = NULL"
+                " WHERE status = :status"
+            ),
+            {"pending": STATUS_PENDING, "status": status},
+        ).rowcount
+
+
+def claim(engine, worker, lease=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+    """
+    Claim the next pending or abandoned file for `worker`, returns its name or None once there is nothing left
+    """
+    with engine.begin() as conn:
+        # abandoned too often, most likely it kills its loader
+        conn.execute(
+            text(
+                "UPDATE queued_file SET status = :failed, error = 'lease expired on the last attempt'"
+                " WHERE status = :claimed AND lease_expires < now() AND attempts >= :max_attempts"
+            ),
+            {"failed": STATUS_FAILED, "claimed": STATUS_CLAIMED, "max_attempts": max_attempts},
+        )
+        return conn.execute(
+            text(
+                "UPDATE queued_file SET status = :claimed, worker = :worker, attempts = attempts + 1,"
+                " heartbeat = now(), lease_expires = now() + make_interval(secs => :lease)"
+                " WHERE xml_file_name = ("
+                " SELECT xml_file_name FROM queued_file"
+                " WHERE status = :pending OR (status = :claimed AND lease_expires < now())"
+                " ORDER BY xml_file_name LIMIT 1 FOR UPDATE SKIP LOCKED"
+                ") RETURNING xml_file_name"
+            ),
+            {"claimed": STATUS_CLAIMED, "pending": STATUS_PENDING, "worker": worker, "lease": lease},
+        ).scalar()
+
+
+def extend_lease(engine, xml_name, worker, lease=LEASE_SECONDS):
+    """
+    False if `worker` no longer holds the file, it was too slow to heartbeat and someone else claimed it
+    """
+    with engine.begin() as conn:
+        return (
+            conn.execute(
+                text(
+                    "UPDATE queued_file SET heartbeat = now(), lease_expires = now() + make_interval(secs => :lease)"
+                    " WHERE xml_file_name = :name AND worker = :worker AND status = :claimed"
+                ),
+                {"name": xml_name, "worker": worker, "lease": lease, "claimed": STATUS_CLAIMED},
+            ).rowcount
+            == 1
+        )
+
+
+def complete(engine, xml_name, worker, ok=True, error=None, max_attempts=MAX_ATTEMPTS):
+    """
+    Record the outcome of a claimed file, a failed one goes back to pending while it has attempts left
+    """
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "UPDATE queued_file SET time_finished = now(), error = :error, lease_expires = NULL,"
+                " status = CASE WHEN :ok THEN :done WHEN attempts < :max_attempts THEN :pending ELSE :failed END"
+                " WHERE xml_file_name = :name AND worker = :worker"
+            ),
+            {
+                "name": xml_name,
+                "worker": worker,
+                "ok": ok,
+                "error": error,
+                "max_attempts": max_attempts,
+                "done": STATUS_DONE,
+                "pending": STATUS_PENDING,
+                "failed": STATUS_FAILED,
+            },
+        )
+
+
+class Heartbeat(threading.Thread):
+    """
+    Extends the lease on `xml_name` every third of `lease` seconds for as long as the `with` block runs
+    """
+
+    def __init__(self, engine, xml_name, worker, lease=LEASE_SECONDS):
+        super().__init__(daemon=True)
+        self.engine = engine
+        self.xml_name = xml_name
+        self.worker = worker
+        self.lease = lease
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.lease / 3):
+            try:
+                if not extend_lease(self.engine, self.xml_name, self.worker, self.lease):
+                    warnings.warn(f"\nFile: {self.xml_name}\nLease lost by {self.worker}", Warning)
+                    return
+            except Exception as e:
+                # a later beat may get through before the lease runs out
+                warnings.warn(f"\nFile: {self.xml_name}\nHeartbeat failed: {e}", Warning)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.join()
@@ -0,0 +1,67 @@
+import os
+import sys
+import uuid
+
+import pytest
+
+# the loader script and the package live in src/, and settings need a database to point at even when nothing connects
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+for name, value in (
+    ("POSTGRES_SERVER", "localhost"),
+    ("POSTGRES_USER", "postgres"),
+    ("POSTGRES_PASSWORD", "postgres"),
+    ("POSTGRES_DB", "pubmedpg"),
+):
+    os.environ.setdefault(name, value)
+
+
+@pytest.fixture
+def engine():
+    """
+    An engine whose connections only see a schema of their own, dropped afterwards. Tests using it are skipped
+    without the PostgreSQL database of POSTGRES_*.
+    """
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.exc import OperationalError
+
+    from pubmedpg.core.config import settings
+
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, connect_args={"options": f"-c search_path={schema}"})
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE SCHEMA {schema}"))
+    except OperationalError:
+        pytest.skip("needs the PostgreSQL database of POSTGRES_*")
+    yield engine
+    engine.dispose()
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+    engine.dispose()
+
+
+@pytest.fixture
+def session(engine):
+    """
+    A session on the pubmedpg tables, created in the scratch schema of `engine`
+    """
+    from sqlalchemy.orm import Session
+
+    from pubmedpg.db.base import Base
+
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def loader(session, monkeypatch):
+    """
+    `session`, with the loader and the database sinks of this process writing through its engine
+    """
+    import pub_med_parser
+    from pubmedpg import sinks
+
+    monkeypatch.setitem(sinks._engines, os.getpid(), session.get_bind())
+    monkeypatch.setattr(pub_med_parser, "_sync_engine", session.get_bind())
+    return session
@@ -0,0 +1,35 @@
+import hashlib
+
+import pytest
+
+from pubmedpg.archive import ZDICT, compress, decompress
+from pubmedpg.bench import synthetic_article
+
+ARTICLE = synthetic_article(12345, 10).encode()
+
+
+def test_zlib_round_trip():
+    data = compress(ARTICLE, "zlib")
+    assert len(data) < len(ARTICLE) / 4
+    assert decompress(data, "zlib") == ARTICLE
+    assert decompress(compress(b"", "zlib"), "zlib") == b""
+
+
+def test_zstd_round_trip():
+    pytest.importorskip("zstandard")
+    data = compress(ARTICLE, "zstd")
+    assert len(data) < len(ARTICLE) / 4
+    assert decompress(data, "zstd") == ARTICLE
+    assert decompress(compress(b"", "zstd"), "zstd") == b""
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        compress(ARTICLE, "lz4")
+    with pytest.raises(ValueError):
+        decompress(ARTICLE, "lz4")
+
+
+def test_dictionary_never_changes():
+    # rows already archived need it byte for byte, a new dictionary needs a new codec name
+    assert hashlib.md5(ZDICT).hexdigest() == "3b9aac0a9bbc3e4e86b53bf1d52b39fb"
@@ -0,0 +1,42 @@
+import gzip
+import os
+import subprocess
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# generous for a cold interpreter on a busy CI box, importing the loader with SQLAlchemy and the models takes longer
+STARTUP_BUDGET_SECONDS = 1.0
+
+HEAVY_MODULES = ("sqlalchemy", "pydantic", "pyarrow", "pubmedpg.models", "pubmedpg.core.config", "pub_med_parser")
+
+
+def _python(*args, tmp_path):
+    # no POSTGRES_* settings at all, the commands under test must not need them
+    env = {"PATH": os.environ.get("PATH", ""), "PYTHONPATH": SRC, "HOME": str(tmp_path)}
+    return subprocess.run([sys.executable, *args], env=env, cwd=tmp_path, capture_output=True, text=True, check=True)
+
+
+def test_cli_imports_nothing_heavy(tmp_path):
+    result = _python("-c", "import sys, pubmedpg.cli; print(' '.join(sorted(sys.modules)))", tmp_path=tmp_path)
+    loaded = set(result.stdout.split())
+    assert [module for module in HEAVY_MODULES if module in loaded] == []
+
+
+def test_startup_budget(tmp_path):
+    before = time.perf_counter()
+    _python("-m", "pubmedpg", "--help", tmp_path=tmp_path)
+    assert time.perf_counter() - before < STARTUP_BUDGET_SECONDS
+
+
+def test_ids_without_database_settings(tmp_path):
+    with gzip.open(tmp_path / "pubmed22n0001.xml.gz", "wt") as f:
+        f.write(
+            "<PubmedArticleSet><PubmedArticle><MedlineCitation><PMID Version='1'>10</PMID></MedlineCitation>"
+            "</PubmedArticle><PubmedArticle><MedlineCitation><PMID Version='2'>11</PMID></MedlineCitation>"
+            "</PubmedArticle></PubmedArticleSet>"
+        )
+    _python("-m", "pubmedpg", "ids", "--medline-path", str(tmp_path), "--processes", "1", tmp_path=tmp_path)
+    with open(tmp_path / "pubmed22n0001.xml.gz.txt") as f:
+        assert f.read().splitlines()[:2] == ["10:1", "11:2"]
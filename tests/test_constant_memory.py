@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+
+from pubmedpg.bench import write_synthetic_file
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# the id pass over the file, reading it with iter_articles as the loader's parse does, then the peak RSS in kB
+ID_PASS = (
+    "import resource, sys; from pubmedpg import get_all_ids; get_all_ids(sys.argv[1]);"
+    " print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+)
+# the loader's parse, building every citation and handing it to a sink that drops it, then the same
+PARSE = (
+    "import resource, sys; from pubmedpg.bench import parse_file; stats = parse_file(sys.argv[1]);"
+    " print(stats['citations'], resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+)
+
+# articles left in the tree cost kilobytes each, 100k of them hundreds of MB
+ALLOWED_GROWTH_KB = 20 * 1024
+# parsing is slower than the id pass, so fewer records, compared with a file large enough to have filled its first
+# batches and caches. 15k more articles or citations kept around would still be well over the allowed growth
+PARSE_RECORDS = (5000, 20000)
+
+
+def _run(code, path):
+    env = dict(os.environ, PYTHONPATH=SRC)
+    result = subprocess.run([sys.executable, "-c", code, path], env=env, capture_output=True, text=True, check=True)
+    return [int(value) for value in result.stdout.splitlines()[-1].split()]
+
+
+def _peak_rss_kb(path):
+    return _run(ID_PASS, path)[-1]
+
+
+def test_peak_rss_does_not_grow_with_the_file(tmp_path):
+    small = str(tmp_path / "small.xml.gz")
+    large = str(tmp_path / "large.xml.gz")
+    write_synthetic_file(small, 1000, size=0)
+    write_synthetic_file(large, 100000, size=0)
+    assert _peak_rss_kb(large) - _peak_rss_kb(small) < ALLOWED_GROWTH_KB
+    with open(f"{large}.txt") as f:
+        assert len(f.read().splitlines()) == 100001
+
+
+def test_parse_peak_rss_does_not_grow_with_the_file(tmp_path):
+    small = str(tmp_path / "small.xml.gz")
+    large = str(tmp_path / "large.xml.gz")
+    write_synthetic_file(small, PARSE_RECORDS[0], size=0)
+    write_synthetic_file(large, PARSE_RECORDS[1], size=0)
+    small_citations, small_rss = _run(PARSE, small)
+    large_citations, large_rss = _run(PARSE, large)
+    assert (small_citations, large_citations) == PARSE_RECORDS
+    assert large_rss - small_rss < ALLOWED_GROWTH_KB
@@ -0,0 +1,21 @@
+from pubmedpg.bench import parse_record, synthetic_citation
+from pubmedpg.sinks import content_hash
+
+
+def test_content_hash_is_stable_across_parses():
+    data = synthetic_citation(1, 10)
+    assert content_hash(parse_record(data)) == content_hash(parse_record(data))
+    assert content_hash(parse_record(data), True) != content_hash(parse_record(data), False)
+
+
+def test_content_hash_changes_with_any_field():
+    data = synthetic_citation(1, 10)
+    before = content_hash(parse_record(data))
+    for old, new in (
+        (b"Synthetic record with", b"Revised record with"),
+        (b"<Year>2001</Year>", b"<Year>2002</Year>"),
+        (b"<LastName>Lastname3</LastName>", b"<LastName>Lastname33</LastName>"),
+        (b"keyword 2<", b"keyword two<"),
+    ):
+        assert old in data
+        assert content_hash(parse_record(data.replace(old, new, 1))) != before
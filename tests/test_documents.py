@@ -0,0 +1,29 @@
+import json
+
+from pub_med_parser import MedlineParser
+from pubmedpg.bench import write_synthetic_file
+from pubmedpg.crud.documents import document, documents
+from pubmedpg.models.pubmed import Citation
+from pubmedpg.sinks import DbSink, citation_document
+
+
+def _unordered(citation_document):
+    # the relationships read the rows back sorted their own way, documents keep them in file order
+    return {
+        name: sorted(value, key=json.dumps) if isinstance(value, list) else value
+        for name, value in citation_document.items()
+    }
+
+
+def test_documents_match_the_rows(loader, tmp_path):
+    path = str(tmp_path / "pubmed22n0001.xml.gz")
+    write_synthetic_file(path, 3, size=4)
+    assert MedlineParser(path, sink=DbSink(documents=True)).parse()["ok"]
+    stored = documents(loader, [1, 2, 3, 4])
+    assert sorted(stored) == [1, 2, 3]
+    for pmid, stored_document in stored.items():
+        assert stored_document["pmid"] == pmid
+        assert len(stored_document["author"]) == 4
+        assert _unordered(stored_document) == _unordered(citation_document(loader.get(Citation, pmid)))
+    assert document(loader, 2) == stored[2]
+    assert document(loader, 4) is None
@@ -0,0 +1,66 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from pubmedpg.crud.facets import apply_facet_delta
+
+# just the columns the facet queries read
+TABLES = (
+    "CREATE TABLE journal (pmid int PRIMARY KEY, pub_date_year int)",
+    "CREATE TABLE mesh_heading (pmid int, descriptor_ui text, descriptor_name text)",
+    "CREATE TABLE mesh_heading_ref (pmid int, descriptor_ui text)",
+    "CREATE TABLE qualifier (pmid int, descriptor_name text, qualifier_ui text)",
+    "CREATE TABLE qualifier_ref (pmid int, descriptor_ui text, qualifier_ui text)",
+    "CREATE TABLE mesh_year_count (descriptor_ui text, pub_date_year int, citation_count int NOT NULL,"
+    " PRIMARY KEY (descriptor_ui, pub_date_year))",
+    "CREATE TABLE mesh_qualifier_count (descriptor_ui text, qualifier_ui text, citation_count int NOT NULL,"
+    " PRIMARY KEY (descriptor_ui, qualifier_ui))",
+    "CREATE TABLE mesh_cooccurrence (descriptor_ui_a text, descriptor_ui_b text, citation_count int NOT NULL,"
+    " PRIMARY KEY (descriptor_ui_a, descriptor_ui_b))",
+)
+
+
+@pytest.fixture
+def session(engine):
+    with engine.begin() as conn:
+        for table in TABLES:
+            conn.execute(text(table))
+    with Session(engine) as session:
+        yield session
+
+
+def _add_citations(session, citations):
+    for pmid, (year, descriptors) in citations.items():
+        session.execute(text("INSERT INTO journal VALUES (:pmid, :year)"), {"pmid": pmid, "year": year})
+        for descriptor_ui in descriptors:
+            session.execute(
+                text("INSERT INTO mesh_heading_ref VALUES (:pmid, :ui)"), {"pmid": pmid, "ui": descriptor_ui}
+            )
+
+
+def _counts(session, table):
+    return {tuple(row[:-1]): row[-1] for row in session.execute(text(f"SELECT * FROM {table}"))}
+
+
+def test_delta(session):
+    _add_citations(session, {1: (2020, ["D1", "D2"]), 2: (2020, ["D1", "D2"]), 3: (2021, ["D1", "D3"])})
+    apply_facet_delta(session, [1, 2, 3], threshold=2)
+    assert _counts(session, "mesh_year_count") == {("D1", 2020): 2, ("D2", 2020): 2, ("D1", 2021): 1, ("D3", 2021): 1}
+    # D1-D3 is in a single citation, below the threshold
+    assert _counts(session, "mesh_cooccurrence") == {("D1", "D2"): 2}
+
+    _add_citations(session, {4: (2021, ["D1", "D3"])})
+    apply_facet_delta(session, [4], threshold=2)
+    # a new pair needs the threshold within one delta, it waits for a rebuild
+    assert _counts(session, "mesh_cooccurrence") == {("D1", "D2"): 2}
+    assert _counts(session, "mesh_year_count")[("D1", 2021)] == 2
+
+    apply_facet_delta(session, [2, 3], -1, threshold=2)
+    assert _counts(session, "mesh_year_count") == {("D1", 2020): 1, ("D2", 2020): 1, ("D1", 2021): 1, ("D3", 2021): 1}
+    assert _counts(session, "mesh_cooccurrence") == {}
+
+    apply_facet_delta(session, [1, 4], -1, threshold=2)
+    assert _counts(session, "mesh_year_count") == {}
+    # removing what was never counted adds nothing
+    apply_facet_delta(session, [3], -1, threshold=2)
+    assert _counts(session, "mesh_year_count") == {}
@@ -0,0 +1,70 @@
+import xml.etree.ElementTree as etree
+
+import pytest
+
+from pubmedpg.filters import RecordFilter, parse_years
+
+
+def _citation(year="2020", languages=("eng",), descriptors=("D000445",), nlm_id="0372516", ta="Biochem Med"):
+    return etree.fromstring(
+        "<MedlineCitation><PMID Version='1'>1</PMID><Article><Journal><ISSN IssnType='Print'>0006-2944</ISSN>"
+        f"<JournalIssue><PubDate>{year}</PubDate></JournalIssue></Journal>"
+        + "".join(f"<Language>{language}</Language>" for language in languages)
+        + f"</Article><MedlineJournalInfo><MedlineTA>{ta}</MedlineTA><NlmUniqueID>{nlm_id}</NlmUniqueID>"
+        "</MedlineJournalInfo><MeshHeadingList>"
+        + "".join(f"<MeshHeading><DescriptorName UI='{ui}'>x</DescriptorName></MeshHeading>" for ui in descriptors)
+        + "</MeshHeadingList></MedlineCitation>"
+    )
+
+
+def test_parse_years():
+    assert parse_years("2020") == (2020, 2020)
+    assert parse_years("2015-") == (2015, None)
+    assert parse_years("-2015") == (None, 2015)
+    assert parse_years(" 2010 - 2019 ") == (2010, 2019)
+    assert parse_years(2020) == (2020, 2020)
+    assert parse_years("") is None
+    assert parse_years(None) is None
+    with pytest.raises(ValueError):
+        parse_years("2019-2010")
+    with pytest.raises(ValueError):
+        parse_years("recent")
+
+
+def test_years():
+    record_filter = RecordFilter(years="2010-2019")
+    assert record_filter(_citation("<Year>2015</Year>"))
+    assert record_filter(_citation("<MedlineDate>2019 Dec-2020 Jan</MedlineDate>"))
+    assert not record_filter(_citation("<Year>2020</Year>"))
+    assert not record_filter(_citation("<Season>Spring</Season>"))
+
+
+def test_languages_in_any_case():
+    record_filter = RecordFilter(languages="ENG, Fre")
+    assert record_filter(_citation(languages=["eng"]))
+    assert record_filter(_citation(languages=["ger", "FRE"]))
+    assert not record_filter(_citation(languages=["ger"]))
+    assert not record_filter(_citation(languages=[]))
+
+
+def test_journals():
+    for journal in ("0372516", "0006-2944", "biochem med"):
+        assert RecordFilter(journals=journal)(_citation())
+    assert not RecordFilter(journals="1234567")(_citation())
+
+
+def test_every_predicate_must_match():
+    record_filter = RecordFilter(mesh="D005561,D000445", years="2020", languages="eng")
+    assert record_filter(_citation("<Year>2020</Year>"))
+    assert not record_filter(_citation("<Year>2020</Year>", descriptors=["D000001"]))
+    assert not record_filter(_citation("<Year>2021</Year>"))
+
+
+def test_empty_filter():
+    assert not RecordFilter()
+    assert not RecordFilter(mesh=" , ", languages=[])
+    assert RecordFilter(languages="eng")
+    assert (
+        repr(RecordFilter(languages="fre,eng", years="2015-"))
+        == "RecordFilter(years=(2015, None), languages=['eng', 'fre'])"
+    )
@@ -0,0 +1,55 @@
+import pytest
+
+from pubmedpg.crud.graph import edges, neighbourhood, rebuild_citation_edges, refresh_citation_edges
+from pubmedpg.models.pubmed import Citation, Comment
+
+# pmid -> [(ref_type, referenced pmid)], a comment without a pmid gives no edge
+COMMENTS = {
+    1: [("ErratumIn", 4)],
+    2: [("CommentOn", 1), ("CommentOn", None)],
+    3: [("RetractionOf", 1)],
+    4: [],
+    5: [("CommentOn", 2)],
+}
+
+
+@pytest.fixture
+def graph(session):
+    for pmid, comments in COMMENTS.items():
+        session.add(Citation(pmid=pmid, article_title=f"Citation {pmid}"))
+        for ref_type, ref_pmid in comments:
+            session.add(Comment(pmid=pmid, ref_type=ref_type, ref_source="Source", pmid_version=ref_pmid))
+    session.commit()
+    rebuild_citation_edges(session)
+    return session
+
+
+def test_edges(graph):
+    assert edges(graph, [1]) == [(1, "ErratumIn", 4), (2, "CommentOn", 1), (3, "RetractionOf", 1)]
+    assert edges(graph, [1], "out") == [(1, "ErratumIn", 4)]
+    assert edges(graph, [1], "in") == [(2, "CommentOn", 1), (3, "RetractionOf", 1)]
+    assert edges(graph, [1], "in", ref_types=["RetractionOf"]) == [(3, "RetractionOf", 1)]
+    assert edges(graph, [4], "out") == []
+    with pytest.raises(ValueError):
+        edges(graph, [1], "sideways")
+
+
+def test_neighbourhood(graph):
+    assert neighbourhood(graph, 2) == ({2: 0, 1: 1, 5: 1}, [(2, "CommentOn", 1), (5, "CommentOn", 2)])
+    distances, found = neighbourhood(graph, 2, hops=2)
+    assert distances == {2: 0, 1: 1, 5: 1, 3: 2, 4: 2}
+    assert len(found) == 4
+    assert neighbourhood(graph, 2, hops=2, direction="out") == (
+        {2: 0, 1: 1, 4: 2},
+        [(1, "ErratumIn", 4), (2, "CommentOn", 1)],
+    )
+    assert len(neighbourhood(graph, 2, hops=2, max_nodes=3)[0]) == 3
+
+
+def test_refresh(graph):
+    graph.query(Comment).filter(Comment.pmid == 2).delete()
+    graph.add(Comment(pmid=2, ref_type="CommentOn", ref_source="Source", pmid_version=3))
+    graph.flush()
+    refresh_citation_edges(graph, [2])
+    assert edges(graph, [2], "out") == [(2, "CommentOn", 3)]
+    assert edges(graph, [1], "in") == [(3, "RetractionOf", 1)]
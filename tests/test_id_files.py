@@ -0,0 +1,57 @@
+import gzip
+import os
+
+from pubmedpg import get_all_ids, id_file_is_valid, read_id_file
+
+
+def _archive(path, pmid):
+    xml = (
+        "<PubmedArticleSet><PubmedArticle><MedlineCitation><PMID"
+        f' Version="1">{pmid}</PMID></MedlineCitation></PubmedArticle></PubmedArticleSet>'
+    )
+    path.write_bytes(gzip.compress(xml.encode(), mtime=0))
+
+
+def test_id_file(tmp_path):
+    path = tmp_path / "pubmed22n0001.xml.gz"
+    _archive(path, 1234)
+    assert not id_file_is_valid(str(path))
+    get_all_ids(str(path))
+    assert id_file_is_valid(str(path))
+    assert read_id_file(f"{path}.txt") == [(1234, "1")]
+
+
+def test_truncated_id_file_is_redone(tmp_path):
+    path = tmp_path / "pubmed22n0001.xml.gz"
+    _archive(path, 1234)
+    get_all_ids(str(path))
+    ids_path = tmp_path / "pubmed22n0001.xml.gz.txt"
+    ids_path.write_text(ids_path.read_text().splitlines()[0] + "\n")
+    assert not id_file_is_valid(str(path))
+
+
+def test_reissued_file_of_the_same_size_is_redone(tmp_path):
+    path = tmp_path / "pubmed22n0001.xml.gz"
+    _archive(path, 1234)
+    get_all_ids(str(path))
+    size = os.path.getsize(path)
+    mtime = os.stat(path).st_mtime_ns
+    _archive(path, 4321)
+    os.utime(path, ns=(mtime + 10**9, mtime + 10**9))
+    assert os.path.getsize(path) == size
+    assert not id_file_is_valid(str(path))
+    get_all_ids(str(path))
+    assert read_id_file(f"{path}.txt") == [(4321, "1")]
+
+
+def test_nlm_md5_file_is_checked(tmp_path):
+    path = tmp_path / "pubmed22n0001.xml.gz"
+    _archive(path, 1234)
+    md5_path = tmp_path / "pubmed22n0001.xml.gz.md5"
+    md5_path.write_text("MD5(pubmed22n0001.xml.gz)= 0123456789abcdef0123456789abcdef\n")
+    get_all_ids(str(path))
+    # touched, but NLM says it is the same file
+    os.utime(path, (0, 0))
+    assert id_file_is_valid(str(path))
+    md5_path.write_text("MD5(pubmed22n0001.xml.gz)= fedcba9876543210fedcba9876543210\n")
+    assert not id_file_is_valid(str(path))
@@ -0,0 +1,48 @@
+import pytest
+
+from pubmedpg.crud.identifiers import _copy_rows, bulk_resolve, identifiers, resolve
+from pubmedpg.models.pubmed import ArticleIdentifier, Citation, OtherId
+
+# what COPY's text format would read otherwise as a column separator, a new row or an escape
+DOIS = {1: "10.1000/tab\there", 2: "10.1000/new\nline", 3: "10.1000/back\\slash", 4: "10.1000/plain"}
+
+
+@pytest.fixture
+def identifier_session(session):
+    for pmid, doi in DOIS.items():
+        session.add(Citation(pmid=pmid, article_title=f"Citation {pmid}"))
+        session.add(ArticleIdentifier(pmid=pmid, id_type="doi", id_value=doi))
+    session.add(ArticleIdentifier(pmid=4, id_type="pmc", id_value="PMC4"))
+    session.add(OtherId(pmid=3, other_id="NLM\\3", other_id_source="NLM"))
+    session.commit()
+    return session
+
+
+def test_copy_rows():
+    assert _copy_rows(["a", None, "b"]) == "a\nb\n"
+    assert _copy_rows(["a\tb", "c\\d", "e\nf", "g\rh"]) == "a\\tb\nc\\\\d\ne\\nf\ng\\rh\n"
+    assert _copy_rows([None]) == ""
+
+
+def test_bulk_resolve(identifier_session):
+    engine = identifier_session.get_bind()
+    values = ["10.1000/TAB\tHERE", "10.1000/new\nline", " 10.1000/back\\slash ", "10.1000/plain", "10.1000/missing"]
+    # a batch size that splits the values over several COPYs
+    assert sorted(bulk_resolve(engine, values + [None, "10.1000/plain"], batch_size=2), key=lambda row: row[1]) == [
+        ("10.1000/TAB\tHERE", 1),
+        ("10.1000/new\nline", 2),
+        (" 10.1000/back\\slash ", 3),
+        ("10.1000/plain", 4),
+        ("10.1000/plain", 4),
+    ]
+    assert list(bulk_resolve(engine, ["NLM\\3", "NLM3"], "other_id")) == [("NLM\\3", 3)]
+    assert list(bulk_resolve(engine, [])) == []
+    with pytest.raises(ValueError):
+        bulk_resolve(engine, [], "isbn")
+
+
+def test_resolve(identifier_session):
+    assert resolve(identifier_session, "10.1000/Back\\Slash") == [3]
+    assert resolve(identifier_session, "10.1000/missing") == []
+    assert resolve(identifier_session, " PMC4 ", "pmc") == [4]
+    assert identifiers(identifier_session, 4) == [("doi", "10.1000/plain"), ("pmc", "PMC4")]
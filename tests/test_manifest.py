@@ -0,0 +1,56 @@
+import os
+
+from pubmedpg.manifest import STATUS_DONE, STATUS_FAILED, ManifestEntry, check_file, file_md5, file_signature
+
+
+def _archive(tmp_path, content=b"<PubmedArticleSet/>"):
+    path = tmp_path / "pubmed22n0001.xml.gz"
+    path.write_bytes(content)
+    return str(path)
+
+
+def _entry(path, status=STATUS_DONE, md5=True):
+    signature = file_signature(path)
+    return ManifestEntry(1, signature["size"], signature["mtime"], signature["md5"] if md5 else None, status)
+
+
+def test_unchanged_file_is_not_hashed(tmp_path, monkeypatch):
+    path = _archive(tmp_path)
+    entry = _entry(path)
+    monkeypatch.setattr("pubmedpg.manifest.file_md5", lambda path: 1 / 0)
+    current, signature = check_file(entry, path)
+    assert current
+    assert signature["md5"] is None
+
+
+def test_touched_file_is_hashed(tmp_path):
+    path = _archive(tmp_path)
+    entry = _entry(path)
+    os.utime(path, (0, 0))
+    assert check_file(entry, path) == (True, {**file_signature(path), "md5": file_md5(path)})
+
+
+def test_reissued_file_is_not_current(tmp_path):
+    path = _archive(tmp_path)
+    entry = _entry(path)
+    _archive(tmp_path, b"<PubmedArticleSet></PubmedArticleSet>")
+    assert not check_file(entry, path)[0]
+    os.utime(path, (0, 0))
+    entry = entry._replace(size=os.path.getsize(path))
+    assert not check_file(entry, path)[0]
+
+
+def test_entry_from_before_the_manifest_is_current(tmp_path):
+    path = _archive(tmp_path)
+    assert check_file(ManifestEntry(1, None, None, None, STATUS_DONE), path)[0]
+    assert not check_file(ManifestEntry(1, None, None, None, STATUS_FAILED), path)[0]
+    assert not check_file(None, path)[0]
+
+
+def test_file_loaded_with_another_filter_is_not_current(tmp_path):
+    path = _archive(tmp_path)
+    entry = _entry(path)._replace(record_filter="RecordFilter(languages=['eng'])")
+    assert check_file(entry, path, "RecordFilter(languages=['eng'])")[0]
+    assert not check_file(entry, path, "RecordFilter(languages=['fre'])")[0]
+    assert not check_file(entry, path)[0]
+    assert not check_file(entry._replace(record_filter=None), path, "RecordFilter(languages=['eng'])")[0]
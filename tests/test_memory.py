@@ -0,0 +1,39 @@
+import pytest
+
+from pubmedpg import memory
+
+
+@pytest.fixture
+def launcher_rss(monkeypatch):
+    # the launching process holds 200 MB
+    monkeypatch.setattr(memory, "rss_mb", lambda: 200.0)
+
+
+def test_worker_limit(launcher_rss):
+    assert memory.worker_limit(1000, 4) == 200
+    assert memory.worker_limit(150, 2) == 0
+    assert memory.worker_limit(None, 4) is None
+    assert memory.worker_limit(0, 4) is None
+
+
+def test_recommend_workers(launcher_rss):
+    results = [{"peak_rss": 150}, {"peak_rss": 390}, {"ok": False}]
+    assert memory.recommend_workers(results, 2000) == 4
+    assert memory.recommend_workers(results, 1000) == 2
+    # never fewer than one
+    assert memory.recommend_workers(results, 300) == 1
+    assert memory.recommend_workers(results, None) is None
+    assert memory.recommend_workers([{"ok": False}], 2000) is None
+
+
+def test_memory_budget(tmp_path, monkeypatch):
+    limit = tmp_path / "memory.max"
+    monkeypatch.setattr(memory, "CGROUP_LIMITS", (str(tmp_path / "missing"), str(limit)))
+    assert memory.memory_budget() is None
+    limit.write_text("max\n")
+    assert memory.memory_budget() is None
+    limit.write_text(f"{memory.UNLIMITED}\n")
+    assert memory.memory_budget() is None
+    limit.write_text(f"{2 * 2**30}\n")
+    assert memory.memory_budget() == 2048
+    assert memory.memory_budget("512") == 512
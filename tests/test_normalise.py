@@ -0,0 +1,114 @@
+import datetime
+from types import SimpleNamespace
+
+from pubmedpg.crud.author import author_key_filter
+from pubmedpg.normalise import (
+    FieldNormaliser,
+    author_key,
+    fold_name,
+    identifier_value,
+    normalise_dates,
+    normalise_months,
+    normalise_pub_years,
+    page_range,
+)
+
+
+def test_dates():
+    assert normalise_dates(
+        [
+            ("2021", "03", "07"),
+            ("2021", "3", "7"),
+            ("2021", "Mar", "07"),
+            ("2021", "MAR", "7"),
+            ("2020", "02", "29"),
+        ]
+    ) == [datetime.date(2021, 3, 7)] * 4 + [datetime.date(2020, 2, 29)]
+
+
+def test_odd_dates_are_none():
+    assert (
+        normalise_dates(
+            [
+                ("2021", "02", "29"),
+                ("2021", "13", "01"),
+                ("2021", "04", "31"),
+                ("21", "01", "01"),
+                ("2021", None, "01"),
+                (None, None, None),
+                ("2021", "Spring", "01"),
+            ]
+        )
+        == [None] * 7
+    )
+
+
+def test_pub_years():
+    assert normalise_pub_years(
+        [
+            ("2021", None),
+            (" 2021 ", None),
+            (None, "1998 Dec-1999 Jan"),
+            (None, "Winter 2001"),
+            (None, "Spring"),
+            ("20xx", "1999"),
+            (None, None),
+        ]
+    ) == [2021, 2021, 1998, 2001, None, None, None]
+
+
+def test_months():
+    assert normalise_months(["Jan", "Dec", "12", "Spring", None]) == ["01", "12", "12", "Spring", None]
+
+
+def test_later_additions_win():
+    normaliser = FieldNormaliser()
+    obj = SimpleNamespace(citation=None)
+    normaliser.add_date(obj, "date_completed", "2020", "01", "02")
+    normaliser.add_date(obj, "date_completed", "2021", "Feb", "03")
+    normaliser.add_pub_year(obj, None, "2019 Jan-Feb")
+    normaliser.add_month(obj, "Jan")
+    normaliser.resolve()
+    assert obj.date_completed == datetime.date(2021, 2, 3)
+    assert obj.pub_date_year == 2019
+    assert obj.pub_date_month == "01"
+    assert normaliser.dates == ([], [])
+
+
+def test_author_key():
+    assert author_key("Müller", "Jörg", "J") == "muller j"
+    assert author_key("Müller-Lüdenscheidt", "Jörg") == "muller ludenscheidt j"
+    assert author_key("O'Brien", None, "ÉA") == "o brien e"
+    assert author_key("Smith") == "smith"
+    assert author_key("  ", "John") is None
+    assert fold_name("Müller-Lüdenscheidt, Jr.") == "muller ludenscheidt jr"
+
+
+def _where(name):
+    return str(author_key_filter(name).compile(compile_kwargs={"literal_binds": True}))
+
+
+def test_author_key_filter():
+    assert _where("Smith J") == _where("Smith JA") == _where("Smith, John") == "author.name_key = 'smith j'"
+    assert _where("Smith") == "author.name_key = 'smith' OR author.name_key LIKE 'smith _'"
+    assert _where("de la Cruz") == "author.name_key = 'de la cruz' OR author.name_key LIKE 'de la cruz _'"
+
+
+def test_page_range():
+    assert page_range("123-9, 140") == ("123", "129")
+    assert page_range("1234-56") == ("1234", "1256")
+    assert page_range("12-345") == ("12", "345")
+    assert page_range("e1234") == ("e1234", None)
+    assert page_range("S12-S19; discussion S20") == ("S12", "S19")
+    assert page_range(" 5 - 7 ") == ("5", "7")
+    assert page_range("123456789012-3") == ("1234567890", "1234567890")
+    assert page_range("") == (None, None)
+    assert page_range(None) == (None, None)
+
+
+def test_identifier_value():
+    assert identifier_value("doi", " 10.1000/ABC ") == "10.1000/abc"
+    assert identifier_value("pmc", " PMC12345 ") == "PMC12345"
+    assert identifier_value("pii", "S0140-6736(20)30183-5") == "S0140-6736(20)30183-5"
+    assert identifier_value("doi", "   ") is None
+    assert identifier_value("doi", None) is None
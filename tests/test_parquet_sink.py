@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+from pub_med_parser import MedlineParser
+from pubmedpg.bench import write_synthetic_file
+from pubmedpg.filters import RecordFilter
+from pubmedpg.interning import DICTIONARY_COLUMNS
+from pubmedpg.sinks import ParquetSink
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+RECORDS = 20
+# every synthetic record has this many authors, investigators, keywords, publication types and accessions
+SIZE = 5
+
+
+def _export(tmp_path, record_filter=None):
+    path = str(tmp_path / "pubmed22n0001.xml.gz")
+    if not os.path.exists(path):
+        write_synthetic_file(path, RECORDS, size=SIZE)
+    # a batch size that does not divide the row counts, so several row groups and a partial last one
+    sink = ParquetSink(
+        str(tmp_path / "parquet"), batch_size=7, record_filter=repr(record_filter) if record_filter else None
+    )
+    return MedlineParser(path, sink=sink, record_filter=record_filter).parse()
+
+
+def _tables(tmp_path):
+    files = (tmp_path / "parquet").glob("*/pubmed22n0001.xml.gz.parquet")
+    return {path.parent.name: pq.read_table(path) for path in files}
+
+
+def test_export(tmp_path):
+    stats = _export(tmp_path)
+    assert stats["ok"] and stats["citations"] == RECORDS
+    tables = _tables(tmp_path)
+    assert {table: tables[table].num_rows for table in tables} == {
+        "citation": RECORDS,
+        "pmid_file_mapping": RECORDS,
+        "article_identifier": RECORDS,
+        "citation_subset": RECORDS,
+        "journal": RECORDS,
+        "language": RECORDS,
+        "author": RECORDS * SIZE,
+        "investigator": RECORDS * SIZE,
+        "keyword": RECORDS * SIZE,
+        "publication_type": RECORDS * SIZE,
+        "accession": RECORDS * SIZE,
+        "data_bank": RECORDS * 4,
+    }
+    assert sorted(tables["pmid_file_mapping"].column("pmid").to_pylist()) == list(range(1, RECORDS + 1))
+    for table, columns in DICTIONARY_COLUMNS.items():
+        if table in tables:
+            for field in tables[table].schema:
+                assert (field.name in columns) == str(field.type).startswith("dictionary"), (table, field.name)
+    assert tables["language"].column("language").to_pylist() == ["eng"] * RECORDS
+
+
+def test_done_marker(tmp_path):
+    _export(tmp_path)
+    marker = tmp_path / "parquet" / "pmid_file_mapping" / "pubmed22n0001.xml.gz.parquet"
+    assert marker.exists()
+    assert not list((tmp_path / "parquet").glob("*/*.tmp"))
+    written = marker.stat().st_mtime_ns
+    assert _export(tmp_path)["skipped"]
+    assert marker.stat().st_mtime_ns == written
+    # without its marker the file is exported again
+    marker.unlink()
+    assert _export(tmp_path)["citations"] == RECORDS
+
+
+def test_another_filter_exports_again(tmp_path):
+    # the synthetic records are all in English
+    french = RecordFilter(languages="fre")
+    stats = _export(tmp_path, french)
+    assert not stats.get("skipped") and stats["citations"] == 0
+    assert sorted(_tables(tmp_path)) == ["pmid_file_mapping"]
+    assert _export(tmp_path, french)["skipped"]
+
+    stats = _export(tmp_path)
+    assert not stats.get("skipped") and stats["citations"] == RECORDS
+    assert _tables(tmp_path)["citation"].num_rows == RECORDS
+    assert _export(tmp_path)["skipped"]
+
+    # and back, without the rows of the unfiltered export
+    assert _export(tmp_path, french)["citations"] == 0
+    assert sorted(_tables(tmp_path)) == ["pmid_file_mapping"]
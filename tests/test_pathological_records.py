@@ -0,0 +1,44 @@
+from pubmedpg.bench import parse_record, synthetic_citation, time_records
+from pubmedpg.dimensions import DimensionCache
+
+MESH_HEADINGS = (
+    "<MeshHeadingList>"
+    "<MeshHeading><DescriptorName UI='D000001' MajorTopicYN='N'>Calcimycin</DescriptorName>"
+    "<QualifierName UI='Q000002' MajorTopicYN='Y'>analogs &amp; derivatives</QualifierName>"
+    "<QualifierName MajorTopicYN='N'>chemistry</QualifierName></MeshHeading>"
+    "<MeshHeading><DescriptorName MajorTopicYN='N'>Old heading</DescriptorName>"
+    "<QualifierName UI='Q000037' MajorTopicYN='N'>antagonists &amp; inhibitors</QualifierName></MeshHeading>"
+    "</MeshHeadingList>"
+)
+
+
+def test_deduplication():
+    db_citation = parse_record(synthetic_citation(1, 100))
+    assert len(db_citation.authors) == 100
+    assert len(db_citation.investigators) == 100
+    assert len(db_citation.keywords) == 90
+    assert len(db_citation.publication_types) == 90
+    assert len(db_citation.databanks) == 4
+    assert [subset.citation_subset for subset in db_citation.citation_subsets] == ["IM"]
+    assert len({(a.data_bank_name, a.accession_number) for a in db_citation.accessions}) == len(db_citation.accessions)
+
+
+def test_time_per_record_is_linear():
+    timings = time_records([1000, 10000], repeat=2)
+    # 10x the size, linear is ~10x the time, a quadratic dedup would be closer to 100x
+    assert timings[10000] / timings[1000] < 25
+
+
+def test_mesh_headings_without_ui_are_left_out():
+    data = synthetic_citation(1, 3).replace(b"</MedlineCitation>", MESH_HEADINGS.encode() + b"</MedlineCitation>")
+    db_citation = parse_record(data)
+    assert len(db_citation.meshheadings) == 2
+    assert len(db_citation.qualifiers) == 3
+    dimensions = DimensionCache()
+    dimensions.normalise(db_citation)
+    assert [(ref.descriptor_ui, ref.descriptor_name_major_yn) for ref in db_citation.mesh_heading_refs] == [
+        ("D000001", "N")
+    ]
+    assert [(ref.descriptor_ui, ref.qualifier_ui) for ref in db_citation.qualifier_refs] == [("D000001", "Q000002")]
+    assert dimensions.pending["descriptors"] == {"D000001": {"descriptor_name": "Calcimycin"}}
+    assert dimensions.pending["qualifiers"] == {"Q000002": {"qualifier_name": "analogs & derivatives"}}
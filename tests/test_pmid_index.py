@@ -0,0 +1,81 @@
+from pubmedpg import TRAILER_PREFIX
+from pubmedpg.pmid_index import MAX_VERSION, PmidIndex
+
+
+def _id_file(tmp_path, name, ids, trailer="count"):
+    # only the id file is read, the xml file itself need not exist
+    xml_path = str(tmp_path / name)
+    with open(f"{xml_path}.txt", "w") as f:
+        for pmid, version in ids:
+            f.write(f"{pmid}:{version}\n")
+        f.write(f"{TRAILER_PREFIX}{trailer}={len(ids)}\n")
+    return xml_path
+
+
+def _winners(index):
+    return {pmid: (index.get(pmid), index.version(pmid)) for pmid in index.pmids}
+
+
+def test_build(tmp_path):
+    paths = [
+        _id_file(tmp_path, "pubmed22n0001.xml.gz", [(10, 1), (20, 1), (30, 2)]),
+        _id_file(tmp_path, "pubmed22n0002.xml.gz", [(20, 1), (30, 1), (40, 1)]),
+    ]
+    index = PmidIndex.build(str(tmp_path / "index.bin"), paths)
+    assert len(index) == 4
+    # a later file wins a version tie, a higher version wins over a later file
+    assert _winners(index) == {
+        10: ("pubmed22n0001.xml.gz", 1),
+        20: ("pubmed22n0002.xml.gz", 1),
+        30: ("pubmed22n0001.xml.gz", 2),
+        40: ("pubmed22n0002.xml.gz", 1),
+    }
+    assert index.get(50) is None
+    index.close()
+
+
+def test_wins(tmp_path):
+    paths = [
+        _id_file(tmp_path, "a.xml.gz", [(10, 1), (20, 3)]),
+        _id_file(tmp_path, "b.xml.gz", [(10, 1), (20, 2), (30, MAX_VERSION + 5)]),
+    ]
+    index = PmidIndex.build(str(tmp_path / "index.bin"), paths)
+    assert index.wins(10, "b.xml.gz")
+    assert not index.wins(10, "a.xml.gz")
+    assert index.wins(20, "a.xml.gz", 3)
+    assert not index.wins(20, "b.xml.gz", 2)
+    assert not index.wins(20, "a.xml.gz", 2)
+    # versions are capped to fit a byte
+    assert index.wins(30, "b.xml.gz", MAX_VERSION + 5)
+    assert not index.wins(40, "b.xml.gz")
+    index.close()
+
+
+def test_update_merges_new_files(tmp_path):
+    path = str(tmp_path / "index.bin")
+    paths = [
+        _id_file(tmp_path, "pubmed22n0001.xml.gz", [(10, 1), (20, 1), (40, 2)]),
+        _id_file(tmp_path, "pubmed22n0002.xml.gz", [(30, 1)]),
+    ]
+    PmidIndex.build(path, paths).close()
+    paths.append(_id_file(tmp_path, "pubmed22n0003.xml.gz", [(5, 1), (20, 1), (25, 1), (40, 1), (50, 1)]))
+    merged = PmidIndex.update(path, paths)
+    rebuilt = PmidIndex.build(str(tmp_path / "rebuilt.bin"), paths)
+    assert list(merged.pmids) == [5, 10, 20, 25, 30, 40, 50]
+    assert _winners(merged) == _winners(rebuilt)
+    assert merged.get(20) == "pubmed22n0003.xml.gz"
+    # the version 2 copy from the first file still wins
+    assert merged.get(40) == "pubmed22n0001.xml.gz"
+    merged.close()
+    rebuilt.close()
+
+
+def test_update_rebuilds_on_a_changed_file(tmp_path):
+    path = str(tmp_path / "index.bin")
+    paths = [_id_file(tmp_path, "a.xml.gz", [(10, 1)]), _id_file(tmp_path, "b.xml.gz", [(10, 1)])]
+    PmidIndex.build(path, paths).close()
+    # re-issued under the same name, without pmid 10
+    _id_file(tmp_path, "b.xml.gz", [(20, 1)], trailer="reissued")
+    index = PmidIndex.update(path, paths)
+    assert _winners(index) == {10: ("a.xml.gz", 1), 20: ("b.xml.gz", 1)}
+    index.close()
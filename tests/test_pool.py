@@ -0,0 +1,27 @@
+from pub_med_parser import run_state
+from pubmedpg import pool
+from pubmedpg.pmid_index import PmidIndex
+
+
+def test_run_state_lets_go_of_the_previous_run(tmp_path):
+    index_path = str(tmp_path / "index.bin")
+    PmidIndex.build(index_path, []).close()
+    blocks = [pool.share({"run": run}) for run in range(2)]
+    try:
+        for run, block in enumerate(blocks):
+            _latest, sink_options = run_state((index_path, block.name))
+            assert sink_options == {"run": run}
+        # a watching launcher's workers only keep the state of the current run
+        assert blocks[0].name not in pool._shared
+        assert blocks[1].name in pool._shared
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def test_worker_pool_starts_every_worker(capsys):
+    with pool.worker_pool(3) as workers:
+        assert len(set(workers.map(pool.worker_info, range(3), chunksize=1))) == 3
+    # one RSS per worker, a worker that answered twice would leave another out
+    assert len(capsys.readouterr().out.split(" RSS ")[1].split(",")) == 3
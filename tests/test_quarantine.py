@@ -0,0 +1,37 @@
+from sqlalchemy import text
+
+from pub_med_parser import MedlineParser, retry_quarantined
+from pubmedpg.bench import write_synthetic_file
+from pubmedpg.sinks import DbSink
+
+XML_NAME = "pubmed22n0001.xml.gz"
+
+
+def _pmids(session):
+    return [pmid for (pmid,) in session.execute(text("SELECT pmid FROM pmid_file_mapping ORDER BY pmid"))]
+
+
+def _quarantined(session):
+    return [tuple(row) for row in session.execute(text("SELECT pmid, xml_file_name, raw_xml FROM quarantined_record"))]
+
+
+def test_bad_record_is_quarantined_and_retried(loader, tmp_path):
+    path = str(tmp_path / XML_NAME)
+    write_synthetic_file(path, 5)
+    # citation 3 fails when flushed, as the whole batch does at first
+    loader.execute(text("ALTER TABLE citation ADD CONSTRAINT bad_record CHECK (pmid <> 3)"))
+    loader.commit()
+    stats = MedlineParser(path, sink=DbSink()).parse()
+    assert stats["ok"]
+    assert stats["quarantined"] == 1
+    assert _pmids(loader) == [1, 2, 4, 5]
+    # read back from the file on retry
+    assert _quarantined(loader) == [(3, XML_NAME, None)]
+    assert loader.execute(text("SELECT status FROM xml_file")).scalar() == "done"
+
+    loader.execute(text("ALTER TABLE citation DROP CONSTRAINT bad_record"))
+    loader.commit()
+    results = retry_quarantined(str(tmp_path))
+    assert [(result["ok"], result["citations"], result["quarantined"]) for result in results] == [(True, 1, 0)]
+    assert _pmids(loader) == [1, 2, 3, 4, 5]
+    assert _quarantined(loader) == []
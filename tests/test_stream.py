@@ -0,0 +1,47 @@
+import pytest
+
+from pubmedpg.crud.stream import COLUMNS, iter_citations, pmid_ranges
+from pubmedpg.models.pubmed import Abstract, Citation, MeshDescriptor, MeshHeading, MeshHeadingRef
+
+PMIDS = [7, 3, 1, 5, 2, 6, 4]
+
+
+@pytest.fixture
+def engine_with_citations(session):
+    # added out of order, the stream is in pmid order whatever the physical order
+    for pmid in PMIDS:
+        session.add(Citation(pmid=pmid, article_title=f"Citation {pmid}"))
+    session.add(Abstract(pmid=2, abstract_text="Abstract 2"))
+    # MeSH from the plain schema for 2 and from the normalised one for 5
+    session.add(MeshHeading(pmid=2, descriptor_ui="D2", descriptor_name="Beta"))
+    session.add(MeshHeading(pmid=2, descriptor_ui="D1", descriptor_name="Alpha"))
+    session.add(MeshDescriptor(descriptor_ui="D3", descriptor_name="Gamma"))
+    session.add(MeshHeadingRef(pmid=5, descriptor_ui="D3"))
+    session.commit()
+    return session.get_bind()
+
+
+def test_iter_citations(engine_with_citations):
+    batches = list(iter_citations(engine_with_citations, batch_size=3, window=4))
+    # batches never span two windows, 1-4 and 5-7
+    assert [len(batch) for batch in batches] == [3, 1, 3]
+    rows = [row for batch in batches for row in batch]
+    assert [row[0] for row in rows] == sorted(PMIDS)
+    assert rows[1] == (2, "Citation 2", "Abstract 2", ["D1", "D2"], ["Alpha", "Beta"])
+    assert rows[4] == (5, "Citation 5", None, ["D3"], ["Gamma"])
+    assert rows[0] == (1, "Citation 1", None, None, None)
+    assert [row[0] for batch in iter_citations(engine_with_citations, 3, 5) for row in batch] == [3, 4, 5]
+
+
+def test_arrow_batches(engine_with_citations):
+    pytest.importorskip("pyarrow")
+    batches = list(iter_citations(engine_with_citations, batch_size=5, arrow=True))
+    assert [batch.num_rows for batch in batches] == [5, 2]
+    assert batches[0].schema.names == list(COLUMNS)
+    assert batches[0].column(0).to_pylist() == [1, 2, 3, 4, 5]
+    assert batches[0].column(4).to_pylist()[1] == ["Alpha", "Beta"]
+
+
+def test_pmid_ranges(engine_with_citations):
+    assert pmid_ranges(engine_with_citations, 3) == [(1, 3), (4, 6), (7, 7)]
+    assert pmid_ranges(engine_with_citations, 1) == [(1, 7)]
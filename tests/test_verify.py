@@ -0,0 +1,25 @@
+from sqlalchemy import text
+
+from pub_med_parser import MedlineParser
+from pubmedpg.bench import write_synthetic_file
+from pubmedpg.sinks import DbSink
+from pubmedpg.verify import verify
+
+XML_NAME = "pubmed22n0001.xml.gz"
+
+
+def test_verify(loader, tmp_path):
+    path = str(tmp_path / XML_NAME)
+    write_synthetic_file(path, 5)
+    assert MedlineParser(path, sink=DbSink()).parse()["ok"]
+    engine = loader.get_bind()
+    assert verify(engine, str(tmp_path), 1, tables=True) == []
+
+    loader.execute(text("DELETE FROM citation WHERE pmid = 3"))
+    loader.execute(text("DELETE FROM author WHERE pmid = 4 AND last_name = 'Lastname0'"))
+    loader.commit()
+    assert verify(engine, str(tmp_path), 1) == [{"xml_name": XML_NAME, "problem": "pmids", "missing": [3], "extra": []}]
+    problems = verify(engine, str(tmp_path), 1, tables=True)
+    assert problems[0] == {"xml_name": XML_NAME, "problem": "pmids", "missing": [3], "extra": []}
+    # pmid 3 took its rows with it, less the one author of pmid 4
+    assert {"xml_name": XML_NAME, "problem": "rows", "table": "author", "expected": 15, "found": 11} in problems
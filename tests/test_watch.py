@@ -0,0 +1,34 @@
+import gzip
+
+import pytest
+
+from pubmedpg.watch import Watcher, sequence_key
+
+
+def test_sequence_key():
+    names = ["pubmed24n0001.xml.gz", "other.xml", "pubmed23n1200.xml.gz", "pubmed23n0999.xml", "pubmed24n1201.xml.gz"]
+    assert sorted(names, key=sequence_key) == [
+        "pubmed23n0999.xml",
+        "pubmed23n1200.xml.gz",
+        "pubmed24n0001.xml.gz",
+        "pubmed24n1201.xml.gz",
+        "other.xml",
+    ]
+
+
+def test_new_directory(tmp_path):
+    pytest.importorskip("inotify_simple")
+    (tmp_path / "pubmed22n0001.xml.gz").write_bytes(gzip.compress(b"<PubmedArticleSet/>"))
+    watcher = Watcher(str(tmp_path), interval=1)
+    try:
+        directory = tmp_path / "updatefiles"
+        directory.mkdir()
+        (directory / "pubmed22n0002.xml.gz").write_bytes(gzip.compress(b"<PubmedArticleSet/>"))
+        (directory / "README").write_text("not a citation file")
+        arrived = []
+        for _poll in range(3):
+            arrived.extend(watcher.poll())
+        # once, whether from walking the new directory or from its own event
+        assert arrived == [str(directory / "pubmed22n0002.xml.gz")]
+    finally:
+        watcher.close()
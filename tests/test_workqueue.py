@@ -0,0 +1,78 @@
+import threading
+
+from sqlalchemy import text
+
+from pubmedpg.workqueue import claim, complete, enqueue, extend_lease
+
+XML_NAMES = [f"pubmed22n{number:04d}.xml.gz" for number in range(1, 21)]
+
+
+def _statuses(engine):
+    with engine.connect() as conn:
+        return dict(tuple(row) for row in conn.execute(text("SELECT xml_file_name, status FROM queued_file")))
+
+
+def test_enqueue(session, tmp_path):
+    engine = session.get_bind()
+    paths = [str(tmp_path / name) for name in XML_NAMES]
+    assert enqueue(engine, paths) == len(paths)
+    # already queued
+    assert enqueue(engine, paths) == 0
+    assert set(_statuses(engine).values()) == {"pending"}
+
+
+def test_claimers_never_share_a_file(session):
+    engine = session.get_bind()
+    enqueue(engine, XML_NAMES)
+    claimed = {"a": [], "b": []}
+
+    def claimer(worker):
+        while True:
+            xml_name = claim(engine, worker)
+            if xml_name is None:
+                return
+            claimed[worker].append(xml_name)
+            complete(engine, xml_name, worker)
+
+    threads = [threading.Thread(target=claimer, args=(worker,)) for worker in claimed]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed["a"] + claimed["b"]) == XML_NAMES
+    assert set(_statuses(engine).values()) == {"done"}
+
+
+def test_locked_row_is_skipped(session):
+    engine = session.get_bind()
+    enqueue(engine, XML_NAMES[:2])
+    with engine.begin() as conn:
+        # another loader in the middle of claiming the first file
+        conn.execute(text("SELECT * FROM queued_file WHERE xml_file_name = :name FOR UPDATE"), {"name": XML_NAMES[0]})
+        assert claim(engine, "b") == XML_NAMES[1]
+    assert claim(engine, "a") == XML_NAMES[0]
+    assert claim(engine, "c") is None
+
+
+def test_lease(session):
+    engine = session.get_bind()
+    enqueue(engine, XML_NAMES[:1])
+    assert claim(engine, "a", lease=600) == XML_NAMES[0]
+    assert extend_lease(engine, XML_NAMES[0], "a", lease=0)
+    assert not extend_lease(engine, XML_NAMES[0], "b")
+    # a died, its lease ran out and b reclaims the file
+    assert claim(engine, "b") == XML_NAMES[0]
+    assert not extend_lease(engine, XML_NAMES[0], "a")
+    assert extend_lease(engine, XML_NAMES[0], "b")
+    assert claim(engine, "c") is None
+    with engine.connect() as conn:
+        assert tuple(conn.execute(text("SELECT worker, attempts FROM queued_file")).one()) == ("b", 2)
+
+
+def test_expired_lease_fails_after_max_attempts(session):
+    engine = session.get_bind()
+    enqueue(engine, XML_NAMES[:1])
+    assert claim(engine, "a", lease=0, max_attempts=2) == XML_NAMES[0]
+    assert claim(engine, "b", lease=0, max_attempts=2) == XML_NAMES[0]
+    assert claim(engine, "c", lease=0, max_attempts=2) is None
+    assert _statuses(engine) == {XML_NAMES[0]: "failed"}